@@ -0,0 +1,285 @@
+#! /usr/bin/env python
+#
+# Alarm storm handling for the webhook receiver
+#
+#  - AlarmAggregator: deduplicates alarms keyed on rule_name_display + the
+#    device/interface identity found in "values": the first occurrence is
+#    emitted immediately, repeats are counted over a sliding window and
+#    summarized at most once per window.
+#  - Sinks: console, file (JSON lines), syslog and local HTTP.
+#  - Dispatcher: fans events out to the sinks, each one behind its own
+#    token bucket so downstream consumers see a bounded rate during storms,
+#    with a bounded backlog of the events waiting for the budget.
+#
+
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python"))
+
+from utilities.ratelimit import TokenBucket
+from utilities.tools import lazy_import
+
+requests = lazy_import("requests")  # Imported by the first HTTP sink
+tabulate = lazy_import("tabulate")  # Imported by the console sink
+
+logger = logging.getLogger(__name__)
+
+# Fields of the alarm "values" entries identifying a device or an interface.
+# Anything else (state, counters...) may change between two occurrences of the
+# same alarm and must not split the aggregation key.
+KEY_FIELDS = (
+    "system-ip",
+    "host-name",
+    "if-name",
+    "ifname",
+    "interface",
+    "local-color",
+    "remote-color",
+    "remote-system-ip",
+    "src-ip",
+    "dst-ip",
+)
+
+
+def alarm_key(alarm, key_fields=KEY_FIELDS):
+    """ Build the aggregation key of an alarm: rule_name_display + device/interface identity.
+    """
+    identity = list()
+    for value in alarm.get("values") or []:
+        identity.append(tuple((field, str(value[field])) for field in key_fields if field in value))
+    return (alarm.get("rule_name_display", alarm.get("rulename", "unknown")), tuple(sorted(identity)))
+
+
+class AlarmAggregator:
+    """ Deduplicate identical alarms over a sliding window.
+
+        The first occurrence of a key is emitted right away. Repeats received
+        while the key is active are only counted, and summarized at most once
+        per `window` seconds: "count" is the number of repeats since the
+        previous event of the key, "window_count" the number of occurrences
+        within the last `window` seconds. A key stays active while it occurred
+        within the last window; once it goes quiet its remaining repeats are
+        summarized and its next occurrence is emitted right away again.
+    """
+
+    def __init__(self, window=60, key_fields=KEY_FIELDS, clock=time.monotonic):
+        self.window = window
+        self.key_fields = key_fields
+        self._clock = clock
+        self._active = dict()
+        self._ready = list()    # first occurrences, returned by the next flush()
+        self._lock = threading.Lock()
+
+    def add(self, alarm):
+        key = alarm_key(alarm, self.key_fields)
+        now = self._clock()
+        entry_time = alarm.get("entry_time")
+        with self._lock:
+            entry = self._active.get(key)
+            if entry is None:
+                self._active[key] = {
+                    "seen": deque([now]),
+                    "emitted": now,
+                    "repeats": 0,
+                    "first_entry_time": entry_time,
+                    "last_entry_time": entry_time,
+                    "alarm": alarm,
+                }
+                self._ready.append(self._summarize(alarm, 1, 1, entry_time, entry_time))
+            else:
+                self._expire(entry["seen"], now)
+                entry["seen"].append(now)
+                entry["repeats"] += 1
+                if entry["repeats"] == 1:
+                    entry["first_entry_time"] = entry_time
+                entry["last_entry_time"] = entry_time
+                entry["alarm"] = alarm
+        return key
+
+    def _expire(self, seen, now):
+        while seen and now - seen[0] >= self.window:
+            seen.popleft()
+
+    def flush(self, force=False):
+        """ Return the first occurrences received since the last call, and a summary of the
+            repeats of every key last reported `window` seconds ago or gone quiet (all of them
+            when force is set).
+        """
+        now = self._clock()
+        with self._lock:
+            events, self._ready = self._ready, list()
+            for key in list(self._active):
+                entry = self._active[key]
+                self._expire(entry["seen"], now)
+                quiet = not entry["seen"]
+                if entry["repeats"] and (force or quiet or now - entry["emitted"] >= self.window):
+                    events.append(self._summarize(entry["alarm"], entry["repeats"], len(entry["seen"]),
+                                                  entry["first_entry_time"], entry["last_entry_time"]))
+                    entry["repeats"] = 0
+                    entry["emitted"] = now
+                if force or quiet:
+                    del self._active[key]
+        return events
+
+    def pending(self):
+        """ Number of active keys. """
+        with self._lock:
+            return len(self._active)
+
+    @staticmethod
+    def _summarize(alarm, count, window_count, first_entry_time, last_entry_time):
+        return {
+            "rule_name_display": alarm.get("rule_name_display"),
+            "severity": alarm.get("severity"),
+            "uuid": alarm.get("uuid"),
+            "values": alarm.get("values"),
+            "count": count,
+            "window_count": window_count,
+            "first_entry_time": first_entry_time,
+            "last_entry_time": last_entry_time,
+        }
+
+
+# -----------------------------------------------------------------------------
+# Sinks
+
+
+class ConsoleSink:
+    """ Print summaries as a table on the console. """
+
+    name = "console"
+
+    def __init__(self, time_formatter=None):
+        self.time_formatter = time_formatter or (lambda ts: str(ts))
+
+    def send(self, event):
+        headers = ["Last seen", "Alarm Name", "Severity", "Count", "Details"]
+        table = [[self.time_formatter(event["last_entry_time"]), event["rule_name_display"], event["severity"], event["count"],
+                  "UUID: " + str(event["uuid"]) + "\nValues:\n" + json.dumps(event["values"], sort_keys=True, indent=4)]]
+        try:
+            print(tabulate.tabulate(table, headers, tablefmt="fancy_grid"))
+        except UnicodeEncodeError:
+            print(tabulate.tabulate(table, headers, tablefmt="grid"))
+
+
+class FileSink:
+    """ Append summaries to a file, one JSON document per line. """
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, event):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(event, sort_keys=True) + "\n")
+
+
+class SyslogSink:
+    """ Forward summaries to a syslog server. """
+
+    name = "syslog"
+
+    def __init__(self, host="localhost", port=514):
+        self._logger = logging.getLogger("webhook.syslog")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(logging.handlers.SysLogHandler(address=(host, int(port))))
+
+    def send(self, event):
+        self._logger.info("sdwan-alarm %s severity=%s count=%s values=%s", event["rule_name_display"], event["severity"],
+                          event["count"], json.dumps(event["values"], sort_keys=True))
+
+
+class HttpSink:
+    """ POST summaries as JSON to a local HTTP endpoint. """
+
+    name = "http"
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, event):
+        response = self.session.post(self.url, json=event, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class Dispatcher:
+    """ Fan events out to sinks, each sink rate limited by its own token bucket.
+
+        Events beyond a sink's budget, or that the sink failed to accept, wait
+        in a per-sink backlog and are retried by the next dispatch() (flush_loop
+        calls it every interval), so a storm never produces more than `rate`
+        events per second downstream. Only when a backlog holds `backlog`
+        events are its oldest events dropped, and counted.
+    """
+
+    def __init__(self, sinks, rate=5, burst=20, backlog=10000):
+        self.backlog = backlog
+        self.routes = [(sink, TokenBucket(rate, burst), deque()) for sink in sinks]
+        self.dropped = {sink.name: 0 for sink in sinks}
+        self._lock = threading.Lock()
+
+    def dispatch(self, events=()):
+        """ Queue the events for every sink, then send as many queued events as the budgets allow.
+        """
+        with self._lock:
+            for event in events:
+                for sink, _, queue in self.routes:
+                    if len(queue) >= self.backlog:
+                        queue.popleft()
+                        self.dropped[sink.name] += 1
+                        logger.warning("Backlog of sink %s is full, dropped %s event(s) so far", sink.name, self.dropped[sink.name])
+                    queue.append(event)
+            for sink, bucket, queue in self.routes:
+                self._drain(sink, bucket, queue)
+
+    def drain(self, timeout=10):
+        """ Send the queued events, waiting for the budgets up to timeout seconds per sink.
+            Returns the number of events still queued.
+        """
+        with self._lock:
+            for sink, bucket, queue in self.routes:
+                self._drain(sink, bucket, queue, timeout)
+            return self.queued()
+
+    def queued(self):
+        return sum(len(queue) for _, _, queue in self.routes)
+
+    def _drain(self, sink, bucket, queue, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while queue:
+            if deadline is None:
+                if not bucket.try_acquire():
+                    return
+            else:
+                try:
+                    bucket.acquire(timeout=max(0, deadline - time.monotonic()))
+                except TimeoutError:
+                    return
+            try:
+                sink.send(queue[0])
+            except Exception as exc:
+                # Keep the event, the sink is retried on the next call
+                logger.error("Sink %s failed, %s event(s) queued: %s", sink.name, len(queue), exc)
+                return
+            queue.popleft()
+
+
+def flush_loop(aggregator, dispatcher, interval=1, stop_event=None):
+    """ Periodically dispatch the aggregated events and retry the sink backlogs (run in a daemon thread).
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.wait(interval):
+        dispatcher.dispatch(aggregator.flush())
+    dispatcher.dispatch(aggregator.flush(force=True))
+    dispatcher.drain()
@@ -0,0 +1,323 @@
+#! /usr/bin/env python
+#
+# Durable on-disk spool for webhook alarm notifications
+#
+# Notifications are appended to a segmented log before the webhook acknowledges
+# them, so nothing is lost when processing fails, falls behind or the receiver
+# restarts:
+#
+#  - segments: spool-<sequence>.log files, one JSON record per line, rolled
+#    over once they reach segment_bytes
+#  - group commit: appends from concurrent requests are made durable by a single
+#    fsync issued every fsync_interval seconds (or fsync_batch records)
+#  - checkpoint: position of the last processed record, written atomically, so
+#    a restarted consumer resumes where it stopped
+#  - retention: segments entirely before the checkpoint are deleted once older
+#    than the retention period, until then they can be replayed
+#
+# The receiver (Spool) owns its spool directory through an exclusive lock on
+# owner.lock, held until it is closed. SpoolReader never opens a segment for
+# writing. The replay command uses it: when it can take the ownership (no
+# receiver running) it works on the receiver checkpoint and can purge; while a
+# receiver owns the spool it only records its progress in replay-checkpoint.json
+# and purging is refused.
+#
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "spool-"
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint.json"
+REPLAY_CHECKPOINT_FILE = "replay-checkpoint.json"
+LOCK_FILE = "owner.lock"
+
+
+def segment_name(sequence):
+    return "%s%010d%s" % (SEGMENT_PREFIX, sequence, SEGMENT_SUFFIX)
+
+
+def segment_sequence(path):
+    return int(os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def _lock_file(f):
+    """ Exclusive non-blocking lock of an open file, raises OSError if another process holds it.
+    """
+    try:
+        import fcntl
+    except ImportError:     # Windows
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class SpoolReader:
+    """ Access to a spool without writer: read, replay, checkpoint and, once owned, purge.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._owner_lock = None
+
+    @property
+    def owner(self):
+        return self._owner_lock is not None
+
+    def acquire(self):
+        """ Take the ownership of the spool until release(). Returns False if another process owns it.
+        """
+        if self._owner_lock is None:
+            os.makedirs(self.directory, exist_ok=True)
+            f = open(os.path.join(self.directory, LOCK_FILE), "a+")
+            try:
+                _lock_file(f)
+            except OSError:
+                f.close()
+                return False
+            self._owner_lock = f
+        return True
+
+    def release(self):
+        if self._owner_lock is not None:
+            self._owner_lock.close()    # Releases the lock
+            self._owner_lock = None
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PREFIX + "*" + SEGMENT_SUFFIX)), key=segment_sequence)
+
+    def load_checkpoint(self, name=CHECKPOINT_FILE):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                checkpoint = json.load(f)
+            return checkpoint["segment"], checkpoint["offset"]
+        except FileNotFoundError:
+            return 0, 0
+
+    def save_checkpoint(self, segment, offset, name=CHECKPOINT_FILE):
+        path = os.path.join(self.directory, name)
+        tmp = "%s.%s.tmp" % (path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump({"segment": segment, "offset": offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def read(self, segment=0, offset=0):
+        """ Yield (segment, next_offset, record) for every complete record from the given position.
+
+            A partially written last line (crash during append) is left alone and
+            picked up once it is complete.
+        """
+        for path in self.segments():
+            sequence = segment_sequence(path)
+            if sequence < segment:
+                continue
+            start = offset if sequence == segment else 0
+            with open(path, "rb") as f:
+                f.seek(start)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    start += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.error("Skipping corrupted spool record in %s at offset %s", path, start - len(line))
+                        continue
+                    yield sequence, start, record
+
+    def replay(self, handler, from_checkpoint=False, checkpoint_every=100):
+        """ Re-process spooled records, either all retained ones or only those after the checkpoint
+            (the furthest of the receiver and replay checkpoints).
+
+            The progress is saved once it goes past the start checkpoint, so the
+            records are not processed again by the next replay --from_checkpoint:
+            in the receiver checkpoint when this reader owns the spool, otherwise
+            (a receiver is running) in the replay checkpoint only.
+        """
+        name = CHECKPOINT_FILE if self.owner else REPLAY_CHECKPOINT_FILE
+        checkpoint = max(self.load_checkpoint(), self.load_checkpoint(REPLAY_CHECKPOINT_FILE))
+        segment, offset = checkpoint if from_checkpoint else (0, 0)
+        count = 0
+        for segment, offset, record in self.read(segment, offset):
+            try:
+                handler(record)
+            except Exception as exc:
+                logger.error("Failed to replay spooled alarm (segment %s, offset %s): %s", segment, offset, exc)
+            count += 1
+            if count % checkpoint_every == 0 and (segment, offset) > checkpoint:
+                checkpoint = (segment, offset)
+                self.save_checkpoint(segment, offset, name)
+        if (segment, offset) > checkpoint:
+            self.save_checkpoint(segment, offset, name)
+        return count
+
+    def purge(self, max_age=None):
+        """ Delete segments entirely before the checkpoint, only those last written more than
+            max_age seconds ago when set. Returns the number of deleted segments.
+
+            Only the owner of the spool may purge: the checkpoint of a running
+            receiver moves on while the segments are deleted.
+        """
+        if not self.owner:
+            raise ValueError("Spool %s is not owned, a running receiver may still need its segments" % self.directory)
+        segment, _ = self.load_checkpoint()
+        deleted = 0
+        for path in self.segments():
+            if segment_sequence(path) >= segment:
+                break
+            try:
+                if max_age is not None and time.time() - os.path.getmtime(path) < max_age:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # Purged concurrently
+            deleted += 1
+        return deleted
+
+
+class Spool(SpoolReader):
+    """ Append-only segmented log with batched fsync and a consumer checkpoint.
+
+        retention: seconds processed segments are kept for replay by consume(), None keeps them.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync_interval=0.01, fsync_batch=256,
+                 retention=None, purge_interval=60):
+        SpoolReader.__init__(self, directory)
+        if not self.acquire():
+            raise ValueError("Spool %s is owned by another process" % directory)
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.retention = retention
+        self.purge_interval = purge_interval
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._durable = threading.Condition(self._lock)
+        self._written = 0       # number of records written since start
+        self._synced = 0        # number of records known to be on disk
+        self._closed = False
+
+        segments = self.segments()
+        self._sequence = segment_sequence(segments[-1]) if segments else 0
+        self._file = open(os.path.join(directory, segment_name(self._sequence)), "ab")
+        self._terminate_torn_record()
+
+        self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        self._syncer.start()
+
+    def _terminate_torn_record(self):
+        # A crash in the middle of an append leaves a line without its newline:
+        # close it so the next record does not get glued to it.
+        if self._file.tell() == 0:
+            return
+        with open(self._file.name, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                self._file.write(b"\n")
+                self._file.flush()
+
+    # -------------------------------------------------------------------------
+    # Producer side
+
+    def append(self, record, wait=True):
+        """ Append a record (any JSON serializable object).
+
+            When wait is set, return only once the record has been fsync'ed,
+            which is what makes acknowledging the sender safe.
+        """
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+        with self._lock:
+            if self._closed:
+                raise ValueError("Spool is closed")
+            if self._file.tell() + len(line) > self.segment_bytes and self._file.tell() > 0:
+                self._roll()
+            self._file.write(line)
+            self._written += 1
+            ticket = self._written
+            if self._written - self._synced >= self.fsync_batch:
+                self._durable.notify_all()
+
+            if wait:
+                while self._synced < ticket:
+                    self._durable.wait()
+        return ticket
+
+    def _roll(self):
+        self._flush_locked()
+        self._file.close()
+        self._sequence += 1
+        self._file = open(os.path.join(self.directory, segment_name(self._sequence)), "ab")
+
+    def _flush_locked(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced = self._written
+        self._durable.notify_all()
+
+    def _sync_loop(self):
+        while True:
+            with self._lock:
+                self._durable.wait_for(lambda: self._closed or self._written - self._synced >= self.fsync_batch,
+                                       timeout=self.fsync_interval)
+                if self._written > self._synced:
+                    self._flush_locked()
+                if self._closed:
+                    return
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._file.close()
+            self._durable.notify_all()
+        self._syncer.join()
+        self.release()
+
+    # -------------------------------------------------------------------------
+    # Consumer side
+
+    def consume(self, handler, stop_event=None, poll_interval=0.5, checkpoint_every=100):
+        """ Process records from the checkpoint onwards, forever (run in a daemon thread).
+
+            Records that make the handler fail are logged and skipped; they stay
+            in the spool and can be re-processed with replay. Processed segments
+            are deleted once older than the retention period.
+        """
+        stop_event = stop_event or threading.Event()
+        segment, offset = self.load_checkpoint()
+        purged = time.monotonic()
+        while not stop_event.is_set():
+            if self.retention is not None and time.monotonic() - purged >= self.purge_interval:
+                purged = time.monotonic()
+                deleted = self.purge(self.retention)
+                if deleted:
+                    logger.info("Deleted %s processed spool segment(s) older than %ss", deleted, self.retention)
+            processed = 0
+            for segment, offset, record in self.read(segment, offset):
+                try:
+                    handler(record)
+                except Exception as exc:
+                    logger.error("Failed to process spooled alarm (segment %s, offset %s): %s", segment, offset, exc)
+                processed += 1
+                if processed % checkpoint_every == 0:
+                    self.save_checkpoint(segment, offset)
+            if processed:
+                self.save_checkpoint(segment, offset)
+            else:
+                stop_event.wait(poll_interval)
@@ -1,83 +1,30 @@
 #! /usr/bin/env python
 
-import requests
 import sys
 import json
 import os
 import click
-import tabulate
 import cmd
-import datetime
-import pytz
-
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
-vmanage_host = os.environ.get("vmanage_host")
-vmanage_port = os.environ.get("vmanage_port")
-vmanage_username = os.environ.get("vmanage_username")
-vmanage_password = os.environ.get("vmanage_password")
-
-if vmanage_host is None or vmanage_port is None or vmanage_username is None or vmanage_password is None:
-    print("For Windows Workstation, vManage details must be set via environment variables using below commands")
-    print("set vmanage_host=198.18.1.10")
-    print("set vmanage_port=443")
-    print("set vmanage_username=admin")
-    print("set vmanage_password=admin")
-    print("For MAC OSX Workstation, vManage details must be set via environment variables using below commands")
-    print("export vmanage_host=198.18.1.10")
-    print("export vmanage_port=443")
-    print("export vmanage_username=admin")
-    print("export vmanage_password=admin")
-    exit()
-
-requests.packages.urllib3.disable_warnings()
-
-class Authentication:
-
-    @staticmethod
-    def get_jsessionid(vmanage_host, vmanage_port, username, password):
-        api = "/j_security_check"
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        url = base_url + api
-        payload = {'j_username' : username, 'j_password' : password}
-        
-        response = requests.post(url=url, data=payload, verify=False)
-        try:
-            cookies = response.headers["Set-Cookie"]
-            jsessionid = cookies.split(";")
-            return(jsessionid[0])
-        except:
-            print(response.text)
-            exit()
-       
-    @staticmethod
-    def get_token(vmanage_host, vmanage_port, jsessionid):
-        headers = {'Cookie': jsessionid}
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        api = "/dataservice/client/token"
-        url = base_url + api      
-        response = requests.get(url=url, headers=headers, verify=False)
-        if response.status_code == 200:
-            return(response.text)
-        else:
-            return None
-
-Auth = Authentication()
-jsessionid = Auth.get_jsessionid(vmanage_host,vmanage_port,vmanage_username,vmanage_password)
-token = Auth.get_token(vmanage_host,vmanage_port,jsessionid)
-
-if token is not None:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid, 'X-XSRF-TOKEN': token}
-else:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid}
-
-base_url = "https://%s:%s/dataservice"%(vmanage_host, vmanage_port)
+
+from vmanage_session import get_manager
+from utilities.metrics import stats_option
+from utilities.output import RowWriter, get_output_format, info, output_option
+from utilities.tools import TimestampFormatter, lazy_import
+
+tabulate = lazy_import("tabulate")  # Imported by the table output
+
+# Timezone used to display alarm times, e.g. export display_timezone=Europe/Paris
+display_timezone = os.environ.get("display_timezone", "America/Los_Angeles")
 
 @click.group()
-def cli():
+@output_option
+@stats_option
+@click.pass_context
+def cli(ctx, output_format, stats):
     """Command line tool for retrieving SD-WAN Alarms.
     """
-    pass
+    ctx.meta["output_format"] = output_format
+    ctx.meta["stats"] = stats
 
 @click.command()
 def list_alarms_tags():
@@ -86,9 +33,9 @@ def list_alarms_tags():
     """
     click.secho("\nRetrieving the alarm tags\n")
 
-    url = base_url + "/alarms/rulenamedisplay/keyvalue"
+    api_path = "/alarms/rulenamedisplay/keyvalue"
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
     else:
@@ -107,13 +54,15 @@ def list_alarms_tags():
 
 @click.command()
 @click.option("--alarm_tag", help="Alarm tag name")
-def list_alarms(alarm_tag):
+@click.pass_context
+def list_alarms(ctx, alarm_tag):
     """ Retrieve list of alarms related to provided tag.
         \nExample command: ./alarms_apis.py list-alarms --alarm_tag OMP_Site_Up
+        \nStream a large list: ./alarms_apis.py --output jsonl list-alarms --alarm_tag OMP_Site_Up
     """
-    click.echo("\nRetrieving the alarms with tag %s\n"%alarm_tag)
+    info("\nRetrieving the alarms with tag %s\n"%alarm_tag, ctx)
 
-    url = base_url + "/alarms"
+    api_path = "/alarms"
 
     query = {
                 "query": {
@@ -155,38 +104,47 @@ def list_alarms(alarm_tag):
                 }           
             }
 
-    response = requests.post(url=url, headers=header, data = json.dumps(query), verify=False)
+    response = get_manager()._api_request("POST", api_path, json=query)
     if response.status_code == 200:
         items = response.json()['data']
     else:
         click.echo("Failed to get alarm details " + str(response.text))
         exit()
 
-    table = list()
-    PDT = pytz.timezone('America/Los_Angeles')
-    headers = ["Date & Time (PDT)", "Alarm tag" , "Active", "Viewed", "Severity", "Details" ]
+    formatter = TimestampFormatter(display_timezone, '%m/%d/%Y %H:%M:%S')
+    clear_formatter = TimestampFormatter(display_timezone, '%m/%d/%Y %H:%M:%S %Z')
+    output_format = get_output_format(ctx)
 
-    for item in items:
+    # Interactive table: alarm details are folded in one multi-line column.
+    # Streamed outputs: one column per detail, values kept as structured JSON.
+    if output_format == "table":
+        headers = ["Date & Time (%s)"%display_timezone, "Alarm tag" , "Active", "Viewed", "Severity", "Details" ]
+    else:
+        headers = ["Date & Time (%s)"%display_timezone, "Alarm tag" , "Active", "Viewed", "Severity", "UUID", "Values",
+                   "Cleared By", "Cleared Time", "Cleared Events" ]
 
-        temp_time = datetime.datetime.utcfromtimestamp(item["entry_time"]/1000.)
-        temp_time = pytz.UTC.localize(temp_time).astimezone(PDT).strftime('%m/%d/%Y %H:%M:%S')
-        clear_details = ""
-        if item.get("cleared_time",""):
-            temp_clr_time = datetime.datetime.utcfromtimestamp(item["cleared_time"]/1000.)
-            temp_clr_time = pytz.UTC.localize(temp_clr_time).astimezone(PDT).strftime('%m/%d/%Y %H:%M:%S') + ' PDT'
-            clear_details = "\nCleared By: " + str(item.get("cleared_by"," ")) + "\nCleared Time: " + str(temp_clr_time)
-        elif item.get("cleared_events",""):
-            clear_details = "\nOrginal alarm: " + str(item.get("cleared_events"))
-
-        tr = [ temp_time,item['rule_name_display'], item["active"], item["acknowledged"],item["severity"],
-               "UUID: " + item["uuid"] + "\nValues:\n" + json.dumps(item["values"] , sort_keys=True, indent=4)
-               + clear_details ]
-        table.append(tr)
-        
-    try:
-        click.echo(tabulate.tabulate(table, headers, tablefmt="fancy_grid"))
-    except UnicodeEncodeError:
-        click.echo(tabulate.tabulate(table, headers, tablefmt="grid"))
+    entry_times = formatter.format_many(item["entry_time"] for item in items)
+
+    with RowWriter(headers, output_format) as writer:
+        for item, temp_time in zip(items, entry_times):
+
+            temp_clr_time = clear_formatter.format(item["cleared_time"]) if item.get("cleared_time","") else ""
+
+            if not writer.is_table:
+                writer.write([ temp_time, item['rule_name_display'], item["active"], item["acknowledged"], item["severity"],
+                               item["uuid"], item["values"], item.get("cleared_by",""), temp_clr_time, item.get("cleared_events","") ])
+                continue
+
+            clear_details = ""
+            if temp_clr_time:
+                clear_details = "\nCleared By: " + str(item.get("cleared_by"," ")) + "\nCleared Time: " + str(temp_clr_time)
+            elif item.get("cleared_events",""):
+                clear_details = "\nOrginal alarm: " + str(item.get("cleared_events"))
+
+            tr = [ temp_time,item['rule_name_display'], item["active"], item["acknowledged"],item["severity"],
+                   "UUID: " + item["uuid"] + "\nValues:\n" + json.dumps(item["values"] , sort_keys=True, indent=4)
+                   + clear_details ]
+            writer.write(tr)
 
 @click.command()
 @click.option("--uuid", help="Alarm uuid")
@@ -196,13 +154,13 @@ def alarm_details(uuid):
     """
     click.echo("\nRetrieving the consumed events for uuid %s\n"%uuid)
 
-    url = base_url + "/alarms/uuid/%s"%uuid
+    api_path = "/alarms/uuid/%s"%uuid
 
-    response = requests.get(url=url, headers=header, verify=False)
+    response = get_manager()._api_request("GET", api_path)
 
-    headers = ["Date & Time (PDT)", "Alarm tag", "Active", "Viewed", "Consumed Events"]    
+    headers = ["Date & Time (%s)"%display_timezone, "Alarm tag", "Active", "Viewed", "Consumed Events"]    
     table = list()
-    PDT = pytz.timezone('America/Los_Angeles')
+    formatter = TimestampFormatter(display_timezone, '%m/%d/%Y %H:%M:%S')
 
     if response.status_code == 200:
         items = response.json()['data']
@@ -210,10 +168,10 @@ def alarm_details(uuid):
         click.echo("Failed to get alarm details " + str(response.text))
         exit()
 
-    for item in items:
+    entry_times = formatter.format_many(item["entry_time"] for item in items)
+
+    for item, temp_time in zip(items, entry_times):
 
-        temp_time = datetime.datetime.utcfromtimestamp(item["entry_time"]/1000.)
-        temp_time = pytz.UTC.localize(temp_time).astimezone(PDT).strftime('%m/%d/%Y %H:%M:%S')
         tr = [ temp_time, item["rule_name_display"], item["active"], item["acknowledged"], 
                json.dumps(item["consumed_events"] , sort_keys=True, indent=4) ]
         table.append(tr)
@@ -233,13 +191,13 @@ def ack_alarm(uuids):
     
     uuids = uuids.split(",")
 
-    url = base_url + "/alarms/markviewed"
+    api_path = "/alarms/markviewed"
 
     payload = {
                 "uuid" : uuids
               }
 
-    response = requests.post(url=url, headers=header, data = json.dumps(payload), verify=False)
+    response = get_manager()._api_request("POST", api_path, json=payload)
     if response.status_code == 200:
         click.echo("Acknowledged the alarms with uuid %s "%uuids)
     else:
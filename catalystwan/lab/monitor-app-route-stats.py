@@ -1,90 +1,32 @@
 #! /usr/bin/env python
 
-import requests
 import sys
 import json
 import os
 import time
-import tabulate
-import yaml
 import click
-import pytz
-import datetime
-import pandas as pd
-from pandas import ExcelWriter
 import cmd
 
-requests.packages.urllib3.disable_warnings()
+from vmanage_session import get_manager
+from utilities.inventory import DEFAULT_MAX_AGE, Inventory
+from utilities.metrics import stats_option
+from utilities.queries import SplitQueryRunner, StatsQuery, get_fields, tunnel_stats_query
+from utilities.tools import TimestampFormatter, lazy_import
 
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
+requests = lazy_import("requests")  # Imported by the first API call
+tabulate = lazy_import("tabulate")  # Imported by the table output
 
 
-vmanage_host = os.environ.get("vmanage_host")
-vmanage_port = os.environ.get("vmanage_port")
-vmanage_username = os.environ.get("vmanage_username")
-vmanage_password = os.environ.get("vmanage_password")
-
-if vmanage_host is None or vmanage_port is None or vmanage_username is None or vmanage_password is None:
-    print("For Windows Workstation, vManage details must be set via environment variables using below commands")
-    print("set vmanage_host=198.18.1.10")
-    print("set vmanage_port=8443")
-    print("set vmanage_username=admin")
-    print("set vmanage_password=admin")
-    print("For MAC OSX Workstation, vManage details must be set via environment variables using below commands")
-    print("export vmanage_host=198.18.1.10")
-    print("export vmanage_port=8443")
-    print("export vmanage_username=admin")
-    print("export vmanage_password=admin")
-    exit()
-
-
-class Authentication:
-
-    @staticmethod
-    def get_jsessionid(vmanage_host, vmanage_port, username, password):
-        api = "/j_security_check"
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        url = base_url + api
-        payload = {'j_username' : username, 'j_password' : password}
-        
-        response = requests.post(url=url, data=payload, verify=False)
-        try:
-            cookies = response.headers["Set-Cookie"]
-            jsessionid = cookies.split(";")
-            return(jsessionid[0])
-        except:
-            if logger is not None:
-                logger.error("No valid JSESSION ID returned\n")
-            exit()
-       
-    @staticmethod
-    def get_token(vmanage_host, vmanage_port, jsessionid):
-        headers = {'Cookie': jsessionid}
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        api = "/dataservice/client/token"
-        url = base_url + api      
-        response = requests.get(url=url, headers=headers, verify=False)
-        if response.status_code == 200:
-            return(response.text)
-        else:
-            return None
-
-Auth = Authentication()
-jsessionid = Auth.get_jsessionid(vmanage_host,vmanage_port,vmanage_username,vmanage_password)
-token = Auth.get_token(vmanage_host,vmanage_port,jsessionid)
-
-if token is not None:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid, 'X-XSRF-TOKEN': token}
-else:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid}
-
-base_url = "https://%s:%s/dataservice"%(vmanage_host, vmanage_port)
+# Timezone used to display report dates, e.g. export display_timezone=Europe/Paris
+display_timezone = os.environ.get("display_timezone", "America/Los_Angeles")
 
 @click.group()
-def cli():
+@stats_option
+@click.pass_context
+def cli(ctx, stats):
     """Command line tool for monitoring Application Aware Routing Statistics(Latency/Loss/Jitter/vQoE Score).
     """
-    pass
+    ctx.meta["stats"] = stats
 
 @click.command()
 def approute_fields():
@@ -95,9 +37,7 @@ def approute_fields():
     try:
         api_url = "/statistics/approute/fields"
 
-        url = base_url + api_url
-
-        response = requests.get(url=url, headers=header, verify=False)
+        response = get_manager()._api_request("GET", api_url)
 
         if response.status_code == 200:
             items = response.json()
@@ -129,70 +69,13 @@ def approute_stats():
 
         # Get app route statistics for tunnels between router-1 and router-2
 
-        api_url = "/statistics/approute/fec/aggregation"
-
-        payload = {
-                    "query": {
-                        "condition": "AND",
-                        "rules": [
-                                    {
-                                        "value": [
-                                        "1"
-                                        ],
-                                        "field": "entry_time",
-                                        "type": "date",
-                                        "operator": "last_n_hours"
-                                    },
-                                    {
-                                        "value": [
-                                        rtr1_systemip
-                                        ],
-                                        "field": "local_system_ip",
-                                        "type": "string",
-                                        "operator": "in"
-                                    },
-                                    {
-                                        "value": [
-                                        rtr2_systemip
-                                        ],
-                                        "field": "remote_system_ip",
-                                        "type": "string",
-                                        "operator": "in"
-                                    }
-                                ]
-                    },
-                    "aggregation": {
-                        "field": [
-                                    {
-                                        "property": "name",
-                                        "sequence": 1,
-                                        "size": 6000
-                                    }
-                                ],
-                        "metrics": [
-                                    {
-                                        "property": "loss_percentage",
-                                        "type": "avg"
-                                    },
-                                    {
-                                        "property": "vqoe_score",
-                                        "type": "avg"
-                                    },
-                                    {
-                                        "property": "latency",
-                                        "type": "avg"
-                                    },
-                                    {
-                                        "property": "jitter",
-                                        "type": "avg"
-                                    }
-                                ]
-                                    }
-                    }
-
-        url = base_url + api_url
-
-        response = requests.post(url=url, headers=header, data=json.dumps(payload), verify=False)
+        # Queries are checked against the App route fields (also used by the fec aggregation) before they are sent
+
+        fields = get_fields(get_manager(), "approute")
+        query = tunnel_stats_query([rtr1_systemip], [rtr2_systemip], hours=1, dataset="approute/fec")
+        query.validate(fields)
+
+        response = get_manager()._api_request("POST", query.path, json=query.payload())
 
         if response.status_code == 200:
             app_route_stats = response.json()["data"]
@@ -211,66 +94,10 @@ def approute_stats():
         else:
             click.echo("Failed to retrieve app route statistics\n")
 
-        payload = {
-                    "query": {
-                        "condition": "AND",
-                        "rules": [
-                        {
-                            "value": [
-                            "1"
-                            ],
-                            "field": "entry_time",
-                            "type": "date",
-                            "operator": "last_n_hours"
-                        },
-                        {
-                            "value": [
-                            rtr2_systemip
-                            ],
-                            "field": "local_system_ip",
-                            "type": "string",
-                            "operator": "in"
-                        },
-                        {
-                            "value": [
-                            rtr1_systemip
-                            ],
-                            "field": "remote_system_ip",
-                            "type": "string",
-                            "operator": "in"
-                        }
-                        ]
-                    },
-                    "aggregation": {
-                        "field": [
-                        {
-                            "property": "name",
-                            "sequence": 1,
-                            "size": 6000
-                        }
-                        ],
-                        "metrics": [
-                        {
-                            "property": "loss_percentage",
-                            "type": "avg"
-                        },
-                        {
-                            "property": "vqoe_score",
-                            "type": "avg"
-                        },
-                        {
-                            "property": "latency",
-                            "type": "avg"
-                        },
-                        {
-                            "property": "jitter",
-                            "type": "avg"
-                        }
-                        ]
-                    }
-                    }
-
-        response = requests.post(url=url, headers=header, data=json.dumps(payload), verify=False)
+        query = tunnel_stats_query([rtr2_systemip], [rtr1_systemip], hours=1, dataset="approute/fec")
+        query.validate(fields)
+
+        response = get_manager()._api_request("POST", query.path, json=query.payload())
 
         if response.status_code == 200:
             app_route_stats = response.json()["data"]
@@ -302,6 +129,11 @@ def approute_report(hub_list_file):
         \nExample command: ./monitor-app-route-stats.py approute-report --hub_list_file <.yaml>
     """
 
+    # Imported here: pandas and yaml are only needed by this report
+    import pandas as pd
+    import yaml
+    from pandas import ExcelWriter
+
     try:
         try: 
             start_date = input("Please enter start date(YYYY-MM-DD): ")
@@ -317,22 +149,16 @@ def approute_report(hub_list_file):
         with open(hub_list_file) as f:
             config = yaml.safe_load(f.read())
 
-        # Get Device Inventory details 
-
-        api_url = "/device"
-
-        url = base_url + api_url
-
-        response = requests.get(url=url, headers=header, verify=False)
+        # Get Device Inventory details (shared inventory, synced at most every DEFAULT_MAX_AGE seconds)
 
         device_inv = dict()
 
-        if response.status_code == 200:
-            temp = response.json()["data"]
-            for item in temp:
-                if item["personality"] == "vedge":
+        try:
+            inventory = Inventory.for_manager(get_manager(), max_age=DEFAULT_MAX_AGE)
+            for item in inventory:
+                if item.get("personality") == "vedge":
                     device_inv[item["system-ip"]] = [{'hostname' : item["host-name"]} , {'siteid' : item["site-id"]}]
-        else:
+        except requests.exceptions.RequestException:
             click.echo("Failed to retrieve device inventory\n")
 
         # Get app route statistics for tunnels between Hub routers and Spoke routers.
@@ -340,90 +166,33 @@ def approute_report(hub_list_file):
         # open excel file 
         writer = ExcelWriter('Tunnel Statistics %s to %s.xlsx'%(start_date,end_date))
 
-        PDT = pytz.timezone('America/Los_Angeles')
+        formatter = TimestampFormatter(display_timezone, '%m/%d/%Y')
         file_name   = open("Tunnel Statistics %s to %s.csv"%(start_date,end_date),"w")
         csv_content = ""
 
+        runner = SplitQueryRunner(get_manager(), timeout=120)
+
         for hub in config["hub_routers"]:
 
-            api_url = "/statistics/approute/fec/aggregation"
-
-            payload = {
-                            "query": {
-                                "condition": "AND",
-                                "rules": [
-                                {
-                                    "value": [
-                                              start_date+"T00:00:00 UTC",
-                                              end_date+"T23:59:59 UTC" 
-                                             ],
-                                    "field": "entry_time",
-                                    "type": "date",
-                                    "operator": "between"
-                                },
-                                {
-                                    "value": [
-                                            hub["system_ip"]
-                                            ],
-                                    "field": "local_system_ip",
-                                    "type": "string",
-                                    "operator": "in"
-                                }
-                                ]
-                            },
-                            "aggregation": {
-                                "field": [
-                                {
-                                    "property": "name",
-                                    "sequence": 1,
-                                    "size": 6000
-                                },
-                                {
-                                    "property": "proto",
-                                    "sequence": 2
-                                },
-                                {
-                                    "property": "local_system_ip",
-                                    "sequence": 3
-                                },
-                                {
-                                    "property": "remote_system_ip",
-                                    "sequence": 4
-                                }
-                                ],
-                                "histogram": {
-                                                "property": "entry_time",
-                                                "type": "hour",
-                                                "interval": 24,
-                                                "order": "asc"
-                                             },
-                                "metrics": [
-                                {
-                                    "property": "latency",
-                                    "type": "avg"
-                                },
-                                {
-                                    "property": "jitter",
-                                    "type": "avg"
-                                },
-                                {
-                                    "property": "loss_percentage",
-                                    "type": "avg"
-                                },
-                                {
-                                    "property": "vqoe_score",
-                                    "type": "avg"
-                                }
-                                ]
-                            }
-                            }
-
-            url = base_url + api_url
-
-            response = requests.post(url=url, headers=header, data=json.dumps(payload), verify=False)
-            if response.status_code == 200:
-                app_route_stats = response.json()["data"]
-                app_route_stats_headers = ["Date (PDT)", "Hub", "Hub Siteid", "Spoke", "Spoke Siteid", "Tunnel name", "vQoE score", "Latency", "Loss percentage", "Jitter"]
+            query = (StatsQuery("approute/fec")
+                     .between(start_date+"T00:00:00 UTC", end_date+"T23:59:59 UTC")
+                     .where_in("local_system_ip", [hub["system_ip"]])
+                     .group_by("name", "proto", "local_system_ip", "remote_system_ip", size=6000)
+                     .histogram("entry_time", "hour", 24)
+                     .metrics("latency", "jitter", "loss_percentage", "vqoe_score"))
+            query.validate(get_fields(get_manager(), "approute"))
+
+            # Long date ranges and large hubs are split in parallel sub-queries, merged by count
+            try:
+                app_route_stats = runner.run(query)
+            except requests.exceptions.RequestException as e:
+                click.echo("Statistics query failed: %s"%e)
+                app_route_stats = None
+            if runner.truncated:
+                click.echo("Warning: statistics of %s truncated at 6000 tunnels"%hub["system_ip"])
+
+            if app_route_stats is not None:
+                app_route_stats_headers = ["Date (%s)"%display_timezone, "Hub", "Hub Siteid", "Spoke", "Spoke Siteid", "Tunnel name", "vQoE score", "Latency", "Loss percentage", "Jitter"]
                 date_list = list()
                 hub_list = list()
                 hub_siteid_list = list()
@@ -437,11 +206,9 @@ def approute_report(hub_list_file):
                 table = list()
 
 
-                for item in app_route_stats:
+                entry_dates = formatter.format_many(item['entry_time'] for item in app_route_stats)
 
-                    temp_time = datetime.datetime.utcfromtimestamp(item['entry_time']/1000.)
-                    temp_time = pytz.UTC.localize(temp_time).astimezone(PDT).strftime('%m/%d/%Y')
-                    #date_list.append(time.strftime('%m/%d/%Y',  time.gmtime(item['entry_time']/1000.)))
+                for item, temp_time in zip(app_route_stats, entry_dates):
 
                     tr = [temp_time, device_inv[item['local_system_ip']][0]['hostname'], device_inv[item['local_system_ip']][1]['siteid'], device_inv[item['remote_system_ip']][0]['hostname'], device_inv[item['remote_system_ip']][1]['siteid'], item['name'], item['vqoe_score'], item['latency'], item['loss_percentage'], item['jitter']]
                     table.append(tr)
@@ -459,7 +226,7 @@ def approute_report(hub_list_file):
                 
                 csv_content = csv_content + tabulate.tabulate(table, app_route_stats_headers, tablefmt="csv") + "\n"
                 excel_content = dict()
-                excel_content["Date (PDT)"] = date_list
+                excel_content["Date (%s)"%display_timezone] = date_list
                 excel_content["Hub"] = hub_list
                 excel_content["Hub Siteid"] = hub_siteid_list
                 excel_content["Spoke"] = spoke_list
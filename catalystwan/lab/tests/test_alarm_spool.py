@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from alarm_spool import CHECKPOINT_FILE, REPLAY_CHECKPOINT_FILE, Spool, SpoolReader, segment_sequence
+
+
+class SpoolTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+        self.spools = []
+
+    def tearDown(self):
+        for spool in self.spools:
+            spool.close()
+        self._tmp.cleanup()
+
+    def open_spool(self, **kwargs):
+        spool = Spool(self.directory, fsync_interval=0.001, **kwargs)
+        self.spools.append(spool)
+        return spool
+
+    def checkpoint(self, name=CHECKPOINT_FILE):
+        with open(os.path.join(self.directory, name)) as f:
+            return json.load(f)
+
+    def test_append_read_and_roll(self):
+        spool = self.open_spool(segment_bytes=40)
+        for index in range(5):
+            spool.append({"alarm": index})
+
+        records = [record["alarm"] for _, _, record in spool.read()]
+        self.assertEqual(records, list(range(5)))
+        self.assertGreater(len(spool.segments()), 1)
+
+        # Resume after the second record
+        segment, offset, _ = list(spool.read())[1]
+        self.assertEqual([record["alarm"] for _, _, record in spool.read(segment, offset)], [2, 3, 4])
+
+    def test_torn_record(self):
+        spool = self.open_spool()
+        spool.append({"alarm": 1})
+        spool.close()
+        with open(spool.segments()[-1], "ab") as f:
+            f.write(b'{"alarm": ')
+        self.assertEqual(len(list(SpoolReader(self.directory).read())), 1)  # Incomplete line not read yet
+
+        spool = self.open_spool()
+        spool.append({"alarm": 2})
+
+        with self.assertLogs("alarm_spool", "ERROR"):
+            records = [record["alarm"] for _, _, record in spool.read()]
+        self.assertEqual(records, [1, 2])
+
+    def test_consume_checkpoint(self):
+        spool = self.open_spool()
+        for index in range(5):
+            spool.append({"alarm": index})
+        processed = []
+        stop = threading.Event()
+
+        def handler(record):
+            processed.append(record["alarm"])
+            if record["alarm"] == 1:
+                raise RuntimeError("handler failure")   # Logged and skipped
+
+        consumer = threading.Thread(target=spool.consume, args=(handler, stop), kwargs={"poll_interval": 0.01, "checkpoint_every": 2})
+        with self.assertLogs("alarm_spool", "ERROR"):
+            consumer.start()
+            deadline = time.monotonic() + 5
+            while len(processed) < 5 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            stop.set()
+            consumer.join(5)
+
+        self.assertEqual(processed, [0, 1, 2, 3, 4])
+        checkpoint = self.checkpoint()
+        self.assertEqual(list(spool.read(checkpoint["segment"], checkpoint["offset"])), [])
+
+    def test_purge_retention(self):
+        spool = self.open_spool(segment_bytes=12)   # One record per segment
+        for index in range(4):
+            spool.append({"alarm": index})
+        segments = spool.segments()
+        self.assertEqual(len(segments), 4)
+
+        # Processed up to the third segment: the first two can be deleted
+        spool.save_checkpoint(segment_sequence(segments[2]), 0)
+        old = time.time() - 3600
+        os.utime(segments[0], (old, old))
+
+        self.assertEqual(spool.purge(max_age=60), 1)
+        self.assertEqual(spool.segments(), segments[1:])
+        self.assertEqual(spool.purge(), 1)
+        self.assertEqual(spool.segments(), segments[2:])
+
+    def test_single_owner(self):
+        spool = self.open_spool()
+        spool.append({"alarm": 1})
+
+        with self.assertRaises(ValueError):
+            Spool(self.directory)
+        reader = SpoolReader(self.directory)
+        self.assertFalse(reader.acquire())
+        with self.assertRaises(ValueError):
+            reader.purge()
+
+        spool.close()
+        self.assertTrue(reader.acquire())
+        reader.release()
+
+    def test_replay_while_receiver_runs(self):
+        spool = self.open_spool()
+        for index in range(3):
+            spool.append({"alarm": index})
+        spool.save_checkpoint(*list(spool.read())[0][:2])   # The receiver processed the first record
+
+        reader = SpoolReader(self.directory)
+        self.assertFalse(reader.acquire())
+        replayed = []
+        self.assertEqual(reader.replay(lambda record: replayed.append(record["alarm"]), from_checkpoint=True), 2)
+        self.assertEqual(replayed, [1, 2])
+
+        # The receiver checkpoint is left alone, the progress goes to the replay checkpoint
+        self.assertEqual(self.checkpoint()["offset"], list(spool.read())[0][1])
+        self.assertEqual(self.checkpoint(REPLAY_CHECKPOINT_FILE)["offset"], list(spool.read())[2][1])
+        self.assertEqual(reader.replay(replayed.append, from_checkpoint=True), 0)
+        self.assertEqual(reader.replay(replayed.append), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,92 +1,41 @@
 #! /usr/bin/env python
-import requests
 import sys
 import json
 import click
 import os
-import tabulate
-import yaml
 import time
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
-vmanage_host = os.environ.get("vmanage_host")
-vmanage_port = os.environ.get("vmanage_port")
-vmanage_username = os.environ.get("vmanage_username")
-vmanage_password = os.environ.get("vmanage_password")
-
-if vmanage_host is None or vmanage_port is None or vmanage_username is None or vmanage_password is None:
-    print("For Windows Workstation, vManage details must be set via environment variables using below commands")
-    print("set vmanage_host=198.18.1.10")
-    print("set vmanage_port=8443")
-    print("set vmanage_username=admin")
-    print("set vmanage_password=admin")
-    print("For MAC OSX Workstation, vManage details must be set via environment variables using below commands")
-    print("export vmanage_host=198.18.1.10")
-    print("export vmanage_port=8443")
-    print("export vmanage_username=admin")
-    print("export vmanage_password=admin")
-    exit()
-
-class Authentication:
-
-    @staticmethod
-    def get_jsessionid(vmanage_host, vmanage_port, username, password):
-        api = "/j_security_check"
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        url = base_url + api
-        payload = {'j_username' : username, 'j_password' : password}
-        
-        response = requests.post(url=url, data=payload, verify=False)
-        try:
-            cookies = response.headers["Set-Cookie"]
-            jsessionid = cookies.split(";")
-            return(jsessionid[0])
-        except:
-            if logger is not None:
-                logger.error("No valid JSESSION ID returned\n")
-            exit()
-       
-    @staticmethod
-    def get_token(vmanage_host, vmanage_port, jsessionid):
-        headers = {'Cookie': jsessionid}
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        api = "/dataservice/client/token"
-        url = base_url + api      
-        response = requests.get(url=url, headers=headers, verify=False)
-        if response.status_code == 200:
-            return(response.text)
-        else:
-            return None
-
-Auth = Authentication()
-jsessionid = Auth.get_jsessionid(vmanage_host,vmanage_port,vmanage_username,vmanage_password)
-token = Auth.get_token(vmanage_host,vmanage_port,jsessionid)
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-if token is not None:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid, 'X-XSRF-TOKEN': token}
-else:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid}
+from vmanage_session import get_manager, wait_for_task
+from utilities.metrics import stats_option
+from utilities.output import RowWriter, get_output_format, info, output_option
+from utilities.tools import lazy_import
 
-base_url = "https://%s:%s/dataservice"%(vmanage_host, vmanage_port)
+requests = lazy_import("requests")  # Imported by the first API call
+tabulate = lazy_import("tabulate")  # Imported by the table output
 
 @click.group()
-def cli():
+@output_option
+@stats_option
+@click.pass_context
+def cli(ctx, output_format, stats):
     """Command line tool for monitoring Cisco SD-WAN solution components.
     """
-    pass
+    ctx.meta["output_format"] = output_format
+    ctx.meta["stats"] = stats
 
 @click.command()
-def device_list():
+@click.pass_context
+def device_list(ctx):
     """ Retrieve and return network devices list.                                           
         Returns information about each device that is part of the fabric.                          
-        \n Example command: ./vmanage_apis.py device-list
+        \n Example command: ./vmanage_apis.py --output jsonl device-list
     """
-    click.echo("\nRetrieving the devices.")
+    info("\nRetrieving the devices.", ctx)
 
-    url = base_url + "/device"
+    api_path = "/device"
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
     else:
@@ -94,15 +43,11 @@ def device_list():
         exit()
 
     headers = ["Host-Name", "Device Type", "Device ID", "System IP", "Site ID", "Version", "Device Model"]
-    table = list()
 
-    for item in items:
-        tr = [item.get('host-name'), item.get('device-type'), item.get('uuid'), item.get('system-ip'), item.get('site-id'), item.get('version'), item.get('device-model')]
-        table.append(tr)
-    try:
-        click.echo(tabulate.tabulate(table, headers, tablefmt="fancy_grid"))
-    except UnicodeEncodeError:
-        click.echo(tabulate.tabulate(table, headers, tablefmt="grid"))
+    with RowWriter(headers, get_output_format(ctx)) as writer:
+        for item in items:
+            tr = [item.get('host-name'), item.get('device-type'), item.get('uuid'), item.get('system-ip'), item.get('site-id'), item.get('version'), item.get('device-model')]
+            writer.write(tr)
 
 @click.command()
 @click.option("--system_ip", help="System IP address of the device")
@@ -115,9 +60,9 @@ def system_status(system_ip):
 
     click.secho("\nRetrieving the System Status")
 
-    url = base_url + "/device/system/status?deviceId={0}".format(system_ip)
+    api_path = "/device/system/status?deviceId={0}".format(system_ip)
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
     else:
@@ -150,9 +95,9 @@ def interface_status(system_ip):
 
     click.secho("\nRetrieving the Interface Status")
 
-    url = base_url + "/device/interface/synced?deviceId={0}".format(system_ip)
+    api_path = "/device/interface/synced?deviceId={0}".format(system_ip)
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
     else:
@@ -186,9 +131,9 @@ def control_status(system_ip):
 
     click.secho("Retrieving the Control Status")
 
-    url = base_url + "/device/control/synced/connections?deviceId={0}".format(system_ip)
+    api_path = "/device/control/synced/connections?deviceId={0}".format(system_ip)
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
     else:
@@ -221,9 +166,9 @@ def device_counters(system_ip):
 
     click.secho("Retrieving the Device Counters")
 
-    url = base_url + "/device/counters?deviceId={0}".format(system_ip)
+    api_path = "/device/counters?deviceId={0}".format(system_ip)
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
     else:
@@ -256,9 +201,9 @@ def attached_devices(template):
             ./vmanage_apis.py attached-devices --template 6c7d22bc-73d5-4877-9402-26c75a22bd08
     """
 
-    url = base_url + "/template/device/config/attached/{0}".format(template)
+    api_path = "/template/device/config/attached/{0}".format(template)
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
     else:
@@ -297,28 +242,125 @@ def detach(target, sysip):
         ]
     }
 
-    url = base_url + "/template/config/device/mode/cli"
+    api_path = "/template/config/device/mode/cli"
 
-    response = requests.post(url=url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_manager()._api_request("POST", api_path, json=payload)
     if response.status_code == 200:
         id = response.json()["id"]
-        url = base_url + "/device/action/status/" + str(id)
-        while(1):
-            status_res = requests.get(url,headers=header,verify=False)
-            if status_res.status_code == 200:
-                push_status = status_res.json()
-                if push_status['summary']['status'] == "done":
-                    if 'Success' in push_status['summary']['count']:
-                        print("Changed configuration mode to CLI")
-                    elif 'Failure' in push_status['summary']['count']:
-                        print("Failed to change configuration mode to CLI")
-                        exit()
-                    break
+        task = wait_for_task(str(id), "Change configuration mode to CLI")
+        if task.succeeded:
+            print("Changed configuration mode to CLI")
+        else:
+            print("Failed to change configuration mode to CLI")
+            exit()
     else:
         print("Failed to detach template with error " + response.text)
         exit()
 
+# Realtime endpoints collected by fleet-snapshot, per device
+SNAPSHOT_ENDPOINTS = {
+    "system": "/device/system/status?deviceId={0}",
+    "interfaces": "/device/interface/synced?deviceId={0}",
+    "control": "/device/control/synced/connections?deviceId={0}",
+    "counters": "/device/counters?deviceId={0}",
+}
+
+def fetch_realtime(manager, endpoint, system_ip):
+    """ Call one realtime endpoint for a device. Returns (data, error message).
+    """
+    try:
+        response = manager._api_request("GET", SNAPSHOT_ENDPOINTS[endpoint].format(system_ip))
+    except requests.exceptions.RequestException as e:
+        return None, "%s: %s"%(endpoint, type(e).__name__)
+    if response.status_code == 200:
+        return response.json()['data'], None
+    return None, "%s: HTTP %s"%(endpoint, response.status_code)
+
+def snapshot_row(device, results, detailed):
+    """ Consolidate the realtime results of one device into a single row.
+    """
+    system = (results.get("system") or [{}])[0]
+    counters = (results.get("counters") or [{}])[0]
+    interfaces = results.get("interfaces") or []
+    control = results.get("control") or []
+
+    row = [ device.get('host-name'), device.get('system-ip'), device.get('site-id'), device.get('device-model'),
+            system.get('uptime'), system.get('version', device.get('version')), system.get('mem_used'), system.get('cpu_system'),
+            "%d/%d"%(sum(1 for item in interfaces if item.get('if-oper-status') == "Up"), len(interfaces)),
+            "%d/%d"%(sum(1 for item in control if item.get('state') == "up"), len(control)),
+            counters.get('ompPeersUp'), counters.get('bfdSessionsUp'), counters.get('bfdSessionsDown'),
+            "\n".join(results["errors"]) ]
+    if detailed:
+        row += [ results.get(endpoint) for endpoint in SNAPSHOT_ENDPOINTS ]
+    return row
+
+@click.command()
+@click.option("--site_id", multiple=True, help="Only devices of this site, can be repeated")
+@click.option("--model", multiple=True, help="Only devices of this model (e.g. vedge-C8000V), can be repeated")
+@click.option("--system_ip", multiple=True, help="Only this device, can be repeated")
+@click.option("--workers", default=8, show_default=True, help="Maximum number of concurrent requests")
+@click.pass_context
+def fleet_snapshot(ctx, site_id, model, system_ip, workers):
+    """ Collect system, interface, control and counters status of many devices in one run.
+        Without selector all reachable devices of /device are included.
+        \nExample command: ./vmanage_apis.py fleet-snapshot --site_id 100 --site_id 200
+        \nFull dataset: ./vmanage_apis.py --output jsonl fleet-snapshot > snapshot.jsonl
+    """
+    manager = get_manager()
+
+    info("\nRetrieving the devices.", ctx)
+
+    response = manager._api_request("GET", "/device")
+    if response.status_code == 200:
+        items = response.json()['data']
+    else:
+        print("Failed to get list of devices " + str(response.text))
+        exit()
+
+    devices = [ item for item in items
+                if item.get('reachability') == "reachable"
+                and (not site_id or str(item.get('site-id')) in site_id)
+                and (not model or item.get('device-model') in model)
+                and (not system_ip or item.get('system-ip') in system_ip) ]
+
+    if not devices:
+        info("No reachable device matches the selection.", ctx)
+        return
+
+    workers = max(1, min(workers, manager.pool_size))
+    info("Collecting %d realtime endpoints of %d devices with %d workers."%(len(SNAPSHOT_ENDPOINTS), len(devices), workers), ctx)
+
+    output_format = get_output_format(ctx)
+    headers = ["Host-Name", "System IP", "Site ID", "Device Model", "Up time", "Version", "Memory Used", "CPU system",
+               "Interfaces Up", "Control Up", "OMP Peers Up", "BFD Sessions Up", "BFD Sessions Down", "Errors"]
+    detailed = output_format != "table"
+    if detailed:
+        headers += [ endpoint.capitalize() for endpoint in SNAPSHOT_ENDPOINTS ]
+
+    # Authenticate once before fanning out
+    manager._ensure_authenticated()
+
+    results = { device['system-ip']: {"errors": []} for device in devices }
+    remaining = { device['system-ip']: len(SNAPSHOT_ENDPOINTS) for device in devices }
+    by_ip = { device['system-ip']: device for device in devices }
+
+    with RowWriter(headers, output_format) as writer, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = { executor.submit(fetch_realtime, manager, endpoint, device['system-ip']): (device['system-ip'], endpoint)
+                    for device in devices for endpoint in SNAPSHOT_ENDPOINTS }
+
+        # Rows are written as soon as all endpoints of a device are collected
+        for future in as_completed(futures):
+            ip, endpoint = futures[future]
+            data, error = future.result()
+            results[ip][endpoint] = data
+            if error:
+                results[ip]["errors"].append(error)
+            remaining[ip] -= 1
+            if remaining[ip] == 0:
+                writer.write(snapshot_row(by_ip[ip], results.pop(ip), detailed))
+
 cli.add_command(detach)
+cli.add_command(fleet_snapshot)
 cli.add_command(device_list)
 cli.add_command(system_status)
 cli.add_command(interface_status)
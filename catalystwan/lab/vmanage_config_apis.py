@@ -1,79 +1,30 @@
 #! /usr/bin/env python
 
 import os
-import tabulate
-import requests
 import click
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-requests.packages.urllib3.disable_warnings()
-
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
-vmanage_host = os.environ.get("vmanage_host")
-vmanage_port = os.environ.get("vmanage_port")
-vmanage_username = os.environ.get("vmanage_username")
-vmanage_password = os.environ.get("vmanage_password")
-
-if vmanage_host is None or vmanage_port is None or vmanage_username is None or vmanage_password is None:
-    print("For Windows Workstation, vManage details must be set via environment variables using below commands")
-    print("set vmanage_host=198.18.1.10")
-    print("set vmanage_port=8443")
-    print("set vmanage_username=admin")
-    print("set vmanage_password=admin")
-    print("For MAC OSX Workstation, vManage details must be set via environment variables using below commands")
-    print("export vmanage_host=198.18.1.10")
-    print("export vmanage_port=8443")
-    print("export vmanage_username=admin")
-    print("export vmanage_password=admin")
-    exit()
-
-class Authentication:
-
-    @staticmethod
-    def get_jsessionid(vmanage_host, vmanage_port, username, password):
-        api = "/j_security_check"
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        url = base_url + api
-        payload = {'j_username' : username, 'j_password' : password}
-        
-        response = requests.post(url=url, data=payload, verify=False)
-        try:
-            cookies = response.headers["Set-Cookie"]
-            jsessionid = cookies.split(";")
-            return(jsessionid[0])
-        except:
-            click.echo("No valid JSESSION ID returned\n")
-            exit()
-       
-    @staticmethod
-    def get_token(vmanage_host, vmanage_port, jsessionid):
-        headers = {'Cookie': jsessionid}
-        base_url = "https://%s:%s"%(vmanage_host, vmanage_port)
-        api = "/dataservice/client/token"
-        url = base_url + api      
-        response = requests.get(url=url, headers=headers, verify=False)
-        if response.status_code == 200:
-            return(response.text)
-        else:
-            return None
+from vmanage_session import get_catalog, get_manager, wait_for_task
+from utilities.metrics import stats_option
+from utilities.tools import lazy_import
 
+requests = lazy_import("requests")  # Imported by the first API call
+tabulate = lazy_import("tabulate")  # Imported by the table output
 
-def get_device_ids(jsessionid,token,template_id):
-
-    if token is not None:
-        headers = {'Content-Type': "application/json",'Cookie': jsessionid, 'X-XSRF-TOKEN': token}
-    else:
-        headers = {'Content-Type': "application/json",'Cookie': jsessionid}
+class TemplateInputError(Exception):
+    """ The attached devices or config inputs of a device template could not be retrieved.
+    """
+    def __init__(self, template_id, message):
+        super().__init__(message)
+        self.template_id = template_id
 
-    base_url = "https://%s:%s/dataservice"%(vmanage_host,vmanage_port)
+def get_device_ids(manager,template_id):
 
     api_url = '/template/device/config/attached/' + template_id
 
-    url = base_url + api_url
-
-    response = requests.get(url=url, headers=headers,verify=False)
+    response = manager._api_request("GET", api_url)
 
     if response.status_code == 200:
         device_ids = []
@@ -81,15 +32,9 @@ def get_device_ids(jsessionid,token,template_id):
             device_ids.append(device['uuid'])
         return device_ids
     else:
-        click.echo("Failed to get device ids " + str(response.text))
-        exit()
+        raise TemplateInputError(template_id, "Failed to get device ids " + str(response.text))
 
-def get_device_inputs(jsessionid,token,template_id, device_ids):
-
-    if token is not None:
-        headers = {'Content-Type': "application/json",'Cookie': jsessionid, 'X-XSRF-TOKEN': token}
-    else:
-        headers = {'Content-Type': "application/json",'Cookie': jsessionid}
+def get_device_inputs(manager,template_id, device_ids):
 
     payload = {
         'templateId': template_id,
@@ -98,13 +43,9 @@ def get_device_inputs(jsessionid,token,template_id, device_ids):
         'isMasterEdited': False
     }
 
-    base_url = "https://%s:%s/dataservice"%(vmanage_host,vmanage_port)
-
     api_url = '/template/device/config/input'
 
-    url = base_url + api_url    
-
-    response = requests.post(url=url, headers=headers, data=json.dumps(payload), verify=False)
+    response = manager._api_request("POST", api_url, json=payload)
 
     if response.status_code == 200:
 
@@ -114,27 +55,111 @@ def get_device_inputs(jsessionid,token,template_id, device_ids):
             input['csv-templateId'] = template_id
     
     else:
-        click.echo("Failed to get device config input " + str(response.text))
-        exit()
+        raise TemplateInputError(template_id, "Failed to get device config input " + str(response.text))
 
     return device_inputs
 
-Auth = Authentication()
-jsessionid = Auth.get_jsessionid(vmanage_host,vmanage_port,vmanage_username,vmanage_password)
-token = Auth.get_token(vmanage_host,vmanage_port,jsessionid)
+def get_template_inputs(manager, template_ids):
+    """ Collect the attached device ids and config inputs of several templates concurrently.
+
+        Each template needs two dependent calls (attached devices, then their inputs); templates
+        are processed in parallel over the Manager's keep-alive pool.
+        Returns a list of (template_id, device_inputs), in the order of template_ids.
+        Raises TemplateInputError after reporting every template that failed.
+    """
+    def collect(template_id):
+        device_ids = get_device_ids(manager,template_id)
+        return template_id, get_device_inputs(manager,template_id,device_ids)
+
+    template_ids = list(template_ids)
+    if not template_ids:
+        return []
+
+    # Authenticate once before fanning out
+    manager._ensure_authenticated()
+
+    inputs = dict()
 
-if token is not None:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid, 'X-XSRF-TOKEN': token}
-else:
-    header = {'Content-Type': "application/json",'Cookie': jsessionid}
+    with ThreadPoolExecutor(max_workers=min(len(template_ids), manager.pool_size)) as executor:
+        futures = {executor.submit(collect, template_id): template_id for template_id in template_ids}
+        for future in as_completed(futures):
+            template_id = futures[future]
+            try:
+                inputs[template_id] = future.result()
+            except (TemplateInputError, requests.exceptions.RequestException) as e:
+                click.echo("Template %s: %s"%(template_id, e))
 
-base_url = "https://%s:%s/dataservice"%(vmanage_host, vmanage_port)
+    failed = [template_id for template_id in template_ids if template_id not in inputs]
+    if failed:
+        raise TemplateInputError(failed[0], "Failed to get device inputs of templates %s"%", ".join(failed))
+
+    return [inputs[template_id] for template_id in template_ids]
+
+def set_preferred_color(policy_def, seq_name, color):
+    """ Set the SLA class preferred color of a sequence in an app route policy definition (in place).
+        Returns the number of preferredColor parameters updated, 0 if the sequence was not found.
+    """
+    updated = 0
+    for sequence in policy_def["sequences"]:
+        if sequence["sequenceName"] == seq_name:
+            for action in sequence["actions"]:
+                if action['type'] == 'slaClass':
+                    for parameter in action['parameter']:
+                        if parameter["field"] == 'preferredColor':
+                            parameter["value"] = color
+                            updated += 1
+    return updated
+
+def policy_definition_payload(policy_def):
+    """ Body of the PUT used to update an app route policy definition.
+    """
+    return {
+                "name": policy_def["name"] ,
+                "type": policy_def["type"],
+                "description": policy_def["description"] ,
+                "sequences": policy_def["sequences"]
+           }
+
+def attach_templates(manager, template_ids):
+    """ Re-attach the devices of the given (edited) master templates with one attachfeature request.
+        Returns the utilities.tasks.ActionStatus of the attach task, raises TemplateInputError when
+        the device inputs of a template could not be retrieved (nothing is attached then).
+    """
+    inputs = get_template_inputs(manager, template_ids)
+    click.echo("\nRetrieved device inputs for %d templates"%len(inputs))
+
+    device_template_list = []
+
+    for (template_id, device_input) in inputs:
+        device_template_list.append({
+            'templateId': template_id,
+            'isEdited': True,
+            'device': device_input
+        })
+
+    #api_url for CLI template 'template/device/config/attachcli'
+
+    api_url = '/template/device/config/attachfeature'
+
+    payload = { 'deviceTemplateList': device_template_list }
+
+    response = manager._api_request("POST", api_url, json=payload)
+
+    if response.status_code == 200:
+        process_id = response.json()["id"]
+    else:
+        click.echo("Template attach process failed " + str(response.text))
+        exit()
+
+    return wait_for_task(process_id, "Template attach")
 
 @click.group()
-def cli():
+@stats_option
+@click.pass_context
+def cli(ctx, stats):
     """Command line tool for vManage Templates and Policy Configuration APIs.
     """
-    pass
+    ctx.meta["stats"] = stats
 
 @click.command()
 def template_list():
@@ -143,11 +168,12 @@ def template_list():
     """
     click.secho("Retrieving the templates available.")
 
-    url = base_url + "/template/device"
+    api_path = "/template/device"
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
+        get_catalog().store("device_templates", items, response.headers.get("ETag"))
     else:
         print("Failed to get list of templates")
         exit()
@@ -170,11 +196,12 @@ def policy_list():
     """
     click.secho("Retrieving the Centralized Policies available.")
 
-    url = base_url + "/template/policy/vsmart"
+    api_path = "/template/policy/vsmart"
 
-    response = requests.get(url=url, headers=header,verify=False)
+    response = get_manager()._api_request("GET", api_path)
     if response.status_code == 200:
         items = response.json()['data']
+        get_catalog().store("vsmart_policies", items, response.headers.get("ETag"))
     else:
         print("Failed to get list of policies")
         exit()
@@ -197,43 +224,31 @@ def activate_policy(name):
         \nExample command: ./vmanage_config_apis.py activate-policy --name MultiTopologyPlusAppRoute
     """
 
-    policy_uuid = ""
-    url = base_url + "/template/policy/vsmart"
-
-    response = requests.get(url=url, headers=header,verify=False)
-    if response.status_code == 200:
-        items = response.json()['data']
-        for item in items:
-            if item["policyName"] == name:
-                policy_uuid = item['policyId']
-                click.echo("Policy UUID for %s is %s"%(name,policy_uuid))
-                break
-    else:
+    try:
+        policy_uuid = get_catalog().get_id("vsmart_policies", name)
+    except requests.exceptions.RequestException:
         click.echo("Failed to get list of policies")
         exit()
 
-    if policy_uuid == "":
+    if policy_uuid:
+        click.echo("Policy UUID for %s is %s"%(name,policy_uuid))
+    else:
         click.echo("Failed to find Policy UUID for %s, Please check if policy exists on vManage"%name)
         exit()
 
-    url = base_url + "/template/policy/vsmart/activate/%s?confirm=true"%policy_uuid
+    api_path = "/template/policy/vsmart/activate/%s?confirm=true"%policy_uuid
 
     payload = {}
 
-    response = requests.post(url=url, headers=header, data=json.dumps(payload),verify=False)
+    response = get_manager()._api_request("POST", api_path, json=payload)
     if response.status_code == 200:
         process_id = response.json()['id']
-        url = base_url + "/device/action/status/" + process_id
-        while(1):
-            policy_status_res = requests.get(url,headers=header,verify=False)
-            if policy_status_res.status_code == 200:
-                policy_push_status = policy_status_res.json()
-                if policy_push_status['summary']['status'] == "done":
-                    if 'Success' in policy_push_status['summary']['count']:
-                        click.echo("\nSuccessfully activated vSmart Policy %s"%name)
-                    elif 'Failure' in policy_push_status['summary']['count']:
-                        click.echo("\nFailed to activate vSmart Policy %s"%name)
-                    break
+        get_catalog().invalidate("vsmart_policies")
+        task = wait_for_task(process_id, "Activate vSmart Policy %s"%name)
+        if task.succeeded:
+            click.echo("\nSuccessfully activated vSmart Policy %s"%name)
+        else:
+            click.echo("\nFailed to activate vSmart Policy %s"%name)
     else:
         click.echo("\nFailed to activate vSmart Policy %s"%name)
 
@@ -244,43 +259,31 @@ def deactivate_policy(name):
         \nExample command: ./vmanage_config_apis.py deactivate-policy --name MultiTopologyPlusAppRoute
     """
 
-    policy_uuid = ""
-    url = base_url + "/template/policy/vsmart"
-
-    response = requests.get(url=url, headers=header,verify=False)
-    if response.status_code == 200:
-        items = response.json()['data']
-        for item in items:
-            if item["policyName"] == name:
-                policy_uuid = item['policyId']
-                click.echo("Policy UUID for %s is %s"%(name,policy_uuid))
-                break
-    else:
+    try:
+        policy_uuid = get_catalog().get_id("vsmart_policies", name)
+    except requests.exceptions.RequestException:
         click.echo("Failed to get list of policies")
         exit()
 
-    if policy_uuid == "":
+    if policy_uuid:
+        click.echo("Policy UUID for %s is %s"%(name,policy_uuid))
+    else:
         click.echo("Failed to find Policy UUID for %s, Please check if policy exists on vManage"%name)
         exit()
 
-    url = base_url + "/template/policy/vsmart/deactivate/%s?confirm=true"%policy_uuid
+    api_path = "/template/policy/vsmart/deactivate/%s?confirm=true"%policy_uuid
 
     payload = {}
 
-    response = requests.post(url=url, headers=header, data=json.dumps(payload),verify=False)
+    response = get_manager()._api_request("POST", api_path, json=payload)
     if response.status_code == 200:
         process_id = response.json()['id']
-        url = base_url + "/device/action/status/" + process_id
-        while(1):
-            policy_status_res = requests.get(url,headers=header,verify=False)
-            if policy_status_res.status_code == 200:
-                policy_push_status = policy_status_res.json()
-                if policy_push_status['summary']['status'] == "done":
-                    if 'Success' in policy_push_status['summary']['count']:
-                        click.echo("\nSuccessfully deactivated vSmart Policy %s"%name)
-                    elif 'Failure' in policy_push_status['summary']['count']:
-                        click.echo("\nFailed to deactivate vSmart Policy %s"%name)
-                    break
+        get_catalog().invalidate("vsmart_policies")
+        task = wait_for_task(process_id, "Deactivate vSmart Policy %s"%name)
+        if task.succeeded:
+            click.echo("\nSuccessfully deactivated vSmart Policy %s"%name)
+        else:
+            click.echo("\nFailed to deactivate vSmart Policy %s"%name)
     else:
         click.echo("\nFailed to deactivate vSmart Policy %s"%name)
 
@@ -294,6 +297,7 @@ def approute_modify_color(name,seq_name,pref_color):
     """
     try:
         
+        manager = get_manager()
         new_path = pref_color
         app_route_policy_name = name
 
@@ -301,43 +305,29 @@ def approute_modify_color(name,seq_name,pref_color):
             click.echo("\nInput parameters App route policy name or Sequence name or Preferred color is missing")  
             exit()   
 
-        # Get app aware route policies 
+        # Get app aware route policy id
 
-        api_url = "/template/policy/definition/approute"        
-
-        url = base_url + api_url
-        
-        response = requests.get(url=url, headers=header, verify=False)
-
-        if response.status_code == 200:
-            app_aware_policy = response.json()["data"]
-            for item in app_aware_policy:
-                if item["name"] == app_route_policy_name:
-                    app_aware_policy_id = item["definitionId"]
-                    break     
-        else:
+        try:
+            app_aware_policy_id = get_catalog().get_id("approute_policies", app_route_policy_name)
+        except requests.exceptions.RequestException:
             click.echo("\nFailed to get app route policies list\n")
-            exit()  
+            exit()
+
+        if app_aware_policy_id is None:
+            click.echo("\nFailed to find app route policy %s\n"%app_route_policy_name)
+            exit()
 
         # Get app aware route policy sequences definition 
 
         api_url = "/template/policy/definition/approute/%s"%app_aware_policy_id
 
-        url = base_url + api_url
-        
-        response = requests.get(url=url, headers=header, verify=False)
+        response = manager._api_request("GET", api_url)
 
         if response.status_code == 200:
-            temp = response.json()
-            for item1 in temp["sequences"]:
-                if item1["sequenceName"] == seq_name:
-                    for item2 in item1["actions"]:
-                        if item2['type'] == 'slaClass':
-                            for item3 in item2['parameter']:
-                                if item3["field"] == 'preferredColor':
-                                    item3["value"] = new_path
-
-            app_policy_def = temp
+            app_policy_def = response.json()
+            if not set_preferred_color(app_policy_def, seq_name, new_path):
+                click.echo("\nSequence %s with an SLA preferred color not found in policy %s"%(seq_name, name))
+                exit(1)
             click.echo("\nRetrieved app aware route policy definition for %s"%app_route_policy_name)
         else:
             click.echo("\nFailed to get app route policy sequences\n")
@@ -345,14 +335,10 @@ def approute_modify_color(name,seq_name,pref_color):
 
         # Update policy app route policy 
 
-        payload = {
-                    "name": app_policy_def["name"] ,
-                    "type": app_policy_def["type"],
-                    "description": app_policy_def["description"] ,
-                    "sequences": app_policy_def["sequences"]
-                  }
+        payload = policy_definition_payload(app_policy_def)
 
-        response = requests.put(url=url, headers=header, data=json.dumps(payload), verify=False)
+        response = manager._api_request("PUT", api_url, json=payload)
+        get_catalog().invalidate("approute_policies")
 
         if response.status_code == 200:
             master_templates_affected = response.json()['masterTemplatesAffected']
@@ -367,57 +353,141 @@ def approute_modify_color(name,seq_name,pref_color):
 
         # Get device uuid and csv variables for each template id which is affected by prefix list edit operation
 
-        inputs = []
+        try:
+            task = attach_templates(manager, master_templates_affected)
+        except TemplateInputError as e:
+            click.echo("\n%s, templates not re-attached"%e)
+            exit(1)
+        if task.succeeded:
+            click.echo("\nSuccessfully updated Preferred Color to %s in sequence %s of policy %s"%(pref_color,seq_name,name))
+        else:
+            click.echo("\nFailed to update Preferred Color to %s in sequence %s of policy %s"%(pref_color,seq_name,name))
 
-        for template_id in master_templates_affected:
-            device_ids = get_device_ids(jsessionid,token,template_id)
-            device_inputs = get_device_inputs(jsessionid,token,template_id,device_ids)
-            inputs.append((template_id, device_inputs))
+    except Exception as e:
+        print('Exception line number: {}'.format(sys.exc_info()[-1].tb_lineno), type(e).__name__, e)
+            
 
+@click.command()
+@click.option("--changes_file", help="YAML file with the list of policy, sequence and color changes")
+def approute_modify_colors(changes_file):
+    """ Modify the Preferred Color of several sequences/policies in one batch.
+        \nEach policy definition is updated once and the affected master templates are re-attached once.
+        \nExample command: ./vmanage_config_apis.py approute-modify-colors --changes_file approute_color_changes.yaml
+    """
+    if changes_file is None:
+        click.echo("\nInput parameter changes_file is missing")
+        exit(1)
 
-        device_template_list = []
-        
-        for (template_id, device_input) in inputs:
-            device_template_list.append({
-                'templateId': template_id,
-                'isEdited': True,
-                'device': device_input
-            })
+    import yaml
 
+    with open(changes_file) as f:
+        config = yaml.safe_load(f.read())
 
-        #api_url for CLI template 'template/device/config/attachcli'
+    # Group the changes by policy: {policy name: [(sequence, color), ...]}
+    changes = dict()
+    for change in config.get("changes") or []:
+        if not change.get("policy") or not change.get("sequence") or not change.get("color"):
+            click.echo("\nInvalid change %s, policy, sequence and color are required"%change)
+            exit(1)
+        changes.setdefault(change["policy"], []).append((change["sequence"], change["color"]))
 
-        api_url = '/template/device/config/attachfeature'
+    if not changes:
+        click.echo("\nNo changes found in %s"%changes_file)
+        exit(1)
 
-        url = base_url + api_url
+    manager = get_manager()
 
-        payload = { 'deviceTemplateList': device_template_list }
+    # Resolve the app aware route policy ids
 
-        response = requests.post(url=url, headers=header,  data=json.dumps(payload), verify=False)
+    catalog = get_catalog()
+    try:
+        policy_ids = {name: catalog.get_id("approute_policies", name) for name in changes}
+    except requests.exceptions.RequestException:
+        click.echo("\nFailed to get app route policies list\n")
+        exit(1)
 
-        if response.status_code == 200:
-            process_id = response.json()["id"]
-        else:
-            click.echo("Template attach process failed " + str(response.text))     
+    missing = [name for name, policy_id in policy_ids.items() if policy_id is None]
+    if missing:
+        click.echo("\nApp route policies not found: %s"%", ".join(missing))
+        exit(1)
 
-        api_url = '/device/action/status/' + process_id  
+    # Fetch every policy definition and apply all of its sequence changes before updating any
+    # of them, so an unknown sequence or a failed GET leaves the Manager untouched
 
-        url = base_url + api_url
+    policy_defs = dict()
 
-        while(1):
-            policy_status_res = requests.get(url,headers=header,verify=False)
-            if policy_status_res.status_code == 200:
-                policy_push_status = policy_status_res.json()
-                if policy_push_status['summary']['status'] == "done":
-                    if 'Success' in policy_push_status['summary']['count']:
-                        click.echo("\nSuccessfully updated Preferred Color to %s in sequence %s of policy %s"%(pref_color,seq_name,name))
-                    elif 'Failure' in policy_push_status['summary']['count']:
-                        click.echo("\nFailed to update Preferred Color to %s in sequence %s of policy %s"%(pref_color,seq_name,name))
-                    break
+    for name, sequences in changes.items():
+        api_url = "/template/policy/definition/approute/%s"%policy_ids[name]
 
-    except Exception as e:
-        print('Exception line number: {}'.format(sys.exc_info()[-1].tb_lineno), type(e).__name__, e)
-            
+        try:
+            response = manager._api_request("GET", api_url)
+        except requests.exceptions.RequestException as e:
+            click.echo("\nFailed to get app route policy sequences of %s: %s\n"%(name, e))
+            exit(1)
+        if response.status_code != 200:
+            click.echo("\nFailed to get app route policy sequences of %s\n"%name)
+            exit(1)
+
+        app_policy_def = response.json()
+        for (seq_name, color) in sequences:
+            if not set_preferred_color(app_policy_def, seq_name, color):
+                click.echo("\nSequence %s with an SLA preferred color not found in policy %s"%(seq_name, name))
+                exit(1)
+        policy_defs[name] = (api_url, app_policy_def)
+
+    # Update each policy definition once, with all of its sequence changes
+
+    master_templates_affected = dict()      # ordered set of template ids
+    updated = list()
+    failure = None
+
+    for name, (api_url, app_policy_def) in policy_defs.items():
+        try:
+            response = manager._api_request("PUT", api_url, json=policy_definition_payload(app_policy_def))
+        except requests.exceptions.RequestException as e:
+            failure = "Failed to edit app route policy %s: %s"%(name, e)
+            break
+        finally:
+            catalog.invalidate("approute_policies")
+        if response.status_code != 200:
+            failure = "Failed to edit app route policy %s "%name + str(response.text)
+            break
+
+        updated.append(name)
+        click.echo("\nUpdated %d sequences of policy %s"%(len(changes[name]), name))
+        for template_id in response.json().get('masterTemplatesAffected') or []:
+            master_templates_affected[template_id] = True
+
+    if failure:
+        click.echo("\n" + failure)
+        not_updated = [name for name in policy_defs if name not in updated]
+        click.echo("\nPolicies updated: %s"%(", ".join(updated) or "none"))
+        click.echo("Policies not updated: %s"%", ".join(not_updated))
+
+    if not master_templates_affected:
+        if failure:
+            exit(1)
+        click.echo("\nSuccessfully updated Preferred Colors, no master templates affected")
+        return
+
+    # Re-attach every affected template a single time, also after a failed update: the
+    # policies already updated must reach the devices of their templates
+
+    click.echo("\nMaster templates affected: %s"%list(master_templates_affected))
+
+    try:
+        task = attach_templates(manager, master_templates_affected)
+    except TemplateInputError as e:
+        click.echo("\n%s, templates not re-attached"%e)
+        exit(1)
+    if failure:
+        click.echo("\nRe-attached the templates of the updated policies: %s"%("succeeded" if task.succeeded else "failed"))
+        exit(1)
+    if task.succeeded:
+        click.echo("\nSuccessfully updated Preferred Colors of %d policies"%len(changes))
+    else:
+        click.echo("\nFailed to update Preferred Colors of %d policies"%len(changes))
+        exit(1)
 
 
 cli.add_command(template_list)
@@ -425,6 +495,7 @@ cli.add_command(policy_list)
 cli.add_command(activate_policy)
 cli.add_command(deactivate_policy)
 cli.add_command(approute_modify_color)
+cli.add_command(approute_modify_colors)
 
 if __name__ == "__main__":
     cli()
\ No newline at end of file
@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+#
+# Shared vManage session for the lab scripts
+#
+# The lab tools use utilities.manager.Manager (from ../python): the session is
+# authenticated on the first API call only and all calls of a command reuse
+# the same pooled keep-alive connection. --help and argument errors never
+# reach vManage.
+#
+
+import os
+import sys
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python"))
+
+from utilities.catalog import Catalog
+from utilities.manager import Manager
+from utilities.tasks import wait_for_action
+
+
+def get_vmanage_credentials_from_env():
+    """ Read vManage details from the vmanage_* environment variables, exit with a help message if missing.
+    """
+    vmanage_host = os.environ.get("vmanage_host")
+    vmanage_port = os.environ.get("vmanage_port")
+    vmanage_username = os.environ.get("vmanage_username")
+    vmanage_password = os.environ.get("vmanage_password")
+
+    if vmanage_host is None or vmanage_port is None or vmanage_username is None or vmanage_password is None:
+        print("For Windows Workstation, vManage details must be set via environment variables using below commands")
+        print("set vmanage_host=198.18.1.10")
+        print("set vmanage_port=8443")
+        print("set vmanage_username=admin")
+        print("set vmanage_password=admin")
+        print("For MAC OSX Workstation, vManage details must be set via environment variables using below commands")
+        print("export vmanage_host=198.18.1.10")
+        print("export vmanage_port=8443")
+        print("export vmanage_username=admin")
+        print("export vmanage_password=admin")
+        exit()
+
+    return vmanage_host, vmanage_port, vmanage_username, vmanage_password
+
+
+def get_manager():
+    """ Return the Manager shared by the running click command, creating it on first use.
+
+        The Manager is stored on the root click context and logged out when the
+        command completes (only if it was actually authenticated).
+    """
+    root = click.get_current_context().find_root()
+    if not isinstance(root.obj, Manager):
+        host, port, username, password = get_vmanage_credentials_from_env()
+        root.obj = Manager(host, port, username, password)
+        root.call_on_close(root.obj.logout)
+        if root.meta.get("stats"):
+            # --stats: print the API call summary on exit, before the logout
+            manager = root.obj
+            root.call_on_close(lambda: click.echo(manager.metrics.format_summary(), err=True))
+    return root.obj
+
+
+def get_catalog():
+    """ Return the policy/template name catalog of the running command (see utilities.catalog).
+
+        Cached lists are reused for vmanage_catalog_max_age seconds (default 300) before being
+        revalidated, and stored in vmanage_catalog_file (default cache/catalog_<host>_<port>.json).
+    """
+    root = click.get_current_context().find_root()
+    if "catalog" not in root.meta:
+        root.meta["catalog"] = Catalog(get_manager(), path=os.environ.get("vmanage_catalog_file"),
+                                       max_age=float(os.environ.get("vmanage_catalog_max_age", 300)))
+    return root.meta["catalog"]
+
+
+def print_device_progress(task, device):
+    """ Progress callback of wait_for_task: one line each time a device changes status.
+    """
+    click.echo("  %s (%s): %s" % (device.get("host-name", device.get("uuid", "-")), device.get("system-ip", "-"), device.get("status")))
+
+
+def wait_for_task(task_id, label=None):
+    """ Wait for a device action task (returned by a vManage POST as {"id": ...}) and print per-device progress.
+
+        Polling backs off while nothing changes; the deadline (seconds) can be set with
+        the vmanage_task_timeout environment variable (default 1800).
+        Returns the utilities.tasks.ActionStatus of the task.
+    """
+    timeout = float(os.environ.get("vmanage_task_timeout", 1800))
+    task = wait_for_action(get_manager(), task_id, label, timeout=timeout, on_progress=print_device_progress)
+    if task.timed_out:
+        click.echo("\n%s did not complete within %d seconds, last status: %s" % (task.label, timeout, task.status))
+    return task
@@ -1,9 +1,16 @@
 from flask import Flask, request, jsonify
 from flask_basicauth import BasicAuth
+import click
 import json
-import datetime
-import pytz
-import tabulate
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python"))
+
+from alarm_pipeline import AlarmAggregator, ConsoleSink, Dispatcher, FileSink, HttpSink, SyslogSink, flush_loop
+from alarm_spool import Spool, SpoolReader
+from utilities.tools import TimestampFormatter
 
 app = Flask(__name__)
 
@@ -12,34 +19,113 @@ app.config['BASIC_AUTH_PASSWORD'] = 'sevt'
 
 basic_auth = BasicAuth(app)
 
+# Alarm storm handling: the first occurrence of an alarm (same rule name, device and
+# interface) is forwarded right away, its repeats are counted over a sliding dedup
+# window and summarized at most once per window. Events are forwarded to the configured
+# sinks with at most webhook_sink_rate events per second per sink; the others wait in a
+# per-sink backlog of at most webhook_sink_backlog events.
+dedup_window = int(os.environ.get("webhook_dedup_window", "60"))
+sink_rate = float(os.environ.get("webhook_sink_rate", "5"))
+sink_burst = float(os.environ.get("webhook_sink_burst", "20"))
+sink_backlog = int(os.environ.get("webhook_sink_backlog", "10000"))
+
+# Timezone used to display alarm times, e.g. export display_timezone=Europe/Paris
+display_timezone = os.environ.get("display_timezone", "America/Los_Angeles")
+formatter = TimestampFormatter(display_timezone, '%m/%d/%Y %H:%M:%S %Z')
+
+sinks = [ConsoleSink(time_formatter=formatter.format)]
+if os.environ.get("webhook_sink_file"):
+   sinks.append(FileSink(os.environ.get("webhook_sink_file")))
+if os.environ.get("webhook_sink_syslog"):
+   syslog_host, _, syslog_port = os.environ.get("webhook_sink_syslog").partition(":")
+   sinks.append(SyslogSink(syslog_host, syslog_port or 514))
+if os.environ.get("webhook_sink_http"):
+   sinks.append(HttpSink(os.environ.get("webhook_sink_http")))
+
+aggregator = AlarmAggregator(window=dedup_window)
+dispatcher = Dispatcher(sinks, rate=sink_rate, burst=sink_burst, backlog=sink_backlog)
+
+# Every notification is written to the on-disk spool before it is acknowledged.
+# Processing happens asynchronously from the spool, so a bad notification or a
+# restart never loses alarms: they can be re-processed with the replay command.
+# Processed spool segments are deleted once older than webhook_spool_retention seconds
+# (default 7 days, 0 deletes them as soon as they are processed).
+spool_dir = os.environ.get("webhook_spool_dir", "spool")
+spool_retention = int(os.environ.get("webhook_spool_retention", str(7 * 24 * 3600)))
+spool = None
+
+def process_alarm(data):
+   # Validate the notification before aggregating it
+   for field in ('entry_time', 'rule_name_display', 'severity', 'uuid', 'values'):
+      if field not in data:
+         raise KeyError(field)
+
+   aggregator.add(data)
+
 @app.route('/',methods=['POST'])
 @basic_auth.required
 def alarms():
+   # The spool is opened by the serve command, not when the app is started another way (e.g. flask run)
+   if spool is None:
+      return jsonify("Spool not open, start the receiver with: ./webhook.py serve"), 503
+
    try:
       data = json.loads(request.data)
-      PDT = pytz.timezone('America/Los_Angeles')
-            
-      temp_time = datetime.datetime.utcfromtimestamp(data['entry_time']/1000.)
-      temp_time = pytz.UTC.localize(temp_time).astimezone(PDT).strftime('%m/%d/%Y %H:%M:%S') + ' PDT'
-
-      table = list()
-      headers = ["Date & Time (PDT)", "Alarm Name" , "Severity", "Details" ]
-
-      tr = [ temp_time, data['rule_name_display'] , data['severity'], 
-             "UUID: " + data["uuid"] + "\nValues:\n" + json.dumps(data["values"] , sort_keys=True, indent=4) ]
-      
-      table.append(tr)
-        
-      try:
-          print(tabulate.tabulate(table, headers, tablefmt="fancy_grid"))
-      except UnicodeEncodeError:
-          print(tabulate.tabulate(table, headers, tablefmt="grid"))
-      
+      spool.append(data)
+
    except Exception as exc:
       print(exc)
       return jsonify(str(exc)), 500
-   
+
    return jsonify("Parsed Webhook Notification Successfully"), 200
 
+@click.group(invoke_without_command=True)
+@click.pass_context
+def cli(ctx):
+   """Webhook receiver for SD-WAN alarm notifications.
+   """
+   if ctx.invoked_subcommand is None:
+      ctx.invoke(serve)
+
+@click.command()
+@click.option("--port", default=5001, help="Listening port")
+def serve(port):
+   """ Receive alarm notifications (default command).
+       \nExample command: ./webhook.py serve --port 5001
+   """
+   global spool
+   spool = Spool(spool_dir, retention=spool_retention)
+   threading.Thread(target=spool.consume, args=(process_alarm,), daemon=True).start()
+   threading.Thread(target=flush_loop, args=(aggregator, dispatcher), daemon=True).start()
+   app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)
+
+@click.command()
+@click.option("--from_checkpoint", is_flag=True, help="Only replay alarms not yet processed")
+@click.option("--purge", is_flag=True, help="Delete processed spool segments after replay")
+def replay(from_checkpoint, purge):
+   """ Re-process alarms stored in the spool.
+       \nExample command: ./webhook.py replay --from_checkpoint
+   """
+   # Never writes to the segments. While a receiver owns the spool, the replay progress is
+   # kept in its own checkpoint and the segments cannot be purged.
+   replay_spool = SpoolReader(spool_dir)
+   owner = replay_spool.acquire()
+   if purge and not owner:
+      click.echo("A receiver is running on %s, stop it to purge the spool" % spool_dir)
+      return
+   try:
+      count = replay_spool.replay(process_alarm, from_checkpoint=from_checkpoint)
+      dispatcher.dispatch(aggregator.flush(force=True))
+      if dispatcher.drain():
+         click.echo("Could not forward %s event(s), dropped: %s" % (dispatcher.queued(), dispatcher.dropped))
+      click.echo("\nReplayed %s alarm(s) from %s" % (count, spool_dir))
+      if purge:
+         click.echo("Deleted %s processed spool segment(s)" % replay_spool.purge())
+   finally:
+      replay_spool.release()
+
+cli.add_command(serve)
+cli.add_command(replay)
+
 if __name__ == '__main__':
-   app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+   cli()
@@ -0,0 +1,132 @@
+# Device inventory: /device and /system/device/vedges merged by uuid, with lookups
+# by uuid, system IP, hostname and site, and the changes between two syncs (added
+# and removed devices, version, certificate, reachability, hostname, system IP and
+# site changes).
+# Copy of python/utilities/inventory.py without the file persistence (the container
+# only ships this directory); api/sdwan.py syncs it and keeps it in memory.
+# python/tests/test_mcp_copies.py checks that the copied definitions match.
+#
+# Example:
+#     inventory = await get_inventory()
+#     device = inventory.by_hostname("site1-edge1")
+
+import time
+from typing import Optional
+
+# source: API path
+SOURCES = {
+    "device": "dataservice/device",
+    "vedges": "dataservice/system/device/vedges",
+}
+
+# Compared fields: keys of the device entries, first one present wins (the two sources name some fields differently)
+FIELDS = {
+    "hostname": ("host-name",),
+    "system_ip": ("system-ip", "configuredSystemIP"),
+    "site_id": ("site-id", "siteId", "configuredSiteId"),
+    "version": ("version",),
+    "certificate": ("vedgeCertificateState", "certificate-validity"),
+    "reachability": ("reachability",),
+}
+
+
+def device_field(device: dict, field: str) -> Optional[str]:
+    """Value of a FIELDS field of a device entry, None if missing (e.g. device_field(device, "system_ip"))"""
+    for key in FIELDS[field]:
+        value = device.get(key)
+        if value not in (None, "", "--"):
+            return str(value)
+    return None
+
+
+class Inventory:
+    """Devices merged from the inventory sources, with indexes."""
+
+    def __init__(self, host: str, devices: list[dict], sources: dict, synced: Optional[float] = None):
+        self.host = host
+        self.devices = devices
+        self.sources = sources  # uuid: names of the sources listing the device
+        self.synced = synced or time.time()
+        self.changes: list[dict] = []  # Changes found by the sync that produced this inventory
+
+        self._by_uuid = {device["uuid"]: device for device in devices}
+        self._by_system_ip: dict = {}
+        self._by_hostname: dict = {}
+        self._by_site: dict = {}
+        for device in devices:
+            system_ip = device_field(device, "system_ip")
+            if system_ip:
+                self._by_system_ip[system_ip] = device
+            hostname = device_field(device, "hostname")
+            if hostname:
+                self._by_hostname[hostname.lower()] = device
+            site_id = device_field(device, "site_id")
+            if site_id:
+                self._by_site.setdefault(site_id, []).append(device)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def by_uuid(self, uuid: str) -> Optional[dict]:
+        return self._by_uuid.get(uuid)
+
+    def by_system_ip(self, system_ip: str) -> Optional[dict]:
+        return self._by_system_ip.get(system_ip)
+
+    def by_hostname(self, hostname: str) -> Optional[dict]:
+        """Case insensitive"""
+        return self._by_hostname.get(hostname.lower())
+
+    def by_site(self, site_id) -> list[dict]:
+        return self._by_site.get(str(site_id), [])
+
+    def find(self, key: str) -> Optional[dict]:
+        """Device by uuid, system IP or hostname"""
+        return self.by_uuid(key) or self.by_system_ip(key) or self.by_hostname(key)
+
+    def diff(self, newer: "Inventory") -> list[dict]:
+        """Changes from this inventory to a newer one: one dict per added or removed device and per changed field."""
+        changed_at = newer.synced
+        changes = []
+
+        def change(kind: str, device: dict, **extra) -> dict:
+            return {
+                "time": changed_at,
+                "change": kind,
+                "uuid": device["uuid"],
+                "hostname": device_field(device, "hostname"),
+                "system_ip": device_field(device, "system_ip"),
+                **extra,
+            }
+
+        for uuid, device in newer._by_uuid.items():
+            old = self._by_uuid.get(uuid)
+            if old is None:
+                changes.append(change("added", device))
+                continue
+            for field in FIELDS:
+                before, after = device_field(old, field), device_field(device, field)
+                if before != after:
+                    changes.append(change("changed", device, field=field, old=before, new=after))
+        for uuid, device in self._by_uuid.items():
+            if uuid not in newer._by_uuid:
+                changes.append(change("removed", device))
+        return changes
+
+    @classmethod
+    def from_payloads(cls, host: str, payloads: dict) -> "Inventory":
+        """Merge the responses of the SOURCES (source: payload) by uuid"""
+        merged: dict = {}
+        sources: dict = {}
+        # /device last: its live state (reachability, running version) wins over the WAN edge list
+        for source in ("vedges", "device"):
+            for item in payloads.get(source, {}).get("data", []):
+                uuid = item.get("uuid")
+                if not uuid:
+                    continue
+                merged.setdefault(uuid, {}).update(item)
+                sources.setdefault(uuid, []).append(source)
+        return cls(host, list(merged.values()), sources)
@@ -0,0 +1,245 @@
+# Builder of /statistics/<dataset>/aggregation payloads (rules, grouping fields,
+# histogram, metrics), validated against the dataset fields before they are sent.
+# Copy of python/utilities/queries.py without the Manager helpers (the container
+# only ships this directory); api/sdwan.py fetches the fields.
+# python/tests/test_mcp_copies.py checks that the copied definitions match.
+#
+# Example:
+#     query = tunnel_stats_query(["10.0.0.1"], ["10.0.0.2"], hours=1)
+#     query.validate(fields)
+#     data = await make_api_post(session, "dataservice" + query.path, query.payload())
+
+import copy
+import functools
+from datetime import date, datetime, timezone
+from typing import Iterable, Literal, Optional, Union
+
+MetricType = Literal["avg", "sum", "min", "max", "count"]
+HistogramType = Literal["minute", "hour", "day"]
+
+METRIC_TYPES = ("avg", "sum", "min", "max", "count")
+HISTOGRAM_TYPES = ("minute", "hour", "day")
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S UTC"
+
+# Metrics of the App route datasets, in the order of the tables
+APPROUTE_METRICS = ("vqoe_score", "latency", "loss_percentage", "jitter")
+
+
+class QueryError(ValueError):
+    """Invalid statistics query (unknown field, wrong type...)"""
+
+
+def format_time(value: Union[datetime, date, str], end_of_day: bool = False) -> str:
+    """Time value of a `between` rule: "YYYY-MM-DDTHH:MM:SS UTC" (dates: start or end of the day)"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime(TIME_FORMAT)
+    return f"{value.isoformat()}T{'23:59:59' if end_of_day else '00:00:00'} UTC"
+
+
+# ----------------------------------------------------------
+class Rule:
+    """
+    One query rule: field, operator (last_n_hours, between, in...), values and value type.
+    """
+
+    __slots__ = ("field", "operator", "values", "type")
+
+    def __init__(self, field: str, operator: str, values: Iterable, type: str = "string"):
+        self.field = field
+        self.operator = operator
+        self.values = tuple(str(value) for value in values)
+        self.type = type
+
+    def key(self) -> tuple:
+        return self.field, self.operator, self.values, self.type
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"Rule({self.field} {self.operator} {list(self.values)})"
+
+    def payload(self) -> dict:
+        return {"value": list(self.values), "field": self.field, "type": self.type, "operator": self.operator}
+
+
+# ----------------------------------------------------------
+class StatsQuery:
+    """
+    Immutable aggregation query of a statistics dataset (approute, approute/fec, interface...).
+    Every builder method returns a new query.
+    """
+
+    __slots__ = ("dataset", "condition", "rules", "fields", "histogram_spec", "metric_specs")
+
+    def __init__(
+        self,
+        dataset: str = "approute",
+        condition: Literal["AND", "OR"] = "AND",
+        rules: tuple = (),
+        fields: tuple = (),
+        histogram_spec: Optional[tuple] = None,
+        metric_specs: tuple = (),
+    ):
+        self.dataset = dataset
+        self.condition = condition
+        self.rules = rules
+        self.fields = fields  # (property, size) pairs, in sequence order
+        self.histogram_spec = histogram_spec  # (property, type, interval, order)
+        self.metric_specs = metric_specs  # (property, type) pairs
+
+    def _replace(self, **changes) -> "StatsQuery":
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return StatsQuery(**values)
+
+    def key(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, StatsQuery) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    @property
+    def path(self) -> str:
+        return f"/statistics/{self.dataset}/aggregation"
+
+    # ----- rules -----
+
+    def where(self, rule: Rule) -> "StatsQuery":
+        return self._replace(rules=self.rules + (rule,))
+
+    def last_n_hours(self, hours: int, field: str = "entry_time") -> "StatsQuery":
+        return self.where(Rule(field, "last_n_hours", [hours], "date"))
+
+    def between(self, start: Union[datetime, date, str], end: Union[datetime, date, str], field: str = "entry_time") -> "StatsQuery":
+        """Time range, datetimes (naive ones are taken as UTC), dates (whole days) or preformatted strings"""
+        return self.where(Rule(field, "between", [format_time(start), format_time(end, end_of_day=True)], "date"))
+
+    def where_in(self, field: str, values: Iterable, type: str = "string") -> "StatsQuery":
+        values = list(values)
+        if not values:
+            return self
+        return self.where(Rule(field, "in", values, type))
+
+    # ----- aggregation -----
+
+    def group_by(self, *properties: str, size: Optional[int] = None) -> "StatsQuery":
+        """Grouping fields, in sequence order. size applies to the first one (e.g. 6000 tunnel names)."""
+        fields = self.fields + tuple((prop, size if index == 0 else None) for index, prop in enumerate(properties))
+        return self._replace(fields=fields)
+
+    def histogram(
+        self, property: str = "entry_time", type: HistogramType = "hour", interval: int = 1, order: Literal["asc", "desc"] = "asc"
+    ) -> "StatsQuery":
+        return self._replace(histogram_spec=(property, type, interval, order))
+
+    def metrics(self, *properties: str, type: MetricType = "avg") -> "StatsQuery":
+        return self._replace(metric_specs=self.metric_specs + tuple((prop, type) for prop in properties))
+
+    # ----- payload -----
+
+    def payload(self) -> dict:
+        """Request payload (a copy of the memoized one, callers may change it)"""
+        return copy.deepcopy(_build_payload(self))
+
+    def validate(self, fields: list[dict]):
+        """
+        Check the query against the dataset fields ({"property": ..., "dataType": ...} items).
+
+        Raises:
+            QueryError: on the first problem found
+        """
+        _validate(self, tuple((item.get("property"), str(item.get("dataType", "")).lower()) for item in fields))
+
+
+@functools.lru_cache(maxsize=256)
+def _build_payload(query: StatsQuery) -> dict:
+    payload: dict = {"query": {"condition": query.condition, "rules": [rule.payload() for rule in query.rules]}}
+
+    aggregation: dict = {}
+    if query.fields:
+        aggregation["field"] = []
+        for sequence, (prop, size) in enumerate(query.fields, 1):
+            field = {"property": prop, "sequence": sequence}
+            if size:
+                field["size"] = size
+            aggregation["field"].append(field)
+    if query.histogram_spec:
+        prop, type, interval, order = query.histogram_spec
+        aggregation["histogram"] = {"property": prop, "type": type, "interval": interval, "order": order}
+    if query.metric_specs:
+        aggregation["metrics"] = [{"property": prop, "type": type} for prop, type in query.metric_specs]
+    if aggregation:
+        payload["aggregation"] = aggregation
+    return payload
+
+
+@functools.lru_cache(maxsize=256)
+def _validate(query: StatsQuery, fields: tuple):
+    types = dict(fields)
+
+    def check(prop: str, usage: str) -> str:
+        if prop not in types:
+            raise QueryError(f"Unknown {query.dataset} field '{prop}' in {usage}")
+        return types[prop]
+
+    if not query.rules:
+        raise QueryError("A statistics query needs at least one rule (e.g. a time range)")
+    for rule in query.rules:
+        data_type = check(rule.field, "rules")
+        if (rule.type == "date") != (data_type == "date"):
+            raise QueryError(f"Rule on '{rule.field}' has type {rule.type}, the field is {data_type}")
+        if rule.operator == "last_n_hours" and not (len(rule.values) == 1 and rule.values[0].isdigit()):
+            raise QueryError(f"last_n_hours expects one whole number of hours, got {list(rule.values)}")
+        if rule.operator == "between" and len(rule.values) != 2:
+            raise QueryError(f"between expects a start and an end, got {list(rule.values)}")
+        if rule.operator == "in" and not rule.values:
+            raise QueryError(f"Empty 'in' rule on '{rule.field}'")
+
+    for prop, _ in query.fields:
+        check(prop, "aggregation fields")
+    if query.histogram_spec:
+        prop, type, interval, _ = query.histogram_spec
+        if check(prop, "histogram") != "date":
+            raise QueryError(f"Histogram field '{prop}' is not a date")
+        if type not in HISTOGRAM_TYPES or interval < 1:
+            raise QueryError(f"Histogram interval must be a positive number of {', '.join(HISTOGRAM_TYPES)}")
+    for prop, type in query.metric_specs:
+        data_type = check(prop, "metrics")
+        if type not in METRIC_TYPES:
+            raise QueryError(f"Unknown metric type '{type}', expected one of {', '.join(METRIC_TYPES)}")
+        if type != "count" and data_type in ("string", "date", "boolean"):
+            raise QueryError(f"Metric {type} of '{prop}' needs a number, the field is {data_type}")
+
+
+def tunnel_stats_query(
+    local_ips: Iterable[str],
+    remote_ips: Iterable[str] = (),
+    hours: Optional[int] = 1,
+    start: Union[datetime, date, str, None] = None,
+    end: Union[datetime, date, str, None] = None,
+    dataset: str = "approute",
+) -> StatsQuery:
+    """
+    Average App route metrics per tunnel name from local routers (optionally to remote routers),
+    over the last hours or between start and end.
+    """
+    query = StatsQuery(dataset)
+    query = query.between(start, end) if start is not None else query.last_n_hours(hours)
+    return (
+        query.where_in("local_system_ip", local_ips)
+        .where_in("remote_system_ip", remote_ips)
+        .group_by("name", size=6000)
+        .metrics(*APPROUTE_METRICS)
+    )
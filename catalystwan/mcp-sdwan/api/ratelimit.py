@@ -0,0 +1,140 @@
+# Per-endpoint-class request budget (rate + concurrency cap) of the vManage API
+# calls: realtime /device/*?deviceId= calls trigger a NETCONF fetch from the edge
+# and are throttled by vManage.
+# DEFAULT_LIMITS, classify_endpoint and parse_limits are copied from
+# python/utilities/ratelimit.py (the container only ships this directory), the
+# buckets are asyncio versions of its TokenBucket and RequestBudget.
+# python/tests/test_mcp_copies.py checks that the copies match.
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger("sdwan-mcp-server")
+
+# Endpoint classes and their default budget: (requests per second, concurrent requests).
+# 0 disables the corresponding limit. Realtime /device/*?deviceId= calls trigger a
+# NETCONF fetch from the edge and are throttled by vManage.
+DEFAULT_LIMITS = {
+    "realtime": (5, 4),
+    "statistics": (10, 8),
+    "config": (10, 4),
+    "admin": (5, 2),
+    "other": (20, 10),
+}
+
+
+def classify_endpoint(url: str) -> str:
+    """Return the endpoint class of a vManage API url, e.g. 'dataservice/device/counters?deviceId=...'."""
+    split = urlsplit(url)
+    route = "/" + split.path.lstrip("/")
+    if route.startswith("/dataservice/"):
+        route = route[len("/dataservice"):]
+    query = parse_qs(split.query)
+
+    if route.startswith("/device/") and "deviceId" in query:
+        return "realtime"
+    if route.startswith(("/statistics/", "/alarms", "/event")):
+        return "statistics"
+    if route.startswith(("/template/", "/v1/")):
+        return "config"
+    if route.startswith(("/admin/", "/settings/", "/certificate/")):
+        return "admin"
+    return "other"
+
+
+def parse_limits(spec: Optional[str]) -> dict:
+    """Parse a budget specification, e.g. 'realtime=2/4,statistics=20/8' (rate per second / concurrency)."""
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        try:
+            name, value = item.split("=")
+            rate, concurrency = value.split("/")
+            name = name.strip()
+            if name not in DEFAULT_LIMITS:
+                raise ValueError(f"unknown endpoint class '{name}'")
+            limits[name] = (float(rate), int(concurrency))
+        except ValueError as e:
+            raise ValueError(f"Invalid API limit '{item}', expected <class>=<rate>/<concurrency>: {e}") from None
+    return limits
+
+
+class AsyncTokenBucket:
+    """Token bucket for coroutines: tokens are refilled at `rate` per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        # The lock serializes waiters so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AsyncRequestBudget:
+    """Rate limit and concurrency cap per endpoint class for async API calls, with wait time metrics."""
+
+    def __init__(self, limits: Optional[dict] = None):
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self._buckets = {name: AsyncTokenBucket(rate) for name, (rate, _) in self.limits.items() if rate > 0}
+        self._slots = {
+            name: asyncio.Semaphore(concurrency) for name, (_, concurrency) in self.limits.items() if concurrency > 0
+        }
+        self._metrics = {name: {"requests": 0, "waited": 0, "wait_time": 0.0, "max_wait": 0.0, "in_flight": 0} for name in self.limits}
+
+    @asynccontextmanager
+    async def acquire(self, endpoint_class: str):
+        """Wait for a token and a free slot of the endpoint class, hold the slot for the duration of the block."""
+        if endpoint_class not in self.limits:
+            endpoint_class = "other"
+
+        start = time.monotonic()
+        bucket = self._buckets.get(endpoint_class)
+        if bucket:
+            await bucket.acquire()
+        slot = self._slots.get(endpoint_class)
+        if slot:
+            await slot.acquire()
+        wait = time.monotonic() - start
+
+        metrics = self._metrics[endpoint_class]
+        metrics["requests"] += 1
+        metrics["in_flight"] += 1
+        metrics["wait_time"] += wait
+        metrics["max_wait"] = max(metrics["max_wait"], wait)
+        if wait > 0.001:
+            metrics["waited"] += 1
+            logger.debug(f"Waited {wait:.3f}s for the {endpoint_class} API budget")
+        try:
+            yield wait
+        finally:
+            metrics["in_flight"] -= 1
+            if slot:
+                slot.release()
+
+    def stats(self) -> dict:
+        """Wait metrics per endpoint class: requests, requests that had to wait, total/average/max wait (seconds), in flight."""
+        return {
+            name: dict(metrics, avg_wait=metrics["wait_time"] / metrics["requests"] if metrics["requests"] else 0.0)
+            for name, metrics in self._metrics.items()
+            if metrics["requests"]
+        }
+
+
+# Budget shared by all API calls of the server, configurable with VMANAGE_API_LIMITS
+budget = AsyncRequestBudget(parse_limits(os.getenv("VMANAGE_API_LIMITS")))
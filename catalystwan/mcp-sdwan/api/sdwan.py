@@ -3,9 +3,14 @@ import json
 import logging
 import os
 import sys
+import time
 
 import httpx
 
+from api.inventory import SOURCES as INVENTORY_SOURCES, Inventory
+from api.queries import tunnel_stats_query
+from api.ratelimit import budget, classify_endpoint
+
 # Configure logging to stderr
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +25,9 @@ VMANAGE_PORT = os.getenv("VMANAGE_PORT", "443")
 VMANAGE_USERNAME = os.getenv("VMANAGE_USERNAME", "admin")
 VMANAGE_PASSWORD = os.getenv("VMANAGE_PASSWORD", "your-password")
 
+# Seconds the device inventory is reused by the lookups before it is synced again
+INVENTORY_MAX_AGE = float(os.getenv("INVENTORY_MAX_AGE", "300"))
+
 
 # === UTILITY FUNCTIONS ===
 
@@ -103,10 +111,11 @@ async def make_api_get_data(session: dict, url: str) -> list:
     async with httpx.AsyncClient(verify=False, timeout=30.0, cookies=session["cookies"]) as client:
         headers = {"X-XSRF-TOKEN": session["csrf_token"]}
 
-        response = await client.get(
-            f"{session['base_url']}/{url}",
-            headers=headers
-        )
+        async with budget.acquire(classify_endpoint(url)):
+            response = await client.get(
+                f"{session['base_url']}/{url}",
+                headers=headers
+            )
 
         if response.status_code != 200:
             raise Exception(f"Failed to get data from {url}: {response.status_code}")
@@ -121,10 +130,11 @@ async def make_api_get(session: dict, url: str) -> list:
     async with httpx.AsyncClient(verify=False, timeout=30.0, cookies=session["cookies"]) as client:
         headers = {"X-XSRF-TOKEN": session["csrf_token"]}
 
-        response = await client.get(
-            f"{session['base_url']}/{url}",
-            headers=headers
-        )
+        async with budget.acquire(classify_endpoint(url)):
+            response = await client.get(
+                f"{session['base_url']}/{url}",
+                headers=headers
+            )
 
         if response.status_code != 200:
             raise Exception(f"Failed to get data from {url}: {response.status_code}")
@@ -141,11 +151,12 @@ async def make_api_post(session: dict, url: str, payload: dict) -> dict:
     async with httpx.AsyncClient(verify=False, timeout=30.0, cookies=session["cookies"]) as client:
         headers = {"X-XSRF-TOKEN": session["csrf_token"]}
 
-        response = await client.post(
-            f"{session['base_url']}/{url}",
-            headers=headers,
-            json=payload
-        )
+        async with budget.acquire(classify_endpoint(url)):
+            response = await client.post(
+                f"{session['base_url']}/{url}",
+                headers=headers,
+                json=payload
+            )
 
         if response.status_code != 200:
             raise Exception(f"Failed to POST to {url}: {response.status_code} - {response.text}")
@@ -153,6 +164,43 @@ async def make_api_post(session: dict, url: str, payload: dict) -> dict:
         return response.json()
 
 
+# Fields of the statistics datasets, per vManage host and dataset (they only change with upgrades)
+_statistics_fields = {}
+
+async def get_statistics_fields(session: dict, dataset: str) -> list:
+    """
+    Fields of a statistics dataset (property and dataType), fetched once per process.
+    """
+    key = (session["base_url"], dataset)
+    if key not in _statistics_fields:
+        _statistics_fields[key] = await make_api_get(session=session, url=f"dataservice/statistics/{dataset}/fields")
+    return _statistics_fields[key]
+
+
+# Device inventory, per vManage host, synced at most every INVENTORY_MAX_AGE seconds
+_inventories = {}
+
+async def get_inventory(refresh: bool = False) -> Inventory:
+    """
+    Device inventory (/device and /system/device/vedges merged), with lookups by uuid, system IP, hostname and site.
+    A sync records the changes since the previous one in inventory.changes.
+    """
+    key = f"{VMANAGE_HOST}:{VMANAGE_PORT}"
+    previous = _inventories.get(key)
+    if previous and not refresh and time.time() - previous.synced < INVENTORY_MAX_AGE:
+        return previous
+
+    logger.info("Syncing device inventory...")
+    session_info = await authenticate_vmanage(VMANAGE_HOST, VMANAGE_PORT, VMANAGE_USERNAME, VMANAGE_PASSWORD)
+    payloads = await asyncio.gather(*(make_api_get(session=session_info, url=url) for url in INVENTORY_SOURCES.values()))
+    inventory = Inventory.from_payloads(VMANAGE_HOST, dict(zip(INVENTORY_SOURCES, payloads)))
+    if previous:
+        inventory.changes = previous.diff(inventory)
+    logger.info(f"Device inventory: {len(inventory)} devices, {len(inventory.changes)} changes since the previous sync")
+    _inventories[key] = inventory
+    return inventory
+
+
 # === API FUNCTIONS ===
 
 async def get_device_list():
@@ -196,85 +244,19 @@ async def get_approute_stats(rtr1_systemip: str, rtr2_systemip: str):
     logger.info("Authenticating with vManage...")
     session_info = await authenticate_vmanage(VMANAGE_HOST, VMANAGE_PORT, VMANAGE_USERNAME, VMANAGE_PASSWORD)
 
-    # Build query with Routers System IPs
-
-    # Query payloads
-
-    payload_r1_r2 = {
-        "query": {
-            "condition": "AND",
-            "rules": [
-                {
-                    "value": ["1"],
-                    "field": "entry_time",
-                    "type": "date",
-                    "operator": "last_n_hours",
-                },
-                {
-                    "value": [rtr1_systemip],
-                    "field": "local_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-                {
-                    "value": [rtr2_systemip],
-                    "field": "remote_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-            ],
-        },
-        "aggregation": {
-            "field": [{"property": "name", "sequence": 1, "size": 6000}],
-            "metrics": [
-                {"property": "loss_percentage", "type": "avg"},
-                {"property": "vqoe_score", "type": "avg"},
-                {"property": "latency", "type": "avg"},
-                {"property": "jitter", "type": "avg"},
-            ],
-        },
-    }
-
-    payload_r2_r1 = {
-        "query": {
-            "condition": "AND",
-            "rules": [
-                {
-                    "value": ["1"],
-                    "field": "entry_time",
-                    "type": "date",
-                    "operator": "last_n_hours",
-                },
-                {
-                    "value": [rtr2_systemip],
-                    "field": "local_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-                {
-                    "value": [rtr1_systemip],
-                    "field": "remote_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-            ],
-        },
-        "aggregation": {
-            "field": [{"property": "name", "sequence": 1, "size": 6000}],
-            "metrics": [
-                {"property": "loss_percentage", "type": "avg"},
-                {"property": "vqoe_score", "type": "avg"},
-                {"property": "latency", "type": "avg"},
-                {"property": "jitter", "type": "avg"},
-            ],
-        },
-    }
+    # Build queries with Routers System IPs, checked against the App route fields before they are sent
+
+    fields = await get_statistics_fields(session_info, "approute")
+    query_r1_r2 = tunnel_stats_query([rtr1_systemip], [rtr2_systemip], hours=1)
+    query_r2_r1 = tunnel_stats_query([rtr2_systemip], [rtr1_systemip], hours=1)
+    query_r1_r2.validate(fields)
+    query_r2_r1.validate(fields)
 
     # Get app route statistics for tunnels from router-1 to router-2
-    response1 = await make_api_post(session=session_info, url="dataservice/statistics/approute/aggregation", payload=payload_r1_r2)
+    response1 = await make_api_post(session=session_info, url="dataservice" + query_r1_r2.path, payload=query_r1_r2.payload())
 
     # Get app route statistics for tunnels from router-2 to router-1
-    response2 = await make_api_post(session=session_info, url="dataservice/statistics/approute/aggregation", payload=payload_r2_r1)
+    response2 = await make_api_post(session=session_info, url="dataservice" + query_r2_r1.path, payload=query_r2_r1.payload())
 
     return response1, response2
 
@@ -8,7 +8,7 @@ from dotenv import load_dotenv
 
 from mcp.server.fastmcp import FastMCP
 
-from api.sdwan import get_approute_stats, get_config_groups_and_profiles, get_device_list, get_device_status
+from api.sdwan import get_approute_stats, get_config_groups_and_profiles, get_device_list, get_device_status, get_inventory
 
 mcp = FastMCP()
 
@@ -88,15 +88,9 @@ async def get_device_details(device_name: str = "") -> str:
     logger.info(f"Getting details for device: {device_name}")
 
     try:
-        # Get all devices (assuming get_device_list is defined elsewhere)
-        devices = await get_device_list()
-
-        # Find specific device
-        target_device = None
-        for device in devices:
-            if device.get("host-name", "").lower() == device_name.lower():
-                target_device = device
-                break
+        # Find specific device in the inventory (synced at most every INVENTORY_MAX_AGE seconds)
+        inventory = await get_inventory()
+        target_device = inventory.by_hostname(device_name)
 
         if not target_device:
             return f"❌ Device '{device_name}' not found in the network"
@@ -127,6 +121,38 @@ async def get_device_details(device_name: str = "") -> str:
         return f"❌ Error: {str(e)}"
 
 
+# === MCP TOOL - INVENTORY CHANGES ===
+
+@mcp.tool("get_inventory_changes")
+async def get_inventory_changes() -> str:
+    """
+    Sync the device inventory and list the changes since the previous sync of this server:
+    added and removed devices, software version, certificate, reachability, hostname, system IP and site changes.
+    Returns:
+        str: Formatted string listing the changes or an error message.
+    """
+    logger.info("Syncing the device inventory")
+
+    try:
+        inventory = await get_inventory(refresh=True)
+
+        if not inventory.changes:
+            return f"✅ No inventory change since the previous sync ({len(inventory)} devices)."
+
+        result = f"✅ **{len(inventory.changes)} inventory changes** ({len(inventory)} devices)\n\n"
+        for change in inventory.changes:
+            device = f"{change['hostname'] or 'Unknown'} ({change['system_ip'] or change['uuid']})"
+            if change["change"] == "changed":
+                result += f"- {device}: {change['field']} {change['old']} → {change['new']}\n"
+            else:
+                result += f"- {device}: {change['change']}\n"
+        return result
+
+    except Exception as e:
+        logger.error(f"Error syncing the device inventory: {e}")
+        return f"❌ Error: {str(e)}"
+
+
 # === MCP TOOL - LIST SOFTWARE VERSIONS ===
 
 @mcp.tool("list_software_versions")
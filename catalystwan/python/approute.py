@@ -6,44 +6,86 @@
 # Managing App Route Statistics and Applications
 #
 # Description:
-#   List applications
+#   List applications (catalog cached per Manager version, see utilities/applications.py)
+#   Search applications by name prefix, family or appId
 #   List App route statistics between two routers
+#   Realtime App route statistics of all the tunnels of a device (sweep)
+#   Live App route statistics of many tunnels, refreshed on an interval (watch)
+#   Local history of the App route statistics (pull, history), see utilities/timeseries.py
 #
 # =========================================================================
 
 import cmd
 import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 
 import click
-import requests
-import tabulate
 
 # Import Manager class and the credentials function
+from utilities.applications import AppCatalog
+from utilities.logs import configure_logging
 from utilities.manager import Manager, get_manager_credentials_from_env
-from utilities.tools import save_payload
+from utilities.metrics import stats_option
+from utilities.output import RowWriter, get_output_format, info, output_option
+from utilities.queries import (
+    APPROUTE_METRICS,
+    QueryError,
+    SplitQueryRunner,
+    StatsQuery,
+    get_fields,
+    post_stats_query,
+    tunnel_stats_query,
+)
+from utilities.shell import shell_command
+from utilities.sla import SlaEvaluator, sla_classes_from_file, sla_classes_from_manager
+from utilities.timeseries import RESOLUTIONS, now_ms, open_store
+from utilities.tools import convert_timestamp, lazy_import, save_payload
+from utilities.watch import DEFAULT_THRESHOLDS, LiveTable, SampleHistory, breached
+
+requests = lazy_import("requests")  # Imported by the first API call
+
+
+def record_samples(method: str, *args, **kwargs) -> int:
+    """
+    Add App route samples to the local store (approute_store), e.g. record_samples("add_aggregation", data).
+    The store is optional: errors are logged and the command goes on.
+    """
+    try:
+        store = open_store()
+        if store is None:
+            return 0
+        with store:
+            count = getattr(store, method)(*args, **kwargs)
+            store.maintain()
+        return count
+    except sqlite3.Error as e:
+        logging.warning(f"App route samples not stored: {e}")
+        return 0
 
 
 # -----------------------------------------------------------------------------
-@click.group()
-@click.pass_context  # Pass the context object to the cli group
-def cli(ctx):
-    """Command line tool for to collect application names and tunnel performances"""
-    log_file_path = "sdwan_api.log"
-
-    logging.basicConfig(
-        filename=log_file_path,  # <--- Add this line to specify the log file
-        filemode="a",  # <--- Optional: 'a' for append (default), 'w' for overwrite
-        format="%(levelname)s (%(asctime)s): %(message)s (Line: %(lineno)d [%(filename)s])",
-        datefmt="%d/%m/%Y %I:%M:%S %p",
-        level=logging.INFO,
-    )
+# Commands that can run without the Manager (local store, cached catalog, SLA file): the group does not
+# read the credentials for them, they call connect() only when they need the API
+OFFLINE_COMMANDS = {"app-search", "approute-history", "approute-sla"}
+
+
+def connect(ctx) -> Manager:
+    """
+    Manager of the cli group context, created on first call: credentials from the environment,
+    logout (and --stats summary) when the command completes.
+    """
+    if ctx.obj is not None:
+        return ctx.obj
 
     # Get manager credentials from environment variables
-    print("\n--- Getting Manager credentials from environment variables ---")
+    info("\n--- Getting Manager credentials from environment variables ---", ctx)
     host, port, user, password = get_manager_credentials_from_env()
 
     # Create session with Cisco Catalyst SD-WAN Manager
-    print("\n--- Authenticating to SD-WAN Manager ---")
+    info("\n--- Authenticating to SD-WAN Manager ---", ctx)
     manager = Manager(host, port, user, password)
     ctx.obj = manager  # Store the manager object in the context
 
@@ -51,43 +93,64 @@ def cli(ctx):
     def logout_manager():
         if ctx.obj:  # Check if manager was successfully created
             ctx.obj.logout()
-            print("\n--- Logged out from SD-WAN Manager ---")
+            info("\n--- Logged out from SD-WAN Manager ---", ctx)
 
     ctx.call_on_close(logout_manager)
 
+    if ctx.params.get("stats"):
+        # Printed before the logout (callbacks run in reverse order)
+        ctx.call_on_close(lambda: click.echo(manager.metrics.format_summary(), err=True))
+    return manager
+
+
+# -----------------------------------------------------------------------------
+@click.group()
+@output_option
+@stats_option
+@click.pass_context  # Pass the context object to the cli group
+def cli(ctx, output_format, stats):
+    """Command line tool for to collect application names and tunnel performances"""
+    ctx.meta["output_format"] = output_format  # Shared with the sub-commands contexts
+    configure_logging()  # sdwan_api.log, rotated, see utilities/logs.py
+
+    # Inside `sdwan.py shell`, reuse the shell's authenticated session
+    if "shell_manager" in ctx.meta:
+        ctx.obj = ctx.meta["shell_manager"]
+        return
+
+    # Offline commands connect only if they need the API
+    if ctx.invoked_subcommand not in OFFLINE_COMMANDS:
+        connect(ctx)
+
 
 # -----------------------------------------------------------------------------
 @click.command()
+@click.option("--refresh", is_flag=True, help="Download the application catalog even if it is cached for this Manager version.")
 @click.pass_context  # Pass the context to the command
-def app_list(ctx):
+def app_list(ctx, refresh):
     """
     Retrieve the list of Applications.
+    The catalog is cached in cache/ per Manager version, use --refresh to download it again.
     Example command: python approute.py app-list
     """
 
-    print("Application List ")
-
-    api_path = "/device/dpi/application-mapping"
+    info("Application List ", ctx)
 
     # Get manager from context
     manager = ctx.obj
 
-    # Fetch API endpoint
+    # Fetch API endpoint (/device/dpi/application-mapping) once per Manager version
     try:
-        payload = manager._api_get(api_path)
-        data = payload.get("data", [])
+        catalog = AppCatalog.for_manager(manager, "dpi", refresh=refresh)
+        payload = catalog.payload
+        data = catalog.items
         save_payload(payload, "applications_header_data", "output/approute/")
         save_payload(data, "applications_data", "output/approute/")
         app_headers = ["App name", "Family", "ID"]
 
-        table = list()
-        # cli = cmd.Cmd() # This line is not needed here as cmd.Cmd is not used for columnize
-
-        for item in data:
-            tr = [item["name"], item["family"], item["appId"]]
-            table.append(tr)
-
-        click.echo(tabulate.tabulate(table, app_headers, tablefmt="fancy_grid"))
+        with RowWriter(app_headers, get_output_format(ctx)) as writer:
+            for item in data:
+                writer.write([item["name"], item["family"], item["appId"]])
 
     except requests.exceptions.RequestException as e:
         print(f"An unexpected error occurred: {e}")
@@ -98,8 +161,9 @@ def app_list(ctx):
 
 # -----------------------------------------------------------------------------
 @click.command()
+@click.option("--refresh", is_flag=True, help="Download the application catalog even if it is cached for this Manager version.")
 @click.pass_context  # Pass the context to the command
-def app_list2(ctx):
+def app_list2(ctx, refresh):
     """
     Retrieve the list of Applications (alternative display).
     Display app-name and family in multi-column view
@@ -107,15 +171,14 @@ def app_list2(ctx):
     """
     print("Application List (2)")
 
-    api_path = "/device/dpi/application-mapping"
-
     # Get manager from context
     manager = ctx.obj
 
-    # Fetch API endpoint for org name
+    # Fetch API endpoint (/device/dpi/application-mapping) once per Manager version
     try:
-        payload = manager._api_get(api_path)
-        data = payload.get("data", [])
+        catalog = AppCatalog.for_manager(manager, "dpi", refresh=refresh)
+        payload = catalog.payload
+        data = catalog.items
         save_payload(payload, "app_header_data", "output/approute/")
         save_payload(data, "app_data", "output/approute/")
 
@@ -136,34 +199,71 @@ def app_list2(ctx):
 
 # -----------------------------------------------------------------------------
 @click.command()
+@click.option("--refresh", is_flag=True, help="Download the application catalog even if it is cached for this Manager version.")
 @click.pass_context  # Pass the context to the command
-def app_qosmos(ctx):
+def app_qosmos(ctx, refresh):
     """
     Retrieve the list of Qosmos Applications (original Viptela classification engine)
     Example command: python approute.py app-qosmos
     """
-    print("Application List (qosmos)")
-
-    api_path = "/device/dpi/qosmos-static/applications"
+    info("Application List (qosmos)", ctx)
 
     # Get manager from context
     manager = ctx.obj
 
-    # Fetch API endpoint
+    # Fetch API endpoint (/device/dpi/qosmos-static/applications) once per Manager version
     try:
-        payload = manager._api_get(api_path)
-        data = payload.get("data", [])
+        catalog = AppCatalog.for_manager(manager, "qosmos", refresh=refresh)
+        payload = catalog.payload
+        data = catalog.items
         save_payload(payload, "app_qosmos_header_data", "output/approute/")
         save_payload(data, "app_qosmos_data", "output/approute/")
         app_headers = ["App name", "Family", "ID"]
 
-        table = list()
+        with RowWriter(app_headers, get_output_format(ctx)) as writer:
+            for item in data:
+                writer.write([item["name"], item["family"], item["appId"]])
+
+    except requests.exceptions.RequestException as e:
+        print(f"An unexpected error occurred: {e}")
+        if hasattr(e, "response") and e.response is not None:
+            print(f"Status: {e.response.status_code}, Response: {e.response.text}")
+        return
 
-        for item in data:
-            tr = [item["name"], item["family"], item["appId"]]
-            table.append(tr)
 
-        click.echo(tabulate.tabulate(table, app_headers, tablefmt="fancy_grid"))
+# -----------------------------------------------------------------------------
+@click.command()
+@click.argument("prefix", default="")
+@click.option("--family", help="Only the applications of this family (e.g. Collaboration).")
+@click.option("--app-id", help="Application with this appId.")
+@click.option("--source", type=click.Choice(["dpi", "qosmos"]), default="dpi", show_default=True, help="Application catalog.")
+@click.option("--offline", is_flag=True, help="Use the last downloaded catalog without contacting the Manager.")
+@click.option("--refresh", is_flag=True, help="Download the application catalog even if it is cached for this Manager version.")
+@click.pass_context  # Pass the context to the command
+def app_search(ctx, prefix, family, app_id, source, offline, refresh):
+    """
+    Search the application catalog by name prefix, family or appId.
+    Example command: python approute.py app-search micro --family Collaboration
+    """
+
+    try:
+        if offline:
+            catalog = AppCatalog.latest(source)
+            if catalog is None:
+                print(f"No {source} application catalog in cache/, run app-search once without --offline.")
+                return
+        else:
+            catalog = AppCatalog.for_manager(connect(ctx.parent), source, refresh=refresh)
+
+        if app_id:
+            apps = [item for item in [catalog.get_by_id(app_id)] if item]
+        else:
+            apps = catalog.search(prefix, family)
+
+        info(f"{len(apps)} of {len(catalog)} applications ({source} catalog, version {catalog.version})", ctx)
+        with RowWriter(["App name", "Family", "ID"], get_output_format(ctx)) as writer:
+            for item in apps:
+                writer.write([item["name"], item["family"], item["appId"]])
 
     except requests.exceptions.RequestException as e:
         print(f"An unexpected error occurred: {e}")
@@ -214,8 +314,7 @@ def approute_stats(ctx):
     Create Average Approute statistics for all tunnels between provided 2 routers for last 1 hour.
     Example command: python approute.py approute-stats
     """
-
-    api_path = "/statistics/approute/aggregation"
+    import tabulate
 
     # Get manager from context
     manager = ctx.obj
@@ -225,80 +324,13 @@ def approute_stats(ctx):
     rtr1_systemip = input("Enter Router-1 System IP address : ")
     rtr2_systemip = input("Enter Router-2 System IP address : ")
 
-    # Query payloads
-
-    payload_r1_r2 = {
-        "query": {
-            "condition": "AND",
-            "rules": [
-                {
-                    "value": ["1"],
-                    "field": "entry_time",
-                    "type": "date",
-                    "operator": "last_n_hours",
-                },
-                {
-                    "value": [rtr1_systemip],
-                    "field": "local_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-                {
-                    "value": [rtr2_systemip],
-                    "field": "remote_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-            ],
-        },
-        "aggregation": {
-            "field": [{"property": "name", "sequence": 1, "size": 6000}],
-            "metrics": [
-                {"property": "loss_percentage", "type": "avg"},
-                {"property": "vqoe_score", "type": "avg"},
-                {"property": "latency", "type": "avg"},
-                {"property": "jitter", "type": "avg"},
-            ],
-        },
-    }
+    # Queries (validated against /statistics/approute/fields before they are sent)
 
-    payload_r2_r1 = {
-        "query": {
-            "condition": "AND",
-            "rules": [
-                {
-                    "value": ["1"],
-                    "field": "entry_time",
-                    "type": "date",
-                    "operator": "last_n_hours",
-                },
-                {
-                    "value": [rtr2_systemip],
-                    "field": "local_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-                {
-                    "value": [rtr1_systemip],
-                    "field": "remote_system_ip",
-                    "type": "string",
-                    "operator": "in",
-                },
-            ],
-        },
-        "aggregation": {
-            "field": [{"property": "name", "sequence": 1, "size": 6000}],
-            "metrics": [
-                {"property": "loss_percentage", "type": "avg"},
-                {"property": "vqoe_score", "type": "avg"},
-                {"property": "latency", "type": "avg"},
-                {"property": "jitter", "type": "avg"},
-            ],
-        },
-    }
+    query_r1_r2 = tunnel_stats_query([rtr1_systemip], [rtr2_systemip], hours=1)
+    query_r2_r1 = tunnel_stats_query([rtr2_systemip], [rtr1_systemip], hours=1)
 
     try:
-        response = manager._api_post(api_path, payload=payload_r1_r2)
+        response = post_stats_query(manager, query_r1_r2)
         app_route_stats = response.get("data")
         save_payload(response, "approute_stats_r1r2_header_data", "output/approute/")
         save_payload(app_route_stats, "approute_stats_r1r2_data", "output/approute/")
@@ -326,7 +358,7 @@ def approute_stats(ctx):
         click.echo(tabulate.tabulate(table, app_route_stats_headers, tablefmt="fancy_grid"))
 
         # Get app route statistics for tunnels from router-2 to router-1
-        response = manager._api_post(api_path, payload=payload_r2_r1)
+        response = post_stats_query(manager, query_r2_r1)
         app_route_stats = response.get("data")
 
         save_payload(response, "approute_stats_r2r1_header_data", "output/approute/")
@@ -353,6 +385,9 @@ def approute_stats(ctx):
             table.append(tr)
         click.echo(tabulate.tabulate(table, app_route_stats_headers, tablefmt="fancy_grid"))
 
+    except QueryError as e:
+        print(f"Invalid query: {e}")
+        return
     except requests.exceptions.RequestException as e:
         print(f"An unexpected error occurred: {e}")
         if hasattr(e, "response") and e.response is not None:
@@ -368,6 +403,7 @@ def approute_device(ctx):
     Get Realtime Approute statistics for a specific tunnel for provided router and remote.
     Example command: python approute.py approute-device
     """
+    import tabulate
 
     # Get manager from context
     manager = ctx.obj
@@ -434,15 +470,505 @@ def approute_device(ctx):
 
 
 # -----------------------------------------------------------------------------
-if __name__ == "__main__":
-    # Add commands to the cli group
-    cli.add_command(app_list)
-    cli.add_command(app_list2)
-    cli.add_command(app_qosmos)
-    cli.add_command(approute_fields)
-    cli.add_command(approute_stats)
-    cli.add_command(approute_device)
+# Columns of the realtime /device/app-route/statistics entries shown by approute-device and approute-sweep
+APPROUTE_REALTIME_FIELDS = [
+    "vdevice-host-name",
+    "remote-system-ip",
+    "local-color",
+    "remote-color",
+    "index",
+    "mean-latency",
+    "mean-jitter",
+    "mean-loss",
+    "average-latency",
+    "average-jitter",
+    "loss",
+]
+
+
+def discover_tunnels(manager, system_ip: str, include_down: bool = False) -> list[tuple[str, str, str]]:
+    """
+    Tunnels of a device from its realtime BFD sessions.
+
+    Returns:
+        list: sorted (remote system IP, local color, remote color) tuples, one per tunnel
+    """
+    payload = manager._api_get("/device/bfd/sessions", params={"deviceId": system_ip})
+    tunnels = {
+        (item["system-ip"], item["local-color"], item["color"])
+        for item in payload.get("data", [])
+        if include_down or item.get("state") == "up"
+    }
+    return sorted(tunnels)
+
+
+def fetch_tunnel_stats(manager, system_ip: str, tunnel: tuple[str, str, str]) -> list[dict]:
+    """Realtime App route statistics of one tunnel of a device"""
+    remote_ip, local_color, remote_color = tunnel
+    params = {
+        "remote-system-ip": remote_ip,
+        "local-color": local_color,
+        "remote-color": remote_color,
+        "deviceId": system_ip,
+    }
+    return manager._api_get("/device/app-route/statistics", params=params).get("data", [])
+
+
+# -----------------------------------------------------------------------------
+@click.command()
+@click.option("--system-ip", prompt="Enter System IP address", help="System IP of the device.")
+@click.option("--remote", multiple=True, help="Only tunnels to this remote system IP, can be repeated.")
+@click.option("--color", multiple=True, help="Only tunnels with this local color, can be repeated.")
+@click.option("--include-down", is_flag=True, help="Also query tunnels whose BFD session is down.")
+@click.option("--workers", default=8, show_default=True, help="Maximum number of concurrent requests.")
+@click.pass_context  # Pass the context to the command
+def approute_sweep(ctx, system_ip, remote, color, include_down, workers):
+    """
+    Get Realtime Approute statistics for all the tunnels of a router.
+    The tunnels (remote system IP, local and remote colors) are discovered from the BFD sessions
+    of the router, then queried concurrently within the realtime API budget (manager_api_limits).
+    Example command: python approute.py --output jsonl approute-sweep --system-ip 10.0.0.1
+    """
+
+    # Get manager from context
+    manager = ctx.obj
+
+    try:
+        tunnels = discover_tunnels(manager, system_ip, include_down)
+    except requests.exceptions.RequestException as e:
+        print(f"An unexpected error occurred: {e}")
+        if hasattr(e, "response") and e.response is not None:
+            print(f"Status: {e.response.status_code}, Response: {e.response.text}")
+        return
+
+    tunnels = [
+        tunnel for tunnel in tunnels if (not remote or tunnel[0] in remote) and (not color or tunnel[1] in color)
+    ]
+    if not tunnels:
+        info(f"No BFD tunnel of {system_ip} matches the selection.", ctx)
+        return
+
+    workers = max(1, min(workers, manager.pool_size))
+    info(f"\nRealtime App route statistics of {len(tunnels)} tunnels of {system_ip} ({workers} workers)\n", ctx)
+
+    results = []
+    errors = []
+    with RowWriter(APPROUTE_REALTIME_FIELDS, get_output_format(ctx)) as writer, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_tunnel_stats, manager, system_ip, tunnel): tunnel for tunnel in tunnels}
+
+        # Rows are written as soon as each tunnel is collected
+        for future in as_completed(futures):
+            tunnel = futures[future]
+            try:
+                data = future.result()
+            except requests.exceptions.RequestException as e:
+                errors.append(f"{' '.join(tunnel)}: {e}")
+                continue
+            for item in data:
+                item.setdefault("local-color", tunnel[1])
+                item.setdefault("remote-color", tunnel[2])
+                writer.write([item.get(field) for field in APPROUTE_REALTIME_FIELDS])
+            results.extend(data)
+
+    save_payload(results, "approute_sweep_data", "output/approute/")
+    for error in errors:
+        info(f"Failed: {error}", ctx)
+
+
+# -----------------------------------------------------------------------------
+# Minutes between two histogram queries of approute-watch feeding the local store, also the bucket size
+STORE_MINUTES = 5
 
+
+def store_buckets(manager, store, local_ips: list[str], remote_ips: list[str], start: datetime, end: datetime) -> int:
+    """
+    Store the STORE_MINUTES buckets of the tunnels between start (rounded down to a bucket) and end.
+    Buckets already stored are replaced, so consecutive calls may overlap.
+
+    Raises:
+        requests.exceptions.RequestException, sqlite3.Error
+    """
+    start = start - timedelta(minutes=start.minute % STORE_MINUTES, seconds=start.second, microseconds=start.microsecond)
+    query = tunnel_stats_query(local_ips, remote_ips, start=start, end=end).histogram("entry_time", "minute", STORE_MINUTES)
+    count = store.add_aggregation(post_stats_query(manager, query).get("data", []))
+    store.maintain()
+    return count
+
+
+# -----------------------------------------------------------------------------
+def approute_window_query(local_ips: list[str], remote_ips: list[str], minutes: int) -> StatsQuery:
+    """
+    Aggregation query of the App route statistics per tunnel over the last minutes (sliding window).
+    """
+    end = datetime.now(timezone.utc)
+    return tunnel_stats_query(local_ips, remote_ips, start=end - timedelta(minutes=minutes), end=end)
+
+
+# -----------------------------------------------------------------------------
+@click.command()
+@click.option("--local", multiple=True, help="Local system IP of the tunnels, can be repeated (prompted if omitted).")
+@click.option("--remote", multiple=True, help="Only tunnels to this remote system IP, can be repeated.")
+@click.option("--interval", default=60, show_default=True, help="Seconds between two refreshes.")
+@click.option("--window", default=10, show_default=True, help="Minutes of statistics averaged at each refresh.")
+@click.option("--history", default=30, show_default=True, help="Samples kept per tunnel for the rolling average.")
+@click.option("--count", default=0, show_default=True, help="Number of refreshes, 0 to run until interrupted (Ctrl-C).")
+@click.option("--max-latency", default=DEFAULT_THRESHOLDS["latency"], show_default=True, help="Latency alert threshold (ms).")
+@click.option("--max-loss", default=DEFAULT_THRESHOLDS["loss_percentage"], show_default=True, help="Loss alert threshold (%).")
+@click.option("--max-jitter", default=DEFAULT_THRESHOLDS["jitter"], show_default=True, help="Jitter alert threshold (ms).")
+@click.pass_context  # Pass the context to the command
+def approute_watch(ctx, local, remote, interval, window, history, count, max_latency, max_loss, max_jitter):
+    """
+    Watch the App route statistics of the tunnels of one or more routers, refreshed on an interval.
+    One aggregation query per refresh covers all the tunnels; rows are only redrawn when they change
+    and metrics above their threshold are highlighted.
+    Example command: python approute.py approute-watch --local 10.0.0.1 --local 10.0.0.2 --interval 30
+    """
+    # Get manager from context
+    manager = ctx.obj
+
+    if not local:
+        local = [ip.strip() for ip in click.prompt("Enter local System IP addresses (comma-separated)").split(",")]
+
+    thresholds = {"latency": max_latency, "loss_percentage": max_loss, "jitter": max_jitter}
+    samples = SampleHistory(history)
+    output_format = get_output_format(ctx)
+
+    # Table: live view, other formats: stream the changed tunnels at each refresh
+    table = None
+    writer = None
+    if output_format == "table":
+        table = LiveTable(
+            [
+                ("Tunnel name", 48),
+                ("vQoE", 6),
+                ("Latency", 8),
+                ("Lat. chg", 8),
+                ("Loss %", 7),
+                ("Jitter", 7),
+                (f"Avg lat. ({history})", 14),
+                ("Samples", 7),
+            ]
+        )
+    else:
+        writer = RowWriter(["Time", "Tunnel name", *APPROUTE_METRICS, "Alerts"], output_format)
+
+    # Samples are also kept in the local store (see approute-history), from a histogram query of the
+    # 5 minute buckets run every STORE_MINUTES: the window averages overlap from one refresh to the next
+    store = open_store()
+    store_from = None  # Start of the next histogram query
+    stored_at = 0.0
+
+    refresh = 0
+    try:
+        while True:
+            started = time.monotonic()
+            now = datetime.now().strftime("%H:%M:%S")
+            try:
+                response = post_stats_query(manager, approute_window_query(local, remote, window))
+                data = response.get("data", [])
+            except QueryError as e:
+                print(f"Invalid query: {e}")
+                return
+            except requests.exceptions.RequestException as e:
+                data = None
+                if table:
+                    table.status(f"{now} refresh failed: {e}")
+                else:
+                    info(f"{now} refresh failed: {e}", ctx)
+
+            if data and store and (store_from is None or time.monotonic() - stored_at >= STORE_MINUTES * 60):
+                pulled = datetime.now(timezone.utc)
+                try:
+                    store_buckets(manager, store, local, remote, store_from or pulled - timedelta(minutes=window), pulled)
+                    # The last bucket was partial: the next query starts with it, and replaces it
+                    store_from, stored_at = pulled, time.monotonic()
+                except (requests.exceptions.RequestException, sqlite3.Error) as e:
+                    logging.warning(f"App route samples not stored: {e}")
+
+            if data is not None:
+                alerts = 0
+                for item in sorted(data, key=lambda item: item["name"]):
+                    key = item["name"]
+                    sample = {metric: item.get(metric) for metric in APPROUTE_METRICS}
+                    previous = samples.latest(key)
+                    samples.add(key, sample)
+                    over = breached(sample, thresholds)
+                    alerts += bool(over)
+
+                    if writer:
+                        if sample != previous:
+                            writer.write([now, key, *(sample[metric] for metric in APPROUTE_METRICS), ",".join(sorted(over))])
+                        continue
+
+                    red = {"fg": "red", "bold": True}
+                    styles = {index: red for index, metric in ((2, "latency"), (4, "loss_percentage"), (5, "jitter")) if metric in over}
+                    if over:
+                        styles[0] = red
+                    table.update(
+                        key,
+                        table.format_row(
+                            [
+                                key,
+                                sample["vqoe_score"],
+                                sample["latency"],
+                                samples.delta(key, "latency"),
+                                sample["loss_percentage"],
+                                sample["jitter"],
+                                samples.mean(key, "latency"),
+                                samples.count(key),
+                            ],
+                            styles,
+                        ),
+                    )
+
+                message = f"{now} {len(data)} tunnels, {alerts} above thresholds, last {window} min, refresh every {interval}s"
+                if table:
+                    table.status(message)
+                else:
+                    info(message, ctx)
+
+            if table:
+                table.flush()
+            else:
+                writer.stream.flush()
+
+            refresh += 1
+            if count and refresh >= count:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    except KeyboardInterrupt:
+        info("\nStopped.", ctx)
+    finally:
+        if writer:
+            writer.close()
+        if store:
+            store.close()
+
+
+# -----------------------------------------------------------------------------
+def approute_history_query(local_ips: list[str], remote_ips: list[str], hours: int, interval: int) -> StatsQuery:
+    """
+    Aggregation query of the App route statistics per tunnel and per interval (minutes) over the last hours.
+    """
+    return tunnel_stats_query(local_ips, remote_ips, hours=hours).histogram("entry_time", "minute", interval)
+
+
+# -----------------------------------------------------------------------------
+@click.command()
+@click.option("--local", multiple=True, help="Local system IP of the tunnels, can be repeated (prompted if omitted).")
+@click.option("--remote", multiple=True, help="Only tunnels to this remote system IP, can be repeated.")
+@click.option("--hours", default=24, show_default=True, help="Hours of statistics to pull.")
+@click.option("--timeout", default=60, show_default=True, help="Seconds allowed per request, larger queries are split.")
+@click.pass_context  # Pass the context to the command
+def approute_pull(ctx, local, remote, hours, timeout):
+    """
+    Pull the App route statistics of the last hours, in 5 minute buckets, into the local store.
+    Pulls can overlap, samples already stored are replaced. Queries that time out or return
+    too many tunnels are split by time range and routers, and run in parallel.
+    Example command: python approute.py approute-pull --local 10.0.0.1 --hours 48
+    """
+    # Get manager from context
+    manager = ctx.obj
+
+    if not local:
+        local = [ip.strip() for ip in click.prompt("Enter local System IP addresses (comma-separated)").split(",")]
+
+    query = approute_history_query(local, remote, hours, 5)
+    runner = SplitQueryRunner(manager, timeout=timeout)
+    try:
+        query.validate(get_fields(manager, query.dataset))
+        data = runner.run(query)
+    except QueryError as e:
+        print(f"Invalid query: {e}")
+        return
+    except requests.exceptions.RequestException as e:
+        print(f"An unexpected error occurred: {e}")
+        if hasattr(e, "response") and e.response is not None:
+            print(f"Status: {e.response.status_code}, Response: {e.response.text}")
+        return
+
+    count = record_samples("add_aggregation", data)
+    info(f"{count} samples of {len({item.get('name') for item in data})} tunnels stored ({runner.requests} requests).", ctx)
+    if runner.truncated:
+        info("Some tunnels are missing: the results were truncated, pull fewer routers at a time.", ctx)
+
+
+# -----------------------------------------------------------------------------
+@click.command()
+@click.option("--local", help="Local system IP of the tunnels.")
+@click.option("--remote", help="Remote system IP of the tunnels.")
+@click.option("--tunnel", help="Tunnel name, e.g. 10.0.0.1:mpls-10.0.0.2:mpls.")
+@click.option("--hours", default=24.0, show_default=True, help="Hours of history.")
+@click.option(
+    "--resolution",
+    type=click.Choice(["auto"] + list(RESOLUTIONS.values())),
+    default="auto",
+    show_default=True,
+    help="Sample resolution, auto: finest one still kept for the period.",
+)
+@click.option("--timezone", default="UTC", show_default=True, help="Timezone of the displayed times.")
+@click.pass_context  # Pass the context to the command
+def approute_history(ctx, local, remote, tunnel, hours, resolution, timezone):
+    """
+    Show the App route statistics kept in the local store, without querying the Manager.
+    The store is fed by approute-watch and approute-pull.
+    Example command: python approute.py approute-history --local 10.0.0.1 --hours 72
+    """
+    store = open_store()
+    if store is None:
+        print("The App route store is disabled (approute_store is empty).")
+        return
+
+    start = now_ms() - int(hours * 3600 * 1000)
+    seconds = None if resolution == "auto" else {name: value for value, name in RESOLUTIONS.items()}[resolution]
+    with store:
+        if seconds is None:
+            seconds = store.resolution_for(start)
+        rows = store.query(start, resolution=seconds, local_system_ip=local, remote_system_ip=remote, tunnel=tunnel)
+
+    info(f"{len(rows)} samples ({RESOLUTIONS[seconds]}) over the last {hours:g} hours from {store.path}", ctx)
+    headers = ["Time", "Tunnel name", "Samples", "Latency", "Max latency", "Loss percentage", "Jitter", "vQoE score"]
+    with RowWriter(headers, get_output_format(ctx)) as writer:
+        for row in rows:
+            writer.write(
+                [
+                    convert_timestamp(row["entry_time"], timezone),
+                    row["tunnel"],
+                    row["count"],
+                ]
+                + [
+                    None if row[metric] is None else round(row[metric], 2)
+                    for metric in ("latency", "latency_max", "loss_percentage", "jitter", "vqoe_score")
+                ]
+            )
+
+
+# -----------------------------------------------------------------------------
+@click.command()
+@click.option(
+    "--sla-file",
+    type=click.Path(exists=True, dir_okay=False),
+    help="YAML or JSON file of SLA classes, default: the SLA classes of the Manager.",
+)
+@click.option("--sla-class", help="Only evaluate this SLA class.")
+@click.option("--local", help="Local system IP of the tunnels.")
+@click.option("--remote", help="Remote system IP of the tunnels.")
+@click.option("--hours", default=24.0, show_default=True, help="Hours of history evaluated.")
+@click.option(
+    "--resolution",
+    type=click.Choice(["auto"] + list(RESOLUTIONS.values())),
+    default="auto",
+    show_default=True,
+    help="Sample resolution, auto: finest one still kept for the period.",
+)
+@click.option("--top", default=10, show_default=True, help="Number of worst tunnels listed, 0 for all tunnels in violation.")
+@click.option("--violations", "violation_limit", default=0, show_default=True, help="Also list up to this many violating samples.")
+@click.option("--timezone", default="UTC", show_default=True, help="Timezone of the displayed times.")
+@click.pass_context  # Pass the context to the command
+def approute_sla(ctx, sla_file, sla_class, local, remote, hours, resolution, top, violation_limit, timezone):
+    """
+    Evaluate the App route statistics kept in the local store against SLA classes (latency, loss, jitter),
+    and rank the tunnels by percentage of time in violation. Requires numpy.
+    Example command: python approute.py approute-sla --sla-file sla.yaml --hours 72 --top 20
+    """
+    store = open_store()
+    if store is None:
+        print("The App route store is disabled (approute_store is empty).")
+        return
+
+    try:
+        sla_classes = sla_classes_from_file(sla_file) if sla_file else sla_classes_from_manager(connect(ctx.parent))
+    except requests.exceptions.RequestException as e:
+        print(f"An unexpected error occurred: {e}")
+        return
+    if sla_class:
+        sla_classes = [item for item in sla_classes if item.name == sla_class]
+    if not sla_classes:
+        print("No SLA class to evaluate.")
+        return
+
+    try:
+        evaluator = SlaEvaluator(sla_classes)
+    except ImportError as e:
+        print(e)
+        return
+
+    start = now_ms() - int(hours * 3600 * 1000)
+    seconds = None if resolution == "auto" else {name: value for value, name in RESOLUTIONS.items()}[resolution]
+    with store:
+        if seconds is None:
+            seconds = store.resolution_for(start)
+        rows = store.query(start, resolution=seconds, local_system_ip=local, remote_system_ip=remote)
+    if not rows:
+        print(f"No App route samples in {store.path} for the last {hours:g} hours, see approute-pull.")
+        return
+
+    report = evaluator.evaluate(rows)
+    info(
+        f"{len(rows)} samples ({RESOLUTIONS[seconds]}) of {len(report.tunnels)} tunnels, "
+        f"SLA classes: {', '.join(item.name for item in sla_classes)}",
+        ctx,
+    )
+
+    worst = report.worst(top)
+    if not worst:
+        info("No tunnel in violation.", ctx)
+    headers = [
+        "Tunnel name",
+        "SLA class",
+        "Samples",
+        "% in violation",
+        "Latency",
+        "Max latency",
+        "Loss percentage",
+        "Max loss",
+        "Jitter",
+        "Max jitter",
+    ]
+    with RowWriter(headers, get_output_format(ctx)) as writer:
+        for row in worst:
+            writer.write(
+                [row["tunnel"], row["sla_class"], row["samples"], row["violation_pct"]]
+                + [row[key] for key in ("mean_latency", "max_latency", "mean_loss", "max_loss", "mean_jitter", "max_jitter")]
+            )
+
+    if violation_limit:
+        info(f"\nViolating samples (first {violation_limit})", ctx)
+        headers = ["Time", "Tunnel name", "SLA class", "Latency", "Loss percentage", "Jitter", "Breached"]
+        with RowWriter(headers, get_output_format(ctx)) as writer:
+            for row in report.violations(violation_limit):
+                writer.write(
+                    [
+                        convert_timestamp(row["entry_time"], timezone),
+                        row["tunnel"],
+                        row["sla_class"],
+                        row["latency"],
+                        row["loss"],
+                        row["jitter"],
+                        row["breached"],
+                    ]
+                )
+
+
+# -----------------------------------------------------------------------------
+# Add commands to the cli group (also loaded by the sdwan.py entry point)
+cli.add_command(app_list)
+cli.add_command(app_list2)
+cli.add_command(app_qosmos)
+cli.add_command(app_search)
+cli.add_command(approute_fields)
+cli.add_command(approute_stats)
+cli.add_command(approute_device)
+cli.add_command(approute_sweep)
+cli.add_command(approute_watch)
+cli.add_command(approute_pull)
+cli.add_command(approute_history)
+cli.add_command(approute_sla)
+cli.add_command(shell_command(prompt="approute> "))
+
+
+if __name__ == "__main__":
     # Call the cli group.
     # The authentication and logout will be handled by the cli group's context and teardown callback.
     cli()
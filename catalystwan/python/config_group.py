@@ -11,29 +11,28 @@
 #
 # =========================================================================
 
-import logging
-
 import click
 
 # Import the new unified Manager class and the credentials function
+from utilities.logs import configure_logging
 from utilities.manager import Manager, get_manager_credentials_from_env
+from utilities.metrics import stats_option
+from utilities.shell import shell_command
 from utilities.tools import convert_timestamp, save_payload
 
 
 # -----------------------------------------------------------------------------
 @click.group()
+@stats_option
 @click.pass_context  # Pass the context object to the cli group
-def cli(ctx):
+def cli(ctx, stats):
     """Command line tool for to collect application names and tunnel performances"""
-    log_file_path = "sdwan_api.log"
+    configure_logging()  # sdwan_api.log, rotated, see utilities/logs.py
 
-    logging.basicConfig(
-        filename=log_file_path,  # <--- Specify the log file
-        filemode="a",  # <--- Optional: 'a' for append (default), 'w' for overwrite
-        format="%(levelname)s (%(asctime)s): %(message)s (Line: %(lineno)d [%(filename)s])",
-        datefmt="%d/%m/%Y %I:%M:%S %p",
-        level=logging.INFO,
-    )
+    # Inside `sdwan.py shell`, reuse the shell's authenticated session
+    if "shell_manager" in ctx.meta:
+        ctx.obj = ctx.meta["shell_manager"]
+        return
 
     # Get manager credentials from environment variables
     print("\n--- Getting Manager credentials from environment variables ---")
@@ -52,6 +51,10 @@ def cli(ctx):
 
     ctx.call_on_close(logout_manager)
 
+    if stats:
+        # Printed before the logout (callbacks run in reverse order)
+        ctx.call_on_close(lambda: click.echo(manager.metrics.format_summary(), err=True))
+
 
 class Profile:
     """Represents an SD-WAN Config Group Profile."""
@@ -153,10 +156,12 @@ def get_config_groups(ctx):
 
 
 # -----------------------------------------------------------------------------
-if __name__ == "__main__":
-    # Add commands to the cli group
-    cli.add_command(get_config_groups)
+# Add commands to the cli group (also loaded by the sdwan.py entry point)
+cli.add_command(get_config_groups)
+cli.add_command(shell_command(prompt="config-group> "))
+
 
+if __name__ == "__main__":
     # Call the cli group.
     # The authentication and logout will be handled by the cli group's context and teardown callback.
     cli()
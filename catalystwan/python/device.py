@@ -6,42 +6,60 @@
 # Managing devices on SD-WAN Manager
 #
 # Description:
-#   List devices, get device by IP, get device configuration
+#   List devices, get device by IP, get device configuration, sync the
+#   device inventory (see utilities/inventory.py) and show its changes,
+#   back up the running configurations (see utilities/backup.py), search
+#   and diff the backups (see utilities/configindex.py)
 #
 # =========================================================================
 
-import logging
+import os
+import re
+import time
 
 import click
-import requests
-import tabulate
 
 # Import Manager class and the credentials function
+from utilities.backup import DEFAULT_BACKUP_DIR, ConfigBackup, ConfigStore
+from utilities.configindex import ConfigIndex, backup_state, diff_backups
+from utilities.inventory import DEFAULT_MAX_AGE, Inventory, device_field
+from utilities.logs import configure_logging
 from utilities.manager import Manager, get_manager_credentials_from_env
-from utilities.tools import save_payload
+from utilities.metrics import stats_option
+from utilities.shell import shell_command
+from utilities.output import RowWriter, get_output_format, info, output_option
+from utilities.tools import convert_timestamp, lazy_import, load_env, save_payload
+
+requests = lazy_import("requests")  # Imported by the first API call
+
+# Commands reading local files only: they run without Manager credentials (no .env needed)
+OFFLINE_COMMANDS = {"inventory-changes", "config-history", "config-search", "config-diff"}
 
 
 # -----------------------------------------------------------------------------
 @click.group()
+@output_option
+@stats_option
 @click.pass_context  # Pass the context object to the cli group
-def cli(ctx):
+def cli(ctx, output_format, stats):
     """Command line tool for to collect application names and tunnel performances"""
-    log_file_path = "sdwan_api.log"
-
-    logging.basicConfig(
-        filename=log_file_path,  # <--- Add this line to specify the log file
-        filemode="a",  # <--- Optional: 'a' for append (default), 'w' for overwrite
-        format="%(levelname)s (%(asctime)s): %(message)s (Line: %(lineno)d [%(filename)s])",
-        datefmt="%d/%m/%Y %I:%M:%S %p",
-        level=logging.INFO,
-    )
+    ctx.meta["output_format"] = output_format  # Shared with the sub-commands contexts
+    configure_logging()  # sdwan_api.log, rotated, see utilities/logs.py
+
+    # Inside `sdwan.py shell`, reuse the shell's authenticated session
+    if "shell_manager" in ctx.meta:
+        ctx.obj = ctx.meta["shell_manager"]
+        return
+
+    if ctx.invoked_subcommand in OFFLINE_COMMANDS:
+        return
 
     # Get manager credentials from environment variables
-    print("\n--- Getting Manager credentials from environment variables ---")
+    info("\n--- Getting Manager credentials from environment variables ---", ctx)
     host, port, user, password = get_manager_credentials_from_env()
 
     # Create session with Cisco Catalyst SD-WAN Manager
-    print("\n--- Authenticating to SD-WAN Manager ---")
+    info("\n--- Authenticating to SD-WAN Manager ---", ctx)
     manager = Manager(host, port, user, password)
     ctx.obj = manager  # Store the manager object in the context
 
@@ -49,30 +67,33 @@ def cli(ctx):
     def logout_manager():
         if ctx.obj:  # Check if manager was successfully created
             ctx.obj.logout()
-            print("\n--- Logged out from SD-WAN Manager ---")
+            info("\n--- Logged out from SD-WAN Manager ---", ctx)
 
     ctx.call_on_close(logout_manager)
 
+    if stats:
+        # Printed before the logout (callbacks run in reverse order)
+        ctx.call_on_close(lambda: click.echo(manager.metrics.format_summary(), err=True))
+
 
 # -----------------------------------------------------------------------------
 @click.command()
+@click.option("--site", help="Only the devices of this site ID.")
+@click.option("--refresh", is_flag=True, help="Sync the inventory even if it was synced recently.")
 @click.pass_context  # Pass the context to the command
-def ls(ctx):
+def ls(ctx, site, refresh):
     """
-    Get Device list
+    Get Device list (WAN edges, from the inventory synced with /system/device/vedges and /device)
     """
-    type = "vedges"
-
-    api_path = "/system/device/%s" % (type)
 
     # Get manager from context
     manager = ctx.obj
 
-    # Fetch API endpoint
+    # Fetch API endpoints, unless the inventory was synced recently
     try:
-        payload = manager._api_get(api_path)
-        data = payload.get("data", [])
-        save_payload(payload, "devices_all", "output/devices/")
+        inventory = Inventory.for_manager(manager, max_age=DEFAULT_MAX_AGE, refresh=refresh)
+        devices = inventory.by_site(site) if site else inventory.devices
+        data = [device for device in devices if inventory.in_source(device, "vedges")]
         save_payload(data, "devices_data", "output/devices/")
         app_headers = [
             "UUID",
@@ -84,21 +105,18 @@ def ls(ctx):
             "Managed by:"
         ]
 
-        table = list()
-
-        for item in data:
-            tr = [
-                item.get("uuid", "N/A"),
-                item.get("deviceModel", "N/A"),
-                item.get("vedgeCertificateState", "N/A"),
-                item.get("host-name", "N/A"),
-                item.get("configuredSystemIP", "N/A"),  # Using .get() with default value
-                item.get("siteId", "N/A"),
-                item.get("managed-by", "N/A")
-            ]
-            table.append(tr)
-
-        click.echo(tabulate.tabulate(table, app_headers, tablefmt="fancy_grid"))
+        with RowWriter(app_headers, get_output_format(ctx)) as writer:
+            for item in data:
+                tr = [
+                    item.get("uuid", "N/A"),
+                    item.get("deviceModel", "N/A"),
+                    item.get("vedgeCertificateState", "N/A"),
+                    item.get("host-name", "N/A"),
+                    item.get("configuredSystemIP", "N/A"),  # Using .get() with default value
+                    item.get("siteId", "N/A"),
+                    item.get("managed-by", "N/A")
+                ]
+                writer.write(tr)
 
     except requests.exceptions.RequestException as e:
         print(f"An unexpected error occurred: {e}")
@@ -112,53 +130,116 @@ def ls(ctx):
 @click.pass_context  # Pass the context to the command
 def get_device_by_ip(ctx):
     """
-    Get Device by IP
-    /system/device/{type}?deviceIP={ip_address}
+    Get Device by IP (system IP, uuid or hostname), from the synced inventory
     """
 
     # Get manager from context
     manager = ctx.obj
 
-    type = "vedges"
     systemip = click.prompt("Enter device system-ip", type=str)
-    api_path = f"/system/device/{type}?deviceIP={systemip}"
 
-    # Fetch API endpoint
+    # Look the device up in the inventory, sync it once if the device is not there (e.g. just onboarded)
     try:
-        payload = manager._api_get(api_path)
-        data = payload.get("data", [])
-        save_payload(payload, "device_by_ip_all", "output/devices/")
-        save_payload(data, "device_by_ip_data", "output/devices/")
-
-        for item in data:
-            tr = [
-                item["configStatusMessage"],
-                item["uuid"],
-                item["deviceModel"],
-                item["vedgeCertificateState"],
-                item["deviceIP"],
-                item["host-name"],
-                item["version"],
-                item["vmanageConnectionState"],
-            ]
+        started = time.time()
+        inventory = Inventory.for_manager(manager, max_age=DEFAULT_MAX_AGE)
+        item = inventory.find(systemip)
+        if item is None and inventory.synced < started:
+            inventory = Inventory.for_manager(manager, refresh=True)
+            item = inventory.find(systemip)
+        if item is None:
+            print(f"No device with system-ip {systemip}")
+            return
+        save_payload(item, "device_by_ip_data", "output/devices/")
 
         print("\nDevice Information:")
         print("------------------")
-        print("Device name: ", tr[5])
-        print("Device IP: ", tr[4])
-        print("UUID: ", tr[1])
-        print("Device Model: ", tr[2])
-        print("vManage Connection State: ", tr[7])
-        print("Certificate state: ", tr[3])
-        print("Version: ", tr[6])
-        print("Config status: ", tr[0])
+        print("Device name: ", item.get("host-name", "N/A"))
+        print("Device IP: ", item.get("deviceIP", item.get("system-ip", "N/A")))
+        print("UUID: ", item["uuid"])
+        print("Device Model: ", item.get("deviceModel", "N/A"))
+        print("vManage Connection State: ", item.get("vmanageConnectionState", "N/A"))
+        print("Certificate state: ", item.get("vedgeCertificateState", "N/A"))
+        print("Version: ", item.get("version", "N/A"))
+        print("Config status: ", item.get("configStatusMessage", "N/A"))
+
+    except requests.exceptions.RequestException as e:
+        print(f"An unexpected error occurred: {e}")
+        if hasattr(e, "response") and e.response is not None:
+            print(f"Status: {e.response.status_code}, Response: {e.response.text}")
+        return
+
+
+# -----------------------------------------------------------------------------
+CHANGE_HEADERS = ["Time", "Change", "Hostname", "System IP", "UUID", "Field", "Old value", "New value"]
 
+
+def change_row(change: dict, timezone: str) -> list:
+    return [
+        convert_timestamp(change["time"] * 1000, timezone),
+        change["change"],
+        change["hostname"],
+        change["system_ip"],
+        change["uuid"],
+        change.get("field"),
+        change.get("old"),
+        change.get("new"),
+    ]
+
+
+@click.command()
+@click.option("--timezone", default="UTC", show_default=True, help="Timezone of the displayed times.")
+@click.pass_context  # Pass the context to the command
+def inventory_sync(ctx, timezone):
+    """
+    Sync the device inventory (/device and /system/device/vedges) and show the changes since the previous sync:
+    added and removed devices, version, certificate, reachability, hostname, system IP and site changes.
+    Example command: python device.py inventory-sync
+    """
+
+    # Get manager from context
+    manager = ctx.obj
+
+    try:
+        inventory = Inventory.for_manager(manager, refresh=True)
     except requests.exceptions.RequestException as e:
         print(f"An unexpected error occurred: {e}")
         if hasattr(e, "response") and e.response is not None:
             print(f"Status: {e.response.status_code}, Response: {e.response.text}")
         return
 
+    info(f"{len(inventory)} devices, {len(inventory.sites())} sites, {len(inventory.changes)} changes", ctx)
+    with RowWriter(CHANGE_HEADERS, get_output_format(ctx)) as writer:
+        for change in inventory.changes:
+            writer.write(change_row(change, timezone))
+
+
+@click.command()
+@click.option("--host", help="Manager host of the inventory, default: manager_host (environment or .env).")
+@click.option("--hours", default=24.0, show_default=True, help="Hours of recorded changes.")
+@click.option("--timezone", default="UTC", show_default=True, help="Timezone of the displayed times.")
+@click.pass_context  # Pass the context to the command
+def inventory_changes(ctx, host, hours, timezone):
+    """
+    Show the inventory changes recorded by the previous syncs, without querying the Manager.
+    Example command: python device.py inventory-changes --hours 168
+    """
+
+    # Only the host names the changes file: no credentials needed
+    if host is None:
+        if ctx.obj:  # Inside the shell
+            host = ctx.obj.host
+        else:
+            load_env()
+            host = os.getenv("manager_host")
+    if not host:
+        print("Manager host unknown: set manager_host in the .env file or use --host.")
+        return
+
+    changes = Inventory.change_log(host, since=time.time() - hours * 3600)
+    with RowWriter(CHANGE_HEADERS, get_output_format(ctx)) as writer:
+        for change in changes:
+            writer.write(change_row(change, timezone))
+
 
 # -----------------------------------------------------------------------------
 @click.command()
@@ -192,12 +273,202 @@ def get_config(ctx):
 
 
 # -----------------------------------------------------------------------------
-if __name__ == "__main__":
-    # Add commands to the cli group
-    cli.add_command(ls)
-    cli.add_command(get_config)
-    cli.add_command(get_device_by_ip)
+@click.command()
+@click.option("--site", help="Only the devices of this site ID.")
+@click.option("--directory", default=DEFAULT_BACKUP_DIR, show_default=True, help="Backup directory.")
+@click.option("--workers", default=8, show_default=True, help="Maximum number of concurrent requests.")
+@click.option("--rate", default=0.0, show_default=True, help="Maximum configurations per second, 0: Manager API budget only.")
+@click.option("--include-unreachable", is_flag=True, help="Also try the devices the Manager cannot reach.")
+@click.pass_context  # Pass the context to the command
+def config_backup(ctx, site, directory, workers, rate, include_unreachable):
+    """
+    Back up the running configuration of all the WAN edges of the inventory (or of a site).
+    Configurations are stored compressed and deduplicated by content, each run writes a manifest.
+    Example command: python device.py config-backup --workers 8 --rate 5
+    """
+
+    # Get manager from context
+    manager = ctx.obj
+
+    try:
+        inventory = Inventory.for_manager(manager, max_age=DEFAULT_MAX_AGE)
+    except requests.exceptions.RequestException as e:
+        print(f"An unexpected error occurred: {e}")
+        if hasattr(e, "response") and e.response is not None:
+            print(f"Status: {e.response.status_code}, Response: {e.response.text}")
+        return
+
+    devices = [
+        device
+        for device in (inventory.by_site(site) if site else inventory.devices)
+        if inventory.in_source(device, "vedges")
+        and device_field(device, "system_ip")
+        and (include_unreachable or device.get("reachability", "reachable") == "reachable")
+    ]
+    if not devices:
+        print("No device to back up.")
+        return
+
+    info(f"Backing up {len(devices)} devices to {directory}", ctx)
+    backup = ConfigBackup(manager, ConfigStore(directory), workers=workers, rate=rate or None)
+    manifest = backup.run(devices)
+
+    stats = manifest["stats"]
+    info(
+        f"Run {manifest['run']}: {stats['succeeded']} saved ({stats['changed']} changed, {stats['new_objects']} new objects, "
+        f"{stats['bytes_stored']} bytes stored), {stats['failed']} failed, {stats['elapsed']}s "
+        f"({stats['per_second']} devices/s, fetch avg {stats['fetch_avg']}s, p95 {stats['fetch_p95']}s, max {stats['fetch_max']}s)",
+        ctx,
+    )
+    headers = ["Hostname", "System IP", "UUID", "Changed", "SHA-256", "Size", "Fetch time", "Error"]
+    with RowWriter(headers, get_output_format(ctx)) as writer:
+        for uuid, entry in manifest["devices"].items():
+            if entry.get("changed", True):  # Unchanged configurations are only in the manifest
+                writer.write(
+                    [
+                        entry["hostname"],
+                        entry["system_ip"],
+                        uuid,
+                        entry.get("changed"),
+                        entry.get("sha256", "")[:12],
+                        entry.get("size"),
+                        entry["elapsed"],
+                        entry.get("error"),
+                    ]
+                )
+
+
+@click.command()
+@click.argument("device")
+@click.option("--directory", default=DEFAULT_BACKUP_DIR, show_default=True, help="Backup directory.")
+@click.option("--show", help="Print the configuration of this run (or 'latest').")
+@click.pass_context  # Pass the context to the command
+def config_history(ctx, device, directory, show):
+    """
+    Show the backups of a device (uuid, system IP or hostname), without querying the Manager.
+    Example command: python device.py config-history 10.0.0.1 --show latest
+    """
+    store = ConfigStore(directory)
+    uuid = device
+    for known_uuid, entry in store.devices().items():
+        if device in (known_uuid, entry["system_ip"], entry["hostname"]):
+            uuid = known_uuid
+            break
+
+    history = store.history(uuid)
+    if show:
+        entries = dict(history)
+        run = history[-1][0] if show == "latest" and history else show
+        if "sha256" not in entries.get(run, {}):
+            print(f"No configuration of {device} in run {show}")
+            return
+        print(store.get(entries[run]["sha256"]))
+        return
+
+    headers = ["Run", "Changed", "SHA-256", "Size", "Fetch time", "Error"]
+    with RowWriter(headers, get_output_format(ctx)) as writer:
+        for run, entry in history:
+            writer.write([run, entry.get("changed"), entry.get("sha256", "")[:12], entry.get("size"), entry["elapsed"], entry.get("error")])
+
+
+@click.command()
+@click.argument("query")
+@click.option("--regex", is_flag=True, help="QUERY is a regular expression (checked against all the configurations).")
+@click.option("--directory", default=DEFAULT_BACKUP_DIR, show_default=True, help="Backup directory.")
+@click.option("--workers", default=0, help="Processes used, default: number of CPUs.")
+@click.pass_context  # Pass the context to the command
+def config_search(ctx, query, regex, directory, workers):
+    """
+    Find the devices whose last backed up configuration has QUERY on a line, read with its parent lines
+    (case insensitive), without querying the Manager.
+    Example command: python device.py config-search "bfd color lte hello-interval 1000"
+    """
+    index = ConfigIndex(ConfigStore(directory), workers=workers or None)
+    index.update()
+    try:
+        results = index.search(query, regex=regex)
+    except re.error as e:
+        print(f"Invalid regular expression: {e}")
+        return
+
+    devices = index.store.devices()
+    info(f"{len(results)} of {len(devices)} devices", ctx)
+    headers = ["Hostname", "System IP", "UUID", "Backup run", "Line"]
+    with RowWriter(headers, get_output_format(ctx)) as writer:
+        for uuid, lines in results.items():
+            entry = devices[uuid]
+            for line in lines:
+                writer.write([entry["hostname"], entry["system_ip"], uuid, entry["run"], line])
+
 
+@click.command()
+@click.argument("device", required=False)
+@click.option("--from", "from_run", help="Older backup run, default: the run before the last one.")
+@click.option("--to", "to_run", help="Newer backup run, default: the last backup of each device.")
+@click.option("--show", is_flag=True, help="Print the unified diffs.")
+@click.option("--directory", default=DEFAULT_BACKUP_DIR, show_default=True, help="Backup directory.")
+@click.option("--workers", default=0, help="Processes used, default: number of CPUs.")
+@click.pass_context  # Pass the context to the command
+def config_diff(ctx, device, from_run, to_run, show, directory, workers):
+    """
+    Show the configuration changes of all the devices (or of DEVICE: uuid, system IP or hostname)
+    between two backup runs, without querying the Manager.
+    Example command: python device.py config-diff --show
+    """
+    store = ConfigStore(directory)
+    runs = store.runs()
+    if from_run is None:
+        if len(runs) < 2:
+            print("At least two backup runs are needed, see config-backup.")
+            return
+        from_run = runs[-2] if to_run is None else max((run for run in runs if run < to_run), default=runs[0])
+
+    old, new = backup_state(store, from_run), backup_state(store, to_run)
+    uuids = None
+    if device:
+        uuids = [uuid for uuid, entry in new.items() if device in (uuid, entry["system_ip"], entry["hostname"])]
+        if not uuids:
+            print(f"No backup of {device}")
+            return
+
+    diffs = diff_backups(store, old, new, uuids=uuids, unified=show, workers=workers or None)
+    info(f"{len(diffs)} of {len(uuids or new)} devices changed since {from_run}", ctx)
+    if show:
+        for uuid, result in diffs.items():
+            click.echo(click.style(f"\n--- {result['hostname']} ({result['system_ip']}, {uuid})", bold=True))
+            click.echo(result["diff"])
+        return
+
+    headers = ["Hostname", "System IP", "UUID", "Lines added", "Lines removed", "Sections"]
+    with RowWriter(headers, get_output_format(ctx)) as writer:
+        for uuid, result in diffs.items():
+            writer.write(
+                [
+                    result["hostname"],
+                    result["system_ip"],
+                    uuid,
+                    result["added"],
+                    result["removed"],
+                    ", ".join(result["sections"]),
+                ]
+            )
+
+
+# -----------------------------------------------------------------------------
+# Add commands to the cli group (also loaded by the sdwan.py entry point)
+cli.add_command(ls)
+cli.add_command(get_config)
+cli.add_command(get_device_by_ip)
+cli.add_command(inventory_sync)
+cli.add_command(inventory_changes)
+cli.add_command(config_backup)
+cli.add_command(config_history)
+cli.add_command(config_search)
+cli.add_command(config_diff)
+cli.add_command(shell_command(prompt="device> "))
+
+
+if __name__ == "__main__":
     # Call the cli group.
     # The authentication and logout will be handled by the cli group's context and teardown callback.
     cli()
@@ -12,13 +12,13 @@
 #
 # =========================================================================
 
-import logging
-
 import click
-import tabulate
 
 # Import the new unified Manager class and the credentials function
+from utilities.logs import configure_logging
 from utilities.manager import Manager, get_manager_credentials_from_env
+from utilities.metrics import stats_option
+from utilities.shell import shell_command
 from utilities.tools import convert_timestamp, save_payload
 
 
@@ -189,18 +189,16 @@ class SubParcel:
 
 # -----------------------------------------------------------------------------
 @click.group()
+@stats_option
 @click.pass_context  # Pass the context object to the cli group
-def cli(ctx):
+def cli(ctx, stats):
     """Command line tool for to collect application names and tunnel performances"""
-    log_file_path = "sdwan_api.log"
+    configure_logging()  # sdwan_api.log, rotated, see utilities/logs.py
 
-    logging.basicConfig(
-        filename=log_file_path,  # <--- Specify the log file
-        filemode="a",  # <--- Optional: 'a' for append (default), 'w' for overwrite
-        format="%(levelname)s (%(asctime)s): %(message)s (Line: %(lineno)d [%(filename)s])",
-        datefmt="%d/%m/%Y %I:%M:%S %p",
-        level=logging.INFO,
-    )
+    # Inside `sdwan.py shell`, reuse the shell's authenticated session
+    if "shell_manager" in ctx.meta:
+        ctx.obj = ctx.meta["shell_manager"]
+        return
 
     # Get manager credentials from environment variables
     print("\n--- Getting Manager credentials from environment variables ---")
@@ -219,6 +217,10 @@ def cli(ctx):
 
     ctx.call_on_close(logout_manager)
 
+    if stats:
+        # Printed before the logout (callbacks run in reverse order)
+        ctx.call_on_close(lambda: click.echo(manager.metrics.format_summary(), err=True))
+
 
 # -----------------------------------------------------------------------------
 @click.command()
@@ -320,6 +322,8 @@ def get_profiles(ctx) -> list[Profile]:
     Get the list of all profiles, store them as Profile objects (summary view),
     and then print them in a tabular format.
     """
+    import tabulate
+
     # Get manager from context
     manager = ctx.obj
 
@@ -360,12 +364,14 @@ def get_profiles(ctx) -> list[Profile]:
 
 
 # -----------------------------------------------------------------------------
-if __name__ == "__main__":
-    # Add commands to the cli group
-    cli.add_command(get_profiles)
-    cli.add_command(get_profile_details)
-    cli.add_command(get_bfd)
+# Add commands to the cli group (also loaded by the sdwan.py entry point)
+cli.add_command(get_profiles)
+cli.add_command(get_profile_details)
+cli.add_command(get_bfd)
+cli.add_command(shell_command(prompt="profiles> "))
+
 
+if __name__ == "__main__":
     # Call the cli group.
     # The authentication and logout will be handled by the cli group's context and teardown callback.
     cli()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Single entry point for the command line tools
+#
+# Description:
+#   sdwan.py <tool> [options] <command>, e.g. sdwan.py device --output jsonl ls
+#   The tool modules (approute.py, device.py...) are imported only when their
+#   sub-command is invoked, and requests/urllib3 are only imported by the
+#   first API call, so --help and argument errors start without loading
+#   requests, tabulate or dotenv. Each tool keeps working as a standalone script.
+#   `sdwan.py shell` runs the tools interactively on one authenticated session,
+#   e.g. `device ls`, `approute app-list`, `device get-config`.
+#
+# =========================================================================
+
+import importlib
+
+import click
+
+from utilities.shell import shell_command
+
+# Sub-command name: (module, short help). The help is static so listing
+# the tools does not import them.
+TOOLS = {
+    "approute": ("approute", "Applications and application-aware routing statistics"),
+    "config-group": ("config_group", "Configuration groups"),
+    "device": ("device", "Devices: list, get by IP, get configuration"),
+    "profiles": ("profiles", "Feature profiles and their parcels"),
+    "settings": ("settings", "Organization name and validator settings"),
+    "users": ("users", "Users: list, add, delete"),
+}
+
+
+# -----------------------------------------------------------------------------
+class LazyGroup(click.Group):
+    """
+    click group loading the `cli` group of a tool module on first use.
+    """
+
+    def list_commands(self, ctx):
+        return sorted(list(TOOLS) + list(self.commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.commands:
+            return self.commands[cmd_name]
+        if cmd_name not in TOOLS:
+            return None
+        module = importlib.import_module(TOOLS[cmd_name][0])
+        return module.cli
+
+    def format_commands(self, ctx, formatter):
+        rows = [
+            (name, TOOLS[name][1] if name in TOOLS else self.commands[name].get_short_help_str())
+            for name in self.list_commands(ctx)
+        ]
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+# -----------------------------------------------------------------------------
+@click.group(cls=LazyGroup)
+def cli():
+    """Command line tools for Cisco Catalyst SD-WAN Manager.
+
+    Run `sdwan.py <tool> --help` for the commands and options of a tool.
+    """
+
+
+def shell_manager():
+    """Manager of `sdwan.py shell`, shared by all the tools run from the shell"""
+    # Imported here: only the shell needs a session at this level
+    from utilities.logs import configure_logging
+    from utilities.manager import Manager, get_manager_credentials_from_env
+
+    configure_logging()
+    return Manager(*get_manager_credentials_from_env())
+
+
+cli.add_command(shell_command(prompt="sdwan> ", manager_factory=shell_manager))
+
+
+if __name__ == "__main__":
+    cli()
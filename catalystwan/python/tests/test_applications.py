@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+from utilities.applications import AppCatalog
+
+APPS = [
+    {"appId": 1, "name": "webex", "family": "Collaboration"},
+    {"appId": 2, "name": "WebEx", "family": "Collaboration"},
+    {"appId": 3, "name": "webex-meeting", "family": "Collaboration"},
+    {"appId": 4, "name": "web-browsing", "family": "Web"},
+    {"appId": 5, "name": "microsoft-teams", "family": "Collaboration"},
+]
+
+
+class FakeManager:
+    applicationVersion = "20.12.1"
+    version = "20.12"
+
+    def __init__(self, items):
+        self.items = items
+        self.calls = 0
+
+    def _ensure_authenticated(self):
+        pass
+
+    def _api_get(self, path):
+        self.calls += 1
+        return {"data": self.items}
+
+
+class AppCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.catalog = AppCatalog("dpi", "20.12.1", APPS)
+
+    def test_case_colliding_names(self):
+        self.assertEqual(self.catalog.get_by_name("WebEx")["appId"], 2)
+        self.assertEqual(self.catalog.get_by_name("webex")["appId"], 1)
+        self.assertEqual(self.catalog.get_by_name("WEBEX")["appId"], 1)
+        self.assertEqual([item["appId"] for item in self.catalog.search("webex")], [1, 2, 3])
+
+    def test_search(self):
+        self.assertEqual([item["appId"] for item in self.catalog.search("WEB")], [4, 1, 2, 3])
+        self.assertEqual([item["appId"] for item in self.catalog.search("web", family="web")], [4])
+        self.assertEqual(len(self.catalog.search()), len(APPS))
+        self.assertEqual(self.catalog.search("zoom"), [])
+
+    def test_lookups(self):
+        self.assertEqual(self.catalog.get_by_id("5")["name"], "microsoft-teams")
+        self.assertIsNone(self.catalog.get_by_name("zoom"))
+        self.assertEqual(len(self.catalog.family("collaboration")), 4)
+        self.assertEqual(self.catalog.families(), ["Collaboration", "Web"])
+
+    def test_for_manager_cached_per_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            manager = FakeManager(APPS)
+            downloaded = AppCatalog.for_manager(manager, "dpi", directory=directory)
+            cached = AppCatalog.for_manager(manager, "dpi", directory=directory)
+            AppCatalog.for_manager(manager, "dpi", refresh=True, directory=directory)
+            latest = AppCatalog.latest("dpi", directory)
+
+        self.assertEqual(manager.calls, 2)
+        self.assertEqual(cached.items, downloaded.items)
+        self.assertEqual(cached.get_by_name("WebEx")["appId"], 2)
+        self.assertEqual(latest.version, "20.12.1")
+
+    def test_latest_without_catalog(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(AppCatalog.latest("qosmos", directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Copies of the utilities in the MCP server
+#
+# Description:
+#   The MCP server container only ships mcp-sdwan/, so api/ratelimit.py,
+#   api/queries.py and api/inventory.py copy definitions of utilities/.
+#   The copied definitions must stay identical to the originals (compared
+#   on their syntax tree, docstrings ignored); classify_endpoint takes a
+#   full url in the MCP server and is compared on its results.
+#
+# =========================================================================
+
+import ast
+import importlib.util
+import os
+import unittest
+
+from utilities import ratelimit
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MCP_API_DIR = os.path.join(os.path.dirname(PYTHON_DIR), "mcp-sdwan", "api")
+
+# Module: top-level definitions copied verbatim
+COPIED = {
+    "ratelimit": ("DEFAULT_LIMITS", "parse_limits"),
+    "queries": (
+        "MetricType",
+        "HistogramType",
+        "METRIC_TYPES",
+        "HISTOGRAM_TYPES",
+        "TIME_FORMAT",
+        "APPROUTE_METRICS",
+        "QueryError",
+        "Rule",
+        "format_time",
+        "_build_payload",
+        "_validate",
+        "tunnel_stats_query",
+    ),
+    "inventory": ("FIELDS", "device_field"),
+}
+
+# Module: classes whose copy keeps a subset of the members
+COPIED_CLASSES = {
+    "queries": ("StatsQuery",),
+    "inventory": ("Inventory",),
+}
+
+
+def strip_docstrings(node: ast.AST) -> str:
+    """Dump of a definition without its docstrings"""
+    for item in ast.walk(node):
+        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = item.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+                if isinstance(body[0].value.value, str):
+                    item.body = body[1:] or [ast.Pass()]
+    return ast.dump(node)
+
+
+def member_name(node: ast.AST) -> str:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return node.name
+    if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+        return node.targets[0].id
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+        return node.target.id
+    return None
+
+
+def definitions(body: list) -> dict:
+    """{name: definition} of the functions, classes and assignments of a module or class body"""
+    return {member_name(node): node for node in body if member_name(node)}
+
+
+def parse(path: str) -> dict:
+    with open(path) as f:
+        return definitions(ast.parse(f.read()).body)
+
+
+def load_mcp_module(name: str):
+    spec = importlib.util.spec_from_file_location("mcp_api_" + name, os.path.join(MCP_API_DIR, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class McpCopiesTest(unittest.TestCase):
+    def assert_same(self, original, copy, where):
+        self.assertEqual(strip_docstrings(original), strip_docstrings(copy), "%s differs from the original" % where)
+
+    def test_copied_definitions(self):
+        for module, names in COPIED.items():
+            original = parse(os.path.join(PYTHON_DIR, "utilities", module + ".py"))
+            copy = parse(os.path.join(MCP_API_DIR, module + ".py"))
+            for name in names:
+                with self.subTest(module=module, name=name):
+                    self.assertIn(name, copy)
+                    self.assert_same(original[name], copy[name], "mcp-sdwan/api/%s.py: %s" % (module, name))
+
+    def test_copied_class_members(self):
+        for module, classes in COPIED_CLASSES.items():
+            original = parse(os.path.join(PYTHON_DIR, "utilities", module + ".py"))
+            copy = parse(os.path.join(MCP_API_DIR, module + ".py"))
+            for cls in classes:
+                original_members = definitions(original[cls].body)
+                for name, member in definitions(copy[cls].body).items():
+                    with self.subTest(module=module, member="%s.%s" % (cls, name)):
+                        self.assertIn(name, original_members)
+                        self.assert_same(original_members[name], member, "mcp-sdwan/api/%s.py: %s.%s" % (module, cls, name))
+
+    def test_classify_endpoint(self):
+        mcp_ratelimit = load_mcp_module("ratelimit")
+        paths = (
+            ("/device/counters", {"deviceId": "10.0.0.1"}),
+            ("/device/monitor", None),
+            ("/statistics/approute/aggregation", None),
+            ("/alarms", {"query": "x"}),
+            ("/template/device/config/attachfeature", None),
+            ("/v1/config-group", None),
+            ("/admin/user", None),
+            ("/settings/configuration/organization", None),
+            ("/certificate/vedge/list", None),
+            ("/client/server", None),
+        )
+        for path, params in paths:
+            url = "dataservice" + path + ("?" + "&".join("%s=%s" % item for item in params.items()) if params else "")
+            with self.subTest(url=url):
+                self.assertEqual(ratelimit.classify_endpoint(path, params), mcp_ratelimit.classify_endpoint(url))
+
+
+if __name__ == "__main__":
+    unittest.main()
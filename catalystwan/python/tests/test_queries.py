@@ -0,0 +1,144 @@
+import unittest
+from datetime import date, datetime, timezone
+
+from utilities.queries import QueryError, Rule, StatsQuery, merge_aggregates, tunnel_stats_query
+
+FIELDS = [
+    {"property": "entry_time", "dataType": "date"},
+    {"property": "local_system_ip", "dataType": "string"},
+    {"property": "remote_system_ip", "dataType": "string"},
+    {"property": "name", "dataType": "string"},
+    {"property": "latency", "dataType": "number"},
+    {"property": "jitter", "dataType": "number"},
+]
+APPROUTE_FIELDS = FIELDS + [
+    {"property": "vqoe_score", "dataType": "number"},
+    {"property": "loss_percentage", "dataType": "number"},
+]
+
+
+class StatsQueryTest(unittest.TestCase):
+    def test_payload(self):
+        query = (
+            StatsQuery("approute")
+            .between(date(2024, 3, 1), datetime(2024, 3, 2, 12, tzinfo=timezone.utc))
+            .where_in("local_system_ip", ["10.0.0.1"])
+            .group_by("name", "remote_system_ip", size=6000)
+            .histogram(type="minute", interval=30)
+            .metrics("latency")
+        )
+
+        self.assertEqual(
+            query.payload(),
+            {
+                "query": {
+                    "condition": "AND",
+                    "rules": [
+                        {
+                            "value": ["2024-03-01T00:00:00 UTC", "2024-03-02T12:00:00 UTC"],
+                            "field": "entry_time",
+                            "type": "date",
+                            "operator": "between",
+                        },
+                        {"value": ["10.0.0.1"], "field": "local_system_ip", "type": "string", "operator": "in"},
+                    ],
+                },
+                "aggregation": {
+                    "field": [
+                        {"property": "name", "sequence": 1, "size": 6000},
+                        {"property": "remote_system_ip", "sequence": 2},
+                    ],
+                    "histogram": {"property": "entry_time", "type": "minute", "interval": 30, "order": "asc"},
+                    "metrics": [{"property": "latency", "type": "avg"}],
+                },
+            },
+        )
+
+    def test_immutable(self):
+        query = StatsQuery().last_n_hours(1)
+        query.group_by("name")
+        query.payload()["query"]["rules"].clear()
+
+        self.assertEqual(query.fields, ())
+        self.assertEqual(len(query.payload()["query"]["rules"]), 1)
+        self.assertEqual(query, StatsQuery().last_n_hours(1))
+
+    def test_valid_query(self):
+        tunnel_stats_query(["10.0.0.1"], ["10.0.0.2"], hours=1).validate(APPROUTE_FIELDS)
+
+    def test_invalid_queries(self):
+        base = StatsQuery().last_n_hours(1)
+        queries = {
+            "no rule": StatsQuery().metrics("latency"),
+            "unknown rule field": base.where_in("site_id", ["100"]),
+            "date rule on a string": base.where(Rule("name", "between", ["a", "b"], "date")),
+            "string rule on a date": base.where(Rule("entry_time", "in", ["1"])),
+            "hours not a number": StatsQuery().where(Rule("entry_time", "last_n_hours", ["1.5"], "date")),
+            "between with one value": StatsQuery().where(Rule("entry_time", "between", ["x"], "date")),
+            "empty in": base.where(Rule("name", "in", [])),
+            "unknown grouping field": base.group_by("color"),
+            "histogram on a string": base.histogram("name"),
+            "histogram interval": base.histogram(interval=0),
+            "histogram type": base.histogram(type="week"),
+            "unknown metric type": base.metrics("latency", type="median"),
+            "average of a string": base.metrics("name"),
+        }
+        for problem, query in queries.items():
+            with self.subTest(problem=problem), self.assertRaises(QueryError):
+                query.validate(FIELDS)
+
+    def test_count_of_a_string(self):
+        StatsQuery().last_n_hours(1).metrics("name", type="count").validate(FIELDS)
+
+    def test_field_types_case_insensitive(self):
+        StatsQuery().last_n_hours(1).histogram().validate([{"property": "entry_time", "dataType": "DATE"}])
+
+
+class MergeAggregatesTest(unittest.TestCase):
+    query = (
+        StatsQuery()
+        .last_n_hours(2)
+        .group_by("name")
+        .histogram(order="desc")
+        .metrics("latency")
+        .metrics("jitter", type="max")
+        .metrics("loss_percentage", type="sum")
+    )
+
+    def test_count_weighted(self):
+        parts = [
+            [{"name": "t1", "entry_time": 1000, "latency": 10.0, "jitter": 2, "loss_percentage": 1, "count": 3}],
+            [
+                {"name": "t1", "entry_time": 1000, "latency": 30.0, "jitter": 5, "loss_percentage": 2, "count": 1},
+                {"name": "t1", "entry_time": 2000, "latency": 50.0, "jitter": 1, "loss_percentage": 0, "count": 2},
+            ],
+        ]
+        rows = merge_aggregates(self.query, parts)
+
+        self.assertEqual([row["entry_time"] for row in rows], [2000, 1000])
+        self.assertEqual(rows[1]["latency"], 15.0)
+        self.assertEqual(rows[1]["jitter"], 5)
+        self.assertEqual(rows[1]["loss_percentage"], 3)
+        self.assertEqual(rows[1]["count"], 4)
+        self.assertEqual(rows[0]["latency"], 50.0)
+
+    def test_parts_not_modified(self):
+        row = {"name": "t1", "entry_time": 1000, "latency": 10.0, "count": 1}
+        merge_aggregates(self.query, [[row], [dict(row, latency=20.0)]])
+
+        self.assertEqual(row["latency"], 10.0)
+
+    def test_without_count(self):
+        parts = [
+            [{"name": "t1", "entry_time": 1000, "latency": 10.0}],
+            [{"name": "t1", "entry_time": 1000, "latency": 20.0, "count": 3}],
+        ]
+        with self.assertLogs("utilities.queries", "WARNING") as logs:
+            rows = merge_aggregates(self.query, parts)
+
+        self.assertEqual(rows[0]["latency"], 17.5)
+        self.assertIn("1 split results merged without a count", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
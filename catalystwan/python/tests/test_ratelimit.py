@@ -0,0 +1,106 @@
+import threading
+import unittest
+
+from utilities.ratelimit import DEFAULT_LIMITS, RequestBudget, TokenBucket, classify_endpoint, parse_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+        self.assertEqual([bucket.try_acquire() for _ in range(4)], [True, True, True, False])
+        clock.now += 0.5
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    def test_refill_capped_at_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+        bucket.try_acquire(2)
+        clock.now += 60
+
+        self.assertTrue(bucket.try_acquire(2))
+        self.assertFalse(bucket.try_acquire())
+
+    def test_default_capacity(self):
+        self.assertEqual(TokenBucket(rate=0.2).capacity, 1.0)
+        self.assertEqual(TokenBucket(rate=5).capacity, 5.0)
+
+    def test_acquire_timeout(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+        self.assertEqual(bucket.acquire(), 0)
+
+        with self.assertRaises(TimeoutError):
+            bucket.acquire(timeout=0.5)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class EndpointClassTest(unittest.TestCase):
+    def test_classify_endpoint(self):
+        self.assertEqual(classify_endpoint("/device/counters?deviceId=10.0.0.1"), "realtime")
+        self.assertEqual(classify_endpoint("/device/counters", {"deviceId": "10.0.0.1"}), "realtime")
+        self.assertEqual(classify_endpoint("/device"), "other")
+        self.assertEqual(classify_endpoint("/statistics/approute/aggregation"), "statistics")
+        self.assertEqual(classify_endpoint("/v1/config-group"), "config")
+        self.assertEqual(classify_endpoint("/settings/configuration/organization"), "admin")
+
+    def test_parse_limits(self):
+        limits = parse_limits("realtime=2/4, statistics=0.5/0")
+
+        self.assertEqual(limits["realtime"], (2.0, 4))
+        self.assertEqual(limits["statistics"], (0.5, 0))
+        self.assertEqual(limits["other"], DEFAULT_LIMITS["other"])
+        self.assertEqual(parse_limits(None), DEFAULT_LIMITS)
+
+    def test_parse_limits_invalid(self):
+        for spec in ("realtime=2", "unknown=1/1", "realtime=fast/1"):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                parse_limits(spec)
+
+
+class RequestBudgetTest(unittest.TestCase):
+    def test_concurrency_cap(self):
+        budget = RequestBudget({"realtime": (0, 2), "other": (0, 0)})
+        acquired = threading.Event()
+
+        def third_request():
+            with budget.acquire("realtime"):
+                acquired.set()
+
+        with budget.acquire("realtime"), budget.acquire("realtime"):
+            self.assertEqual(budget.stats()["realtime"]["in_flight"], 2)
+            thread = threading.Thread(target=third_request)
+            thread.start()
+            self.assertFalse(acquired.wait(0.2))
+
+        thread.join(5)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(budget.stats()["realtime"]["in_flight"], 0)
+
+    def test_stats(self):
+        budget = RequestBudget({"statistics": (1000, 0), "other": (0, 0)})
+        for endpoint_class in ("statistics", "statistics", "unknown"):
+            with budget.acquire(endpoint_class):
+                pass
+
+        stats = budget.stats()
+        self.assertEqual(stats["statistics"]["requests"], 2)
+        self.assertEqual(stats["other"]["requests"], 1)
+        self.assertEqual(stats["other"]["avg_wait"], stats["other"]["wait_time"])
+
+
+if __name__ == "__main__":
+    unittest.main()
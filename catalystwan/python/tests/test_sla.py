@@ -0,0 +1,89 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+
+from utilities.sla import SlaClass, SlaEvaluator, sla_classes_from_file
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HAS_PANDAS = importlib.util.find_spec("pandas") is not None
+
+CLASSES = [SlaClass("Voice", latency=150, loss=1, jitter=30), SlaClass("Bulk", latency=400)]
+
+SAMPLES = [
+    {"tunnel": "t1", "entry_time": 1, "latency": 100.0, "loss_percentage": 0.0, "jitter": 10.0, "count": 3},
+    {"tunnel": "t1", "entry_time": 2, "latency": 200.0, "loss_percentage": 0.5, "jitter": 10.0, "count": 1},
+    {"tunnel": "t2", "entry_time": 1, "latency": 500.0, "loss_percentage": 2.0, "jitter": None, "count": 2},
+    {"tunnel": "t2", "entry_time": 2, "latency": None, "loss_percentage": 0.0, "jitter": 40.0, "count": 2},
+]
+
+
+def by_key(rows: list[dict]) -> dict:
+    return {(row["tunnel"], row["sla_class"]): row for row in rows}
+
+
+@unittest.skipUnless(HAS_NUMPY, "the SLA evaluation requires numpy")
+class SlaEvaluatorTest(unittest.TestCase):
+    def test_summary(self):
+        rows = by_key(SlaEvaluator(CLASSES).evaluate(SAMPLES).summary())
+
+        self.assertEqual(rows["t1", "Voice"]["samples"], 4)
+        self.assertEqual(rows["t1", "Voice"]["violation_pct"], 25.0)  # Weighted by count
+        self.assertEqual(rows["t1", "Voice"]["mean_latency"], 125.0)
+        self.assertEqual(rows["t1", "Bulk"]["violation_pct"], 0.0)
+        self.assertEqual(rows["t2", "Voice"]["violation_pct"], 100.0)
+        self.assertEqual(rows["t2", "Bulk"]["violation_pct"], 50.0)  # Jitter is not part of Bulk
+        self.assertEqual(rows["t2", "Voice"]["mean_latency"], 500.0)  # Unknown values are ignored
+        self.assertEqual(rows["t2", "Voice"]["max_jitter"], 40.0)
+
+    def test_worst(self):
+        worst = SlaEvaluator(CLASSES).evaluate(SAMPLES).worst(top=2)
+
+        self.assertEqual([(row["tunnel"], row["sla_class"]) for row in worst], [("t2", "Voice"), ("t2", "Bulk")])
+
+    def test_violations(self):
+        violations = SlaEvaluator(CLASSES).evaluate(SAMPLES).violations(sla_class="Voice")
+
+        self.assertEqual(
+            [(row["tunnel"], row["entry_time"], row["breached"]) for row in violations],
+            [("t1", 2, "latency"), ("t2", 1, "latency,loss"), ("t2", 2, "jitter")],
+        )
+
+    def test_columns_and_name_column(self):
+        columns = {key: [sample[key] for sample in SAMPLES] for key in SAMPLES[0]}
+        columns["name"] = columns.pop("tunnel")
+        columns["latency"] = [value if value is not None else float("nan") for value in columns["latency"]]
+        columns["jitter"] = [value if value is not None else float("nan") for value in columns["jitter"]]
+
+        self.assertEqual(SlaEvaluator(CLASSES).evaluate(columns).summary(), SlaEvaluator(CLASSES).evaluate(SAMPLES).summary())
+
+    @unittest.skipUnless(HAS_PANDAS, "pandas is not installed")
+    def test_dataframe(self):
+        import pandas
+
+        frame = pandas.DataFrame(SAMPLES)
+
+        self.assertEqual(SlaEvaluator(CLASSES).evaluate(frame).summary(), SlaEvaluator(CLASSES).evaluate(SAMPLES).summary())
+
+    def test_missing_tunnel_column(self):
+        with self.assertRaises(ValueError):
+            SlaEvaluator(CLASSES).evaluate({"latency": [1.0]})
+
+
+class SlaClassFileTest(unittest.TestCase):
+    def test_json_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sla.json")
+            with open(path, "w") as f:
+                json.dump({"sla_classes": [{"name": "Voice", "latency": 150, "loss": "1"}, {"name": "Any"}]}, f)
+
+            classes = sla_classes_from_file(path)
+
+        self.assertEqual([item.name for item in classes], ["Voice", "Any"])
+        self.assertEqual((classes[0].latency, classes[0].loss, classes[0].jitter), (150.0, 1.0, None))
+        self.assertIsNone(classes[1].latency)
+
+
+if __name__ == "__main__":
+    unittest.main()
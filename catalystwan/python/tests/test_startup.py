@@ -0,0 +1,67 @@
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Startup cost of the command line tools
+#
+# Description:
+#   --help of sdwan.py, its tools and the lab scripts must not import
+#   requests, tabulate or pandas: they are loaded by the first API call or
+#   table output. Checked with `python -X importtime` in a subprocess, the
+#   lazy modules registered by lazy_import() are not reported there until
+#   they are really executed.
+#
+# =========================================================================
+
+import os
+import subprocess
+import sys
+import unittest
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAB_DIR = os.path.join(os.path.dirname(PYTHON_DIR), "lab")
+
+HEAVY_MODULES = {"requests", "tabulate", "pandas"}
+
+
+def imported_modules(script, *args):
+    """Top-level modules executed by `python -X importtime script args`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", script, *args],
+        cwd=os.path.dirname(script),
+        env={"PATH": os.environ.get("PATH", "")},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    if result.returncode != 0:
+        raise AssertionError("%s %s failed:\n%s" % (script, " ".join(args), result.stderr))
+
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+class StartupImportsTest(unittest.TestCase):
+    def assert_lightweight(self, script, *args):
+        loaded = HEAVY_MODULES & imported_modules(script, *args)
+        self.assertFalse(loaded, "%s %s imports %s" % (os.path.basename(script), " ".join(args), sorted(loaded)))
+
+    def test_sdwan_help(self):
+        self.assert_lightweight(os.path.join(PYTHON_DIR, "sdwan.py"), "--help")
+
+    def test_tool_help(self):
+        for tool in ("approute", "config-group", "device", "profiles", "settings", "users"):
+            with self.subTest(tool=tool):
+                self.assert_lightweight(os.path.join(PYTHON_DIR, "sdwan.py"), tool, "--help")
+
+    def test_lab_help(self):
+        for script in ("vmanage_apis.py", "vmanage_config_apis.py", "alarms_apis.py", "monitor-app-route-stats.py"):
+            with self.subTest(script=script):
+                self.assert_lightweight(os.path.join(LAB_DIR, script), "--help")
+
+
+if __name__ == "__main__":
+    unittest.main()
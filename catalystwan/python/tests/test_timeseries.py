@@ -0,0 +1,110 @@
+import unittest
+
+from utilities.timeseries import ApprouteStore, parse_tunnel_name
+
+TUNNEL = "10.0.0.1:mpls-10.0.0.2:biz-internet"
+DAY_MS = 86400 * 1000
+START = 1700000000000 // DAY_MS * DAY_MS  # Start of a day: all the test samples share their 1h and 1d buckets
+
+
+def sample(offset_s: int, latency, count: int = 1, tunnel: str = TUNNEL, **metrics) -> dict:
+    return dict(
+        entry_time=START + offset_s * 1000,
+        tunnel=tunnel,
+        local_system_ip="10.0.0.1",
+        remote_system_ip="10.0.0.2",
+        latency=latency,
+        count=count,
+        **metrics,
+    )
+
+
+class ApprouteStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = ApprouteStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+
+    def rows(self, resolution: int) -> list[dict]:
+        return self.store.query(START - DAY_MS, START + 2 * DAY_MS, resolution=resolution)
+
+    def test_parse_tunnel_name(self):
+        self.assertEqual(parse_tunnel_name(TUNNEL), ("10.0.0.1", "mpls", "10.0.0.2", "biz-internet"))
+        self.assertIsNone(parse_tunnel_name("tunnel-1"))
+
+    def test_rollup_count_weighted(self):
+        self.store.add_samples([
+            sample(0, 10.0, count=1, jitter=1.0),
+            sample(60, 30.0, count=3, jitter=None),
+            sample(600, 50.0, count=4, jitter=2.0),
+        ])
+        self.store.rollup()
+
+        five_minutes = self.rows(300)
+        self.assertEqual([row["entry_time"] for row in five_minutes], [START, START + 600 * 1000])
+        self.assertEqual(five_minutes[0]["count"], 4)
+        self.assertEqual(five_minutes[0]["latency"], 25.0)
+        self.assertEqual(five_minutes[0]["latency_max"], 30.0)
+        self.assertEqual(five_minutes[0]["jitter"], 1.0)  # Samples without the metric do not weigh
+
+        for resolution in (3600, 86400):
+            with self.subTest(resolution=resolution):
+                (row,) = self.rows(resolution)
+                self.assertEqual(row["entry_time"], START)
+                self.assertEqual(row["count"], 8)
+                self.assertEqual(row["latency"], 37.5)
+                self.assertEqual(row["latency_max"], 50.0)
+
+    def test_reingest_replaces(self):
+        self.store.add_samples([sample(0, 10.0, count=2)])
+        self.store.add_samples([sample(0, 20.0, count=2)])
+
+        (row,) = self.rows(3600)
+        self.assertEqual(row["count"], 2)
+        self.assertEqual(row["latency"], 20.0)
+
+    def test_rollup_after_late_samples(self):
+        self.store.add_samples([sample(4000, 10.0)])
+        self.store.rollup()
+        self.store.add_samples([sample(0, 30.0)])
+
+        self.assertEqual([(row["entry_time"], row["latency"]) for row in self.rows(3600)],
+                         [(START, 30.0), (START + 3600 * 1000, 10.0)])
+        (day,) = self.rows(86400)
+        self.assertEqual(day["latency"], 20.0)
+
+    def test_prune(self):
+        self.store.retention = {0: 3600, 300: 86400, 3600: 86400, 86400: 86400}
+        self.store.add_samples([sample(0, 10.0), sample(7200, 20.0)])
+        self.store.rollup()
+
+        deleted = self.store.prune(now=START + 7300 * 1000)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual([row["entry_time"] for row in self.rows(0)], [START + 7200 * 1000])
+        self.assertEqual(len(self.rows(300)), 2)
+
+    def test_resolution_for(self):
+        now = START + 30 * DAY_MS
+        self.assertEqual(self.store.resolution_for(now - 3600 * 1000, now=now), 0)
+        self.assertEqual(self.store.resolution_for(now - 7 * DAY_MS, now=now), 300)
+        self.assertEqual(self.store.resolution_for(now - 30 * DAY_MS, now=now), 3600)
+        self.assertEqual(self.store.resolution_for(now - 3000 * DAY_MS, now=now), 86400)
+
+    def test_add_aggregation(self):
+        data = [
+            {"name": TUNNEL, "entry_time": START, "latency": 10.0, "count": 5},
+            {"name": "tunnel-1", "entry_time": START, "latency": 20.0, "count": 1},
+            {"name": TUNNEL, "latency": 99.0, "count": 50},  # Whole window, not stored
+        ]
+        self.assertEqual(self.store.add_aggregation(data, "10.0.0.3", "10.0.0.4"), 2)
+
+        rows = {row["tunnel"]: row for row in self.rows(0)}
+        self.assertEqual(rows[TUNNEL]["local_color"], "mpls")
+        self.assertEqual(rows[TUNNEL]["count"], 5)
+        self.assertEqual(rows["tunnel-1"]["local_system_ip"], "10.0.0.3")
+
+
+if __name__ == "__main__":
+    unittest.main()
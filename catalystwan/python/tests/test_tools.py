@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from utilities.tools import DEFAULT_TIMESTAMP_FORMAT, TimestampFormatter
+
+MINUTE_MS = 60 * 1000
+
+
+def epoch_ms(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def reference(timestamp_ms: int, tz: str) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000, ZoneInfo(tz)).strftime(DEFAULT_TIMESTAMP_FORMAT)
+
+
+class TimestampFormatterTest(unittest.TestCase):
+    def assert_exact(self, tz: str, timestamps):
+        formatter = TimestampFormatter(tz)
+        for timestamp_ms in timestamps:
+            with self.subTest(timestamp_ms=timestamp_ms):
+                self.assertEqual(formatter.format(timestamp_ms), reference(timestamp_ms, tz))
+
+    def test_spring_forward(self):
+        formatter = TimestampFormatter("America/Los_Angeles")
+        change = epoch_ms(2024, 3, 10, 10)
+
+        self.assertEqual(formatter.format(change - 1000), "2024-03-10 01:59:59 PST")
+        self.assertEqual(formatter.format(change), "2024-03-10 03:00:00 PDT")
+        self.assert_exact("America/Los_Angeles", range(change - 60 * MINUTE_MS, change + 60 * MINUTE_MS, MINUTE_MS))
+
+    def test_fall_back(self):
+        formatter = TimestampFormatter("America/Los_Angeles")
+        change = epoch_ms(2024, 11, 3, 9)
+
+        self.assertEqual(formatter.format(change - 1000), "2024-11-03 01:59:59 PDT")
+        self.assertEqual(formatter.format(change), "2024-11-03 01:00:00 PST")
+        self.assert_exact("America/Los_Angeles", range(change - 60 * MINUTE_MS, change + 60 * MINUTE_MS, MINUTE_MS))
+
+    def test_transition_inside_a_bucket(self):
+        # Dublin Mean Time to Irish Summer Time at 02:25:21 UTC, in the middle of a 15-minute bucket
+        change = epoch_ms(1916, 5, 21, 2, 25, 21)
+        formatter = TimestampFormatter("Europe/Dublin")
+
+        self.assertEqual(formatter.format(change - 1000), "1916-05-21 01:59:59 DMT")
+        self.assertEqual(formatter.format(change), "1916-05-21 03:00:00 IST")
+        self.assert_exact("Europe/Dublin", range(change - 10 * MINUTE_MS, change + 10 * MINUTE_MS, 7000))
+
+    def test_half_hour_offset(self):
+        self.assert_exact("Asia/Kolkata", range(epoch_ms(2024, 6, 1), epoch_ms(2024, 6, 2), 37 * MINUTE_MS))
+
+    def test_bucket_cache(self):
+        formatter = TimestampFormatter("Europe/Paris")
+        timestamps = [epoch_ms(2024, 1, 15, 12, 0, second) for second in range(0, 60, 10)]
+
+        self.assertEqual(formatter.format_many(timestamps), [reference(ms, "Europe/Paris") for ms in timestamps])
+        self.assertEqual(len(formatter._offsets), 1)
+
+    def test_empty(self):
+        self.assertEqual(TimestampFormatter().format_many([0, None, ""]), ["N/A"] * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
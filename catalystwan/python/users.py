@@ -10,31 +10,30 @@
 #
 # =========================================================================
 
-import logging
-
 import click
-import requests
-import tabulate
 
 # Import Manager class and the credentials function
+from utilities.logs import configure_logging
 from utilities.manager import Manager, get_manager_credentials_from_env
-from utilities.tools import save_payload
+from utilities.metrics import stats_option
+from utilities.shell import shell_command
+from utilities.tools import lazy_import, save_payload
+
+requests = lazy_import("requests")  # Imported by the first API call
 
 
 # -----------------------------------------------------------------------------
 @click.group()
+@stats_option
 @click.pass_context  # Pass the context object to the cli group
-def cli(ctx):
+def cli(ctx, stats):
     """Command line tool for to collect application names and tunnel performances"""
-    log_file_path = "sdwan_api.log"
-
-    logging.basicConfig(
-        filename=log_file_path,  # <--- Add this line to specify the log file
-        filemode="a",  # <--- Optional: 'a' for append (default), 'w' for overwrite
-        format="%(levelname)s (%(asctime)s): %(message)s (Line: %(lineno)d [%(filename)s])",
-        datefmt="%d/%m/%Y %I:%M:%S %p",
-        level=logging.INFO,
-    )
+    configure_logging()  # sdwan_api.log, rotated, see utilities/logs.py
+
+    # Inside `sdwan.py shell`, reuse the shell's authenticated session
+    if "shell_manager" in ctx.meta:
+        ctx.obj = ctx.meta["shell_manager"]
+        return
 
     # Get manager credentials from environment variables
     print("\n--- Getting Manager credentials from environment variables ---")
@@ -53,12 +52,17 @@ def cli(ctx):
 
     ctx.call_on_close(logout_manager)
 
+    if stats:
+        # Printed before the logout (callbacks run in reverse order)
+        ctx.call_on_close(lambda: click.echo(manager.metrics.format_summary(), err=True))
+
 
 # -----------------------------------------------------------------------------
 @click.command()
 @click.pass_context  # Pass the context to the command
 def ls(ctx):
     """List all users"""
+    import tabulate
 
     # API endpoint for users
     api_path = "/admin/user"
@@ -174,12 +178,14 @@ def delete(ctx):
 
 
 # -----------------------------------------------------------------------------
-if __name__ == "__main__":
-    # Add commands to the cli group
-    cli.add_command(ls)
-    cli.add_command(add)
-    cli.add_command(delete)
+# Add commands to the cli group (also loaded by the sdwan.py entry point)
+cli.add_command(ls)
+cli.add_command(add)
+cli.add_command(delete)
+cli.add_command(shell_command(prompt="users> "))
 
+
+if __name__ == "__main__":
     # Call the cli group.
     # The authentication and logout will be handled by the cli group's context and teardown callback.
     cli()
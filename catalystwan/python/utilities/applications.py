@@ -0,0 +1,169 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Application catalog
+#
+# Description:
+#   On-disk copy of the DPI application catalogs (application-mapping and
+#   qosmos-static), which hold thousands of entries and only change with a
+#   Manager upgrade. A catalog file is keyed by the Manager applicationVersion
+#   (from about()), so it is downloaded once per version and then read from
+#   disk. Lookups by appId, name and family, and name prefix searches, use
+#   in-memory indexes.
+#
+# =========================================================================
+
+import bisect
+import glob
+import json
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_DIR = "cache"
+
+# source: API path
+SOURCES = {
+    "dpi": "/device/dpi/application-mapping",
+    "qosmos": "/device/dpi/qosmos-static/applications",
+}
+
+
+# ----------------------------------------------------------
+class AppCatalog:
+    """
+    Application catalog of one source (dpi or qosmos) with appId, name and family indexes.
+
+    Example:
+        apps = AppCatalog.for_manager(manager, "dpi")
+        apps.get_by_name("webex")
+        apps.search("micro", family="Collaboration")
+    """
+
+    def __init__(self, source: str, version: str, items: list, payload: Optional[dict] = None):
+        """
+        Args:
+            source (str): dpi or qosmos
+            version (str): Manager applicationVersion the catalog was downloaded from
+            items (list): catalog entries (name, family, appId...)
+            payload (dict): full API payload, kept to save it like the list commands always did
+        """
+        self.source = source
+        self.version = version
+        self.items = items
+        self.payload = payload if payload is not None else {"data": items}
+
+        self.by_id = {str(item.get("appId")): item for item in items}
+        # Lower-case name: applications of that name (names differing only by case share an entry)
+        self.by_name: dict = {}
+        for item in items:
+            self.by_name.setdefault(str(item.get("name", "")).lower(), []).append(item)
+        self.by_family: dict = {}
+        for item in items:
+            self.by_family.setdefault(str(item.get("family", "")).lower(), []).append(item)
+        # Sorted lower-case names for prefix searches
+        self._names = sorted(self.by_name)
+
+    def __len__(self):
+        return len(self.items)
+
+    # ----- lookups -----
+
+    def get_by_id(self, app_id) -> Optional[dict]:
+        return self.by_id.get(str(app_id))
+
+    def get_by_name(self, name: str) -> Optional[dict]:
+        """Case insensitive; when several names only differ by case, the exact match wins"""
+        apps = self.by_name.get(name.lower(), [])
+        for item in apps:
+            if item.get("name") == name:
+                return item
+        return apps[0] if apps else None
+
+    def family(self, family: str) -> list:
+        """All applications of a family (exact name, case insensitive)"""
+        return self.by_family.get(family.lower(), [])
+
+    def families(self) -> list:
+        return sorted({str(item.get("family", "")) for item in self.items})
+
+    def search(self, prefix: str = "", family: Optional[str] = None) -> list:
+        """
+        Applications whose name starts with prefix (case insensitive), optionally limited to a family.
+        """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._names, prefix)
+        end = bisect.bisect_left(self._names, prefix + "\uffff") if prefix else len(self._names)
+        apps = [item for name in self._names[start:end] for item in self.by_name[name]]
+        if family is not None:
+            apps = [item for item in apps if str(item.get("family", "")).lower() == family.lower()]
+        return apps
+
+    # ----- persistence -----
+
+    @staticmethod
+    def path(source: str, version: str, directory: str = DEFAULT_CATALOG_DIR) -> str:
+        version = re.sub(r"[^\w.-]", "_", version)
+        return os.path.join(directory, f"applications_{source}_{version}.json")
+
+    def save(self, directory: str = DEFAULT_CATALOG_DIR) -> str:
+        path = self.path(self.source, self.version, directory)
+        os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"source": self.source, "version": self.version, "synced": time.time(), "payload": self.payload}, f)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "AppCatalog":
+        """
+        Raises:
+            OSError, ValueError: if the file is missing or not a catalog
+        """
+        with open(path) as f:
+            cached = json.load(f)
+        return cls(cached["source"], cached["version"], cached["payload"].get("data", []), cached["payload"])
+
+    @classmethod
+    def latest(cls, source: str, directory: str = DEFAULT_CATALOG_DIR) -> Optional["AppCatalog"]:
+        """Most recently downloaded catalog of a source, without contacting the Manager (offline use)"""
+        paths = sorted(glob.glob(os.path.join(directory, f"applications_{source}_*.json")), key=os.path.getmtime)
+        return cls.load(paths[-1]) if paths else None
+
+    @classmethod
+    def for_manager(cls, manager, source: str = "dpi", refresh: bool = False, directory: str = DEFAULT_CATALOG_DIR) -> "AppCatalog":
+        """
+        Catalog matching the Manager applicationVersion: read from disk, or downloaded and saved.
+
+        Args:
+            manager: Manager instance
+            source (str): dpi or qosmos
+            refresh (bool): download even if a catalog of this version is on disk
+
+        Raises:
+            requests.exceptions.RequestException: if the catalog cannot be downloaded
+        """
+        manager._ensure_authenticated()  # Populates applicationVersion (about)
+        version = manager.applicationVersion or manager.version
+
+        if version and not refresh:
+            try:
+                catalog = cls.load(cls.path(source, version, directory))
+                logger.info(f"Application catalog {source} {version}: {len(catalog)} applications from disk")
+                return catalog
+            except (OSError, ValueError, KeyError):
+                pass
+
+        payload = manager._api_get(SOURCES[source])
+        catalog = cls(source, version or "unknown", payload.get("data", []), payload)
+        if version:
+            # Without a version there is no way to tell when the catalog changes, so it is not stored
+            catalog.save(directory)
+        logger.info(f"Application catalog {source} {version}: {len(catalog)} applications downloaded")
+        return catalog
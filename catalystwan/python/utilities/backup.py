@@ -0,0 +1,259 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Running configuration backups
+#
+# Description:
+#   Bulk backup of the device running configurations
+#   (/template/config/running/{uuid}), fetched concurrently. Calls are paced
+#   by the Manager API budget ("config" class, see utilities/ratelimit.py)
+#   and optionally by an extra rate limit.
+#
+#   Configurations are stored content-addressed: objects/<sha256[:2]>/<sha256>.gz
+#   holds one gzip compressed configuration, named after the hash of its
+#   text, so an unchanged configuration is stored once whatever the number
+#   of runs. Each run writes a manifest (manifests/<run>.json): per device
+#   its hash, size, whether it changed since the previous run, fetch time
+#   or error, and the run timing statistics. devices.json keeps the last
+#   backup of every device.
+#
+# =========================================================================
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Optional
+
+from utilities.inventory import device_field
+from utilities.ratelimit import TokenBucket
+from utilities.tools import lazy_import
+
+requests = lazy_import("requests")  # Imported by the first API call
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKUP_DIR = "backups"
+
+
+# ----------------------------------------------------------
+class ConfigStore:
+    """
+    Content-addressed configuration store with run manifests.
+    """
+
+    def __init__(self, directory: str = DEFAULT_BACKUP_DIR):
+        self.directory = directory
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], f"{digest}.gz")
+
+    def put(self, text: str) -> tuple[str, bool]:
+        """
+        Store a configuration. Returns its sha256 and True if it was not stored yet.
+        """
+        data = text.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            return digest, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(gzip.compress(data, mtime=0))
+        os.replace(tmp, path)  # Same content whatever the writer, so concurrent writers are harmless
+        return digest, True
+
+    def get(self, digest: str) -> str:
+        """
+        Raises:
+            OSError: if the object is missing
+        """
+        return self.read_object(self.object_path(digest))
+
+    @staticmethod
+    def read_object(path: str) -> str:
+        with open(path, "rb") as f:
+            return gzip.decompress(f.read()).decode()
+
+    # ----- manifests -----
+
+    def manifest_path(self, run: str) -> str:
+        return os.path.join(self.directory, "manifests", f"{run}.json")
+
+    def runs(self) -> list[str]:
+        """Run names, oldest first (they sort by start time)"""
+        try:
+            names = os.listdir(os.path.join(self.directory, "manifests"))
+        except OSError:
+            return []
+        return sorted(name[: -len(".json")] for name in names if name.endswith(".json"))
+
+    def save_manifest(self, manifest: dict) -> str:
+        path = self.manifest_path(manifest["run"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def load_manifest(self, run: str) -> dict:
+        """
+        Raises:
+            OSError, ValueError: if the manifest is missing or invalid
+        """
+        with open(self.manifest_path(run)) as f:
+            return json.load(f)
+
+    def latest(self) -> Optional[dict]:
+        runs = self.runs()
+        return self.load_manifest(runs[-1]) if runs else None
+
+    # ----- per device index -----
+
+    def devices(self) -> dict:
+        """Last successful backup of each device: {uuid: entry with run}"""
+        try:
+            with open(os.path.join(self.directory, "devices.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def update_devices(self, manifest: dict) -> dict:
+        devices = self.devices()
+        for uuid, entry in manifest["devices"].items():
+            if "sha256" in entry:
+                devices[uuid] = dict(entry, run=manifest["run"])
+        path = os.path.join(self.directory, "devices.json")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(devices, f, indent=1)
+        os.replace(path + ".tmp", path)
+        return devices
+
+    def history(self, uuid: str) -> list[tuple[str, dict]]:
+        """(run, manifest entry) of a device in all the runs, oldest first"""
+        entries = []
+        for run in self.runs():
+            entry = self.load_manifest(run)["devices"].get(uuid)
+            if entry:
+                entries.append((run, entry))
+        return entries
+
+
+# ----------------------------------------------------------
+class ConfigBackup:
+    """
+    Fetch the running configurations of many devices concurrently into a ConfigStore.
+
+    Example:
+        backup = ConfigBackup(manager, ConfigStore(), workers=8, rate=5)
+        manifest = backup.run(Inventory.for_manager(manager, max_age=300).devices)
+        print(manifest["stats"])
+    """
+
+    def __init__(self, manager, store: ConfigStore, workers: int = 8, rate: Optional[float] = None):
+        """
+        Args:
+            manager: Manager instance, its API budget also applies
+            store (ConfigStore): where the configurations and manifests are saved
+            workers (int): concurrent requests
+            rate (float): maximum configurations fetched per second, None: only the Manager API budget
+        """
+        self.manager = manager
+        self.store = store
+        self.workers = workers
+        self.bucket = TokenBucket(rate) if rate else None
+
+    def _backup_device(self, device: dict, previous: dict) -> dict:
+        uuid = device["uuid"]
+        entry = {"hostname": device_field(device, "hostname"), "system_ip": device_field(device, "system_ip")}
+        if self.bucket:
+            self.bucket.acquire()
+        start = time.monotonic()
+        try:
+            payload = self.manager._api_get(f"/template/config/running/{uuid}")
+            config = payload.get("config")
+            if not isinstance(config, str):
+                raise ValueError("no running configuration in the response")
+        except (requests.exceptions.RequestException, ValueError) as e:  # Recorded in the manifest, the run goes on
+            entry.update(error=str(e), elapsed=round(time.monotonic() - start, 3))
+            return entry
+
+        digest, stored = self.store.put(config)
+        entry.update(
+            sha256=digest,
+            size=len(config.encode()),
+            stored=stored,
+            changed=previous.get("sha256") != digest,
+            elapsed=round(time.monotonic() - start, 3),
+        )
+        return entry
+
+    def run(self, devices: list[dict], progress=None) -> dict:
+        """
+        Back up the devices and save the run manifest.
+
+        Args:
+            devices (list): inventory entries (uuid, host-name, system-ip)
+            progress: optional callable(done, total) called after each device
+
+        Returns:
+            dict: the manifest (run, host, started, finished, stats, devices: {uuid: entry})
+        """
+        started = datetime.now(timezone.utc)
+        run = started.strftime("%Y%m%dT%H%M%S%fZ")
+        previous = self.store.devices()
+        start = time.monotonic()
+
+        entries = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self._backup_device, device, previous.get(device["uuid"], {})): device["uuid"]
+                for device in devices
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                entries[futures[future]] = future.result()
+                if progress:
+                    progress(done, len(futures))
+
+        manifest = {
+            "run": run,
+            "host": self.manager.host,
+            "started": started.isoformat(),
+            "finished": datetime.now(timezone.utc).isoformat(),
+            "stats": self.stats(entries, time.monotonic() - start),
+            "devices": dict(sorted(entries.items())),
+        }
+        path = self.store.save_manifest(manifest)
+        self.store.update_devices(manifest)
+        logger.info(f"Config backup {run}: {manifest['stats']} ({path})")
+        return manifest
+
+    def stats(self, entries: dict, elapsed: float) -> dict:
+        """Run statistics: counts, bytes fetched and newly stored (compressed), fetch times"""
+        succeeded = [entry for entry in entries.values() if "sha256" in entry]
+        times = sorted(entry["elapsed"] for entry in succeeded)
+        new_objects = {entry["sha256"] for entry in succeeded if entry["stored"]}
+        return {
+            "devices": len(entries),
+            "succeeded": len(succeeded),
+            "failed": len(entries) - len(succeeded),
+            "changed": sum(entry["changed"] for entry in succeeded),
+            "new_objects": len(new_objects),
+            "bytes_fetched": sum(entry["size"] for entry in succeeded),
+            "bytes_stored": sum(os.path.getsize(self.store.object_path(digest)) for digest in new_objects),
+            "elapsed": round(elapsed, 3),
+            "per_second": round(len(entries) / elapsed, 2) if elapsed else 0.0,
+            "fetch_avg": round(sum(times) / len(times), 3) if times else 0.0,
+            "fetch_p95": times[int(0.95 * (len(times) - 1))] if times else 0.0,
+            "fetch_max": times[-1] if times else 0.0,
+        }
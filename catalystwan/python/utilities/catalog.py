@@ -0,0 +1,166 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Policy and template catalog
+#
+# Description:
+#   Local, on-disk copy of the template and policy lists with name -> item
+#   indexes, so repeated operations resolve names without a list call.
+#   A collection is reused as-is while fresh (max_age), then revalidated with
+#   a conditional GET (ETag) when the Manager provides one; lastUpdatedOn and
+#   the item count are used to report whether the collection changed.
+#   Callers invalidate a collection after writing to it.
+#
+# =========================================================================
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_DIR = "cache"
+
+# kind: (list API path, name field, id field)
+COLLECTIONS = {
+    "vsmart_policies": ("/template/policy/vsmart", "policyName", "policyId"),
+    "approute_policies": ("/template/policy/definition/approute", "name", "definitionId"),
+    "device_templates": ("/template/device", "templateName", "templateId"),
+    "feature_templates": ("/template/feature", "templateName", "templateId"),
+}
+
+
+# ----------------------------------------------------------
+class Catalog:
+    """
+    Name -> id catalog of SD-WAN Manager templates and policies, persisted between runs.
+
+    Example:
+        catalog = Catalog(manager)
+        policy_id = catalog.get_id("vsmart_policies", "MultiTopologyPlusAppRoute")
+        ...activate the policy...
+        catalog.invalidate("vsmart_policies")
+    """
+
+    def __init__(self, manager, path: Optional[str] = None, max_age: float = 300):
+        """
+        Args:
+            manager: Manager instance, only used when a collection must be (re)synced
+            path (str): catalog file, default cache/catalog_<host>_<port>.json
+            max_age (float): seconds during which a synced collection is used without revalidation
+        """
+        self.manager = manager
+        self.path = path or os.path.join(DEFAULT_CATALOG_DIR, f"catalog_{manager.host}_{manager.port}.json")
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._collections: dict = {}
+        self._indexes: dict = {}
+        self._load()
+
+    # ----- persistence -----
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                self._collections = json.load(f)
+        except (OSError, ValueError):
+            self._collections = {}
+        for kind in list(self._collections):
+            if kind in COLLECTIONS:
+                self._index(kind)
+            else:
+                del self._collections[kind]
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self._collections, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def _index(self, kind: str):
+        _, name_field, _ = COLLECTIONS[kind]
+        self._indexes[kind] = {item.get(name_field): item for item in self._collections[kind]["items"]}
+
+    # ----- sync -----
+
+    @staticmethod
+    def fingerprint(items: list) -> list:
+        """Change marker of a list: item count and latest lastUpdatedOn (when the API provides it)"""
+        return [len(items), max((item.get("lastUpdatedOn") or 0 for item in items), default=0)]
+
+    def store(self, kind: str, items: list, etag: Optional[str] = None) -> bool:
+        """
+        Store a freshly retrieved list (e.g. by a list command). Returns True if it changed.
+        """
+        with self._lock:
+            previous = self._collections.get(kind)
+            fingerprint = self.fingerprint(items)
+            changed = previous is None or previous["fingerprint"] != fingerprint
+            self._collections[kind] = {"synced": time.time(), "etag": etag, "fingerprint": fingerprint, "items": items}
+            self._index(kind)
+            self._save()
+        logger.info(f"Catalog {kind}: {len(items)} items, {'changed' if changed else 'unchanged'}")
+        return changed
+
+    def sync(self, kind: str, force: bool = False) -> bool:
+        """
+        Make sure a collection is up to date. Returns True if it was (re)loaded with changes.
+
+        Raises:
+            requests.exceptions.RequestException: if the list cannot be retrieved
+        """
+        path, _, _ = COLLECTIONS[kind]
+        cached = self._collections.get(kind)
+        if cached and not force and time.time() - cached["synced"] < self.max_age:
+            return False
+
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        response = self.manager._api_request("GET", path, headers=headers)
+        if response.status_code == 304:
+            with self._lock:
+                cached["synced"] = time.time()
+                self._save()
+            logger.info(f"Catalog {kind}: not modified")
+            return False
+
+        response.raise_for_status()
+        return self.store(kind, response.json()["data"], response.headers.get("ETag"))
+
+    def invalidate(self, kind: Optional[str] = None):
+        """Forget one collection (or all), it will be synced on next use. Call after writes."""
+        with self._lock:
+            for name in [kind] if kind else list(self._collections):
+                self._collections.pop(name, None)
+                self._indexes.pop(name, None)
+            self._save()
+
+    # ----- lookups -----
+
+    def items(self, kind: str) -> list:
+        """All items of a collection"""
+        self.sync(kind)
+        return self._collections[kind]["items"]
+
+    def get(self, kind: str, name: str) -> Optional[dict]:
+        """
+        Item with the given name, or None. A name missing from a cached collection
+        triggers one forced sync, in case it was created since the last sync.
+        """
+        self.sync(kind)
+        item = self._indexes[kind].get(name)
+        if item is None and time.time() - self._collections[kind]["synced"] > 1:
+            self.sync(kind, force=True)
+            item = self._indexes[kind].get(name)
+        return item
+
+    def get_id(self, kind: str, name: str) -> Optional[str]:
+        """Id of the item with the given name, or None"""
+        item = self.get(kind, name)
+        return item.get(COLLECTIONS[kind][2]) if item else None
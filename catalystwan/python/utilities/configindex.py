@@ -0,0 +1,376 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Configuration index
+#
+# Description:
+#   Search and diff of the running configurations saved by config-backup
+#   (see utilities/backup.py). Configurations are split into sections by
+#   indentation: each line is read with its parent lines, e.g.
+#
+#     bfd color lte
+#      hello-interval 1000      ->  bfd color lte hello-interval 1000
+#
+#   An inverted index (token: configurations) of the stored objects is kept
+#   in backups/index.json and updated incrementally: objects are immutable
+#   (content-addressed), so only new ones are parsed. A search intersects the
+#   postings of the query tokens, then checks the candidates line by line.
+#   Parsing, checks and diffs run in parallel processes.
+#
+# =========================================================================
+
+import difflib
+import json
+import logging
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from utilities.backup import ConfigStore
+
+logger = logging.getLogger(__name__)
+
+# Below this number of objects, work is done in the calling process (a process pool costs more than it saves)
+PARALLEL_THRESHOLD = 16
+
+INDEX_FORMAT = 1
+
+# Split point before each top level line
+_TOP_LEVEL = re.compile(r"\n(?=\S)")
+
+
+# ----------------------------------------------------------
+def config_paths(text: str) -> list[tuple[str, ...]]:
+    """
+    Lines of a configuration with their parent lines (by indentation), comments and blank lines excluded.
+    "interface GigabitEthernet1" / " ip address 10.0.0.1 255.255.255.0" gives
+    ("interface GigabitEthernet1",) and ("interface GigabitEthernet1", "ip address 10.0.0.1 255.255.255.0").
+    """
+    paths = []
+    indents: list = []  # Indentation and line of the open sections
+    parents: list = []
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line or line.startswith("!"):
+            continue
+        indent = len(raw) - len(raw.lstrip())
+        while indents and indents[-1] >= indent:
+            indents.pop()
+            parents.pop()
+        paths.append((*parents, line))
+        indents.append(indent)
+        parents.append(line)
+    return paths
+
+
+def config_sections(text: str) -> dict[tuple[str, int], list[str]]:
+    """
+    Top level sections of a configuration: (first line, occurrence): lines, in order.
+    Occurrence numbers the sections repeating the same first line.
+    """
+    sections: dict = {}
+    seen: Counter = Counter()
+    lines: Optional[list] = None
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line.strip() or line.lstrip().startswith("!"):
+            continue
+        if lines is None or not line[0].isspace():
+            header = " ".join(line.split())
+            lines = sections[(header, seen[header])] = []
+            seen[header] += 1
+        lines.append(line)
+    return sections
+
+
+def section_diff(old_text: str, new_text: str, context: int = 3) -> str:
+    """
+    Unified diff of two configurations, section by section: each changed top level section is one
+    hunk labelled with its first line (sections are small, so difflib stays fast and aligned).
+    """
+    old, new = config_sections(old_text), config_sections(new_text)
+    chunks = []
+    for key in list(new) + [key for key in old if key not in new]:
+        before, after = old.get(key, []), new.get(key, [])
+        if before == after:
+            continue
+        chunks.append(f"@@ {key[0]} @@\n")
+        for line in list(difflib.unified_diff(before, after, n=context, lineterm=""))[2:]:
+            if not line.startswith("@@"):
+                chunks.append(line + "\n")
+    return "".join(chunks)
+
+
+def tokenize(text: str) -> set[str]:
+    """Index tokens: lowercase words separated by white space"""
+    return set(text.lower().split())
+
+
+def _object_tokens(path: str) -> list[str]:
+    return list(tokenize(ConfigStore.read_object(path)))
+
+
+def _object_matches(args: tuple) -> list[str]:
+    """
+    Lines (with their parents) of an object matching the regular expression, or containing the phrase
+    and ending it (so the children of a matching section line are not reported again)
+    """
+    path, phrase, pattern = args
+    text = ConfigStore.read_object(path)
+    if pattern is not None:
+        return [line for line in (" ".join(parts) for parts in config_paths(text)) if re.search(pattern, line)]
+
+    lower = text.lower()
+    if len(lower) != len(text):  # Offsets differ (rare Unicode case changes): parse every line
+        return [
+            " ".join(parts)
+            for parts in config_paths(text)
+            if phrase.split()[-1] in parts[-1].lower().split() and phrase in f" {' '.join(parts).lower()} "
+        ]
+
+    # Only the lines holding the last word of the phrase are read with their parents
+    matches = []
+    line_start = -1
+    last = phrase.split()[-1]
+    position = lower.find(last)
+    while position >= 0:
+        found, position = position, lower.find(last, position + 1)
+        end = found + len(last)
+        if (found and not lower[found - 1].isspace()) or (end < len(lower) and not lower[end].isspace()):
+            continue  # Part of a longer word
+        start = lower.rfind("\n", 0, found) + 1
+        if start == line_start:  # Word repeated on the line
+            continue
+        line_start = start
+        parts = _line_path(text, start)
+        if parts and phrase in f" {' '.join(parts).lower()} ":
+            matches.append(" ".join(parts))
+    return matches
+
+
+def _line_path(text: str, start: int) -> tuple[str, ...]:
+    """Line starting at an offset with its parent lines, as config_paths (empty for a comment or blank line)"""
+    end = text.find("\n", start)
+    raw = text[start : end if end >= 0 else len(text)]
+    stripped = raw.lstrip()
+    if not stripped.strip() or stripped.startswith("!"):
+        return ()
+    indent = len(raw) - len(stripped)
+    parts = [" ".join(raw.split())]
+    position = start
+    while indent > 0 and position > 0:
+        previous_start = text.rfind("\n", 0, position - 1) + 1
+        previous = text[previous_start : position - 1]
+        position = previous_start
+        stripped = previous.lstrip()
+        if not stripped.strip() or stripped.startswith("!"):
+            continue
+        if len(previous) - len(stripped) < indent:
+            indent = len(previous) - len(stripped)
+            parts.append(" ".join(previous.split()))
+    return tuple(reversed(parts))
+
+
+def _object_diff(args: tuple) -> dict:
+    """Changed lines (with their parents) between two objects, the changed top level sections, and a section diff"""
+    old_path, new_path, unified = args
+    old_text = ConfigStore.read_object(old_path) if old_path else ""
+    new_text = ConfigStore.read_object(new_path)
+
+    # Unchanged top level blocks are skipped before the (slower) line by line comparison
+    old_blocks, new_blocks = Counter(_TOP_LEVEL.split(old_text)), Counter(_TOP_LEVEL.split(new_text))
+    old_paths = [
+        (parts[0], " ".join(parts)) for block in (old_blocks - new_blocks).elements() for parts in config_paths(block)
+    ]
+    new_paths = [
+        (parts[0], " ".join(parts)) for block in (new_blocks - old_blocks).elements() for parts in config_paths(block)
+    ]
+    old_lines = Counter(line for _, line in old_paths)
+    new_lines = Counter(line for _, line in new_paths)
+
+    removed = old_lines - new_lines
+    added = new_lines - old_lines
+    sections = {section for section, line in new_paths if line in added}
+    sections.update(section for section, line in old_paths if line in removed)
+
+    diff = section_diff(old_text, new_text) if unified else None
+    return {"added": sum(added.values()), "removed": sum(removed.values()), "sections": sorted(sections), "diff": diff}
+
+
+def _map(function, items: list, workers: Optional[int]) -> list:
+    """map() in a process pool, or in this process for a few items"""
+    workers = workers or os.cpu_count() or 1
+    if len(items) < PARALLEL_THRESHOLD or workers == 1:
+        return [function(item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, items, chunksize=max(1, len(items) // (4 * workers))))
+
+
+# ----------------------------------------------------------
+class ConfigIndex:
+    """
+    Inverted index of the configurations of a ConfigStore.
+
+    Example:
+        index = ConfigIndex(ConfigStore())
+        index.update()
+        for uuid, lines in index.search("bfd color lte hello-interval 1000").items():
+            print(uuid, lines)
+    """
+
+    def __init__(self, store: ConfigStore, workers: Optional[int] = None):
+        """
+        Args:
+            store (ConfigStore): backups to index
+            workers (int): processes used to parse and check the configurations, default: number of CPUs
+        """
+        self.store = store
+        self.workers = workers
+        self.path = os.path.join(store.directory, "index.json")
+        self.docs: list[str] = []  # Object sha256, position: document id
+        self.postings: dict[str, list[int]] = {}  # token: sorted document ids
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            if cached.get("format") == INDEX_FORMAT:
+                self.docs, self.postings = cached["docs"], cached["postings"]
+        except (OSError, ValueError, KeyError):
+            self.docs, self.postings = [], {}
+
+    def save(self):
+        os.makedirs(self.store.directory, exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"format": INDEX_FORMAT, "docs": self.docs, "postings": self.postings}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def update(self, digests: Optional[set] = None) -> int:
+        """
+        Index the objects of the last backup of each device (or the given digests), drop the others.
+        Returns the number of objects parsed.
+        """
+        if digests is None:
+            digests = {entry["sha256"] for entry in self.store.devices().values()}
+
+        # Drop the objects no longer referenced, renumbering the documents
+        dropped = set(self.docs) - digests
+        if dropped:
+            renumber = {}
+            for doc_id, digest in enumerate(self.docs):
+                if digest in digests:
+                    renumber[doc_id] = len(renumber)
+            self.docs = [digest for digest in self.docs if digest in digests]
+            postings = {}
+            for token, doc_ids in self.postings.items():
+                kept = [renumber[doc_id] for doc_id in doc_ids if doc_id in renumber]
+                if kept:
+                    postings[token] = kept
+            self.postings = postings
+
+        new = sorted(digests - set(self.docs))
+        if new:
+            paths = [self.store.object_path(digest) for digest in new]
+            for digest, tokens in zip(new, _map(_object_tokens, paths, self.workers)):
+                doc_id = len(self.docs)
+                self.docs.append(digest)
+                for token in tokens:
+                    self.postings.setdefault(token, []).append(doc_id)  # Ids grow, lists stay sorted
+        if new or dropped:
+            self.save()
+        logger.info(f"Config index: {len(new)} objects parsed, {len(dropped)} dropped, {len(self.docs)} indexed")
+        return len(new)
+
+    def candidates(self, query: str) -> list[str]:
+        """Objects containing all the tokens of the query (in any order)"""
+        tokens = sorted(tokenize(query), key=lambda token: len(self.postings.get(token, ())))
+        if not tokens:
+            return []
+        doc_ids = set(self.postings.get(tokens[0], ()))
+        for token in tokens[1:]:
+            if not doc_ids:
+                break
+            doc_ids.intersection_update(self.postings.get(token, ()))
+        return [self.docs[doc_id] for doc_id in sorted(doc_ids)]
+
+    def search(self, query: str, regex: bool = False) -> dict[str, list[str]]:
+        """
+        Devices (uuid) of the last backups whose configuration has the query on a line (read with its parents).
+
+        Args:
+            query (str): words in sequence, case insensitive, e.g. "bfd color lte hello-interval 1000",
+                or a regular expression if regex is set (checked against all the configurations)
+
+        Returns:
+            dict: uuid: matching lines
+        """
+        if regex:
+            re.compile(query)  # Raises re.error before any work is dispatched
+            digests = list(self.docs)
+            args = [(self.store.object_path(digest), None, query) for digest in digests]
+        else:
+            digests = self.candidates(query)
+            phrase = f" {' '.join(query.lower().split())} "
+            args = [(self.store.object_path(digest), phrase, None) for digest in digests]
+
+        matches = {digest: lines for digest, lines in zip(digests, _map(_object_matches, args, self.workers)) if lines}
+        devices = {}
+        for uuid, entry in sorted(self.store.devices().items()):
+            if entry["sha256"] in matches:
+                devices[uuid] = matches[entry["sha256"]]
+        return devices
+
+
+# ----------------------------------------------------------
+def backup_state(store: ConfigStore, run: Optional[str] = None) -> dict:
+    """
+    Last backup of each device as of a run (included), {uuid: entry}. Without run: the latest backups.
+    """
+    if run is None:
+        return store.devices()
+    state: dict = {}
+    for name in store.runs():
+        if name > run:
+            break
+        for uuid, entry in store.load_manifest(name)["devices"].items():
+            if "sha256" in entry:
+                state[uuid] = entry
+    return state
+
+
+def diff_backups(
+    store: ConfigStore,
+    old: dict,
+    new: dict,
+    uuids: Optional[list] = None,
+    unified: bool = False,
+    workers: Optional[int] = None,
+) -> dict[str, dict]:
+    """
+    Per device diffs between two backup states (see backup_state), computed in parallel.
+
+    Returns:
+        dict: uuid: {hostname, system_ip, added, removed, sections, diff} for the devices whose configuration changed
+            (devices missing from old are compared with an empty configuration)
+    """
+    jobs = []
+    for uuid, entry in sorted(new.items()):
+        if uuids and uuid not in uuids:
+            continue
+        previous = old.get(uuid, {}).get("sha256")
+        if previous != entry["sha256"]:
+            jobs.append((uuid, entry, previous))
+
+    args = [
+        (store.object_path(previous) if previous else None, store.object_path(entry["sha256"]), unified)
+        for _, entry, previous in jobs
+    ]
+    return {
+        uuid: dict(result, hostname=entry["hostname"], system_ip=entry["system_ip"])
+        for (uuid, entry, _), result in zip(jobs, _map(_object_diff, args, workers))
+    }
@@ -0,0 +1,277 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Device inventory
+#
+# Description:
+#   Local copy of the device inventory, shared by the tools that need
+#   hostnames, system IPs or sites. A sync fetches /device (devices known
+#   to the Manager, with their live state) and /system/device/vedges
+#   (WAN edge list, with certificate and configuration state), merges them
+#   by uuid and saves them under cache/. Each sync is compared with the
+#   previous one: added and removed devices, and version, certificate,
+#   reachability, hostname, system IP and site changes are appended to
+#   cache/inventory_changes_<host>.jsonl. Lookups by uuid, system IP,
+#   hostname and site use in-memory indexes.
+#   mcp-sdwan/api/inventory.py has a copy without the file persistence
+#   (checked by tests/test_mcp_copies.py).
+#
+# =========================================================================
+
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INVENTORY_DIR = "cache"
+
+# Seconds a saved inventory is used by the lookups without syncing again
+DEFAULT_MAX_AGE = 300
+
+# source: API path
+SOURCES = {
+    "device": "/device",
+    "vedges": "/system/device/vedges",
+}
+
+# Compared fields: keys of the device entries, first one present wins (the two sources name some fields differently)
+FIELDS = {
+    "hostname": ("host-name",),
+    "system_ip": ("system-ip", "configuredSystemIP"),
+    "site_id": ("site-id", "siteId", "configuredSiteId"),
+    "version": ("version",),
+    "certificate": ("vedgeCertificateState", "certificate-validity"),
+    "reachability": ("reachability",),
+}
+
+
+# ----------------------------------------------------------
+def device_field(device: dict, field: str) -> Optional[str]:
+    """Value of a FIELDS field of a device entry, None if missing (e.g. device_field(device, "system_ip"))"""
+    for key in FIELDS[field]:
+        value = device.get(key)
+        if value not in (None, "", "--"):
+            return str(value)
+    return None
+
+
+class Inventory:
+    """
+    Devices merged from the inventory sources, with indexes.
+
+    Example:
+        inventory = Inventory.for_manager(manager, max_age=300)
+        device = inventory.by_system_ip("10.0.0.1")
+        for change in inventory.changes:
+            print(change["change"], change["hostname"], change.get("field"))
+    """
+
+    def __init__(self, host: str, devices: list[dict], sources: dict, synced: Optional[float] = None):
+        """
+        Args:
+            host (str): Manager host, the inventory file is named after it
+            devices (list): merged device entries
+            sources (dict): uuid: names of the sources listing the device
+            synced (float): epoch time of the sync
+        """
+        self.host = host
+        self.devices = devices
+        self.sources = sources
+        self.synced = synced or time.time()
+        self.changes: list[dict] = []  # Changes found by the sync that produced this inventory
+
+        self._by_uuid = {device["uuid"]: device for device in devices}
+        self._by_system_ip: dict = {}
+        self._by_hostname: dict = {}
+        self._by_site: dict = {}
+        for device in devices:
+            system_ip = device_field(device, "system_ip")
+            if system_ip:
+                self._by_system_ip[system_ip] = device
+            hostname = device_field(device, "hostname")
+            if hostname:
+                self._by_hostname[hostname.lower()] = device
+            site_id = device_field(device, "site_id")
+            if site_id:
+                self._by_site.setdefault(site_id, []).append(device)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    # ----- lookups -----
+
+    def by_uuid(self, uuid: str) -> Optional[dict]:
+        return self._by_uuid.get(uuid)
+
+    def by_system_ip(self, system_ip: str) -> Optional[dict]:
+        return self._by_system_ip.get(system_ip)
+
+    def by_hostname(self, hostname: str) -> Optional[dict]:
+        """Case insensitive"""
+        return self._by_hostname.get(hostname.lower())
+
+    def by_site(self, site_id) -> list[dict]:
+        return self._by_site.get(str(site_id), [])
+
+    def sites(self) -> list[str]:
+        return sorted(self._by_site, key=lambda site: (len(site), site))
+
+    def find(self, key: str) -> Optional[dict]:
+        """Device by uuid, system IP or hostname"""
+        return self.by_uuid(key) or self.by_system_ip(key) or self.by_hostname(key)
+
+    def hostname(self, system_ip: str, default: Optional[str] = None) -> Optional[str]:
+        """Hostname of a system IP, e.g. to label tunnels"""
+        device = self.by_system_ip(system_ip)
+        return (device_field(device, "hostname") if device else None) or default
+
+    def in_source(self, device: dict, source: str) -> bool:
+        return source in self.sources.get(device["uuid"], ())
+
+    # ----- changes -----
+
+    def diff(self, newer: "Inventory") -> list[dict]:
+        """
+        Changes from this inventory to a newer one: one dict per added or removed device and per changed field.
+        """
+        changed_at = newer.synced
+        changes = []
+
+        def change(kind: str, device: dict, **extra) -> dict:
+            return {
+                "time": changed_at,
+                "change": kind,
+                "uuid": device["uuid"],
+                "hostname": device_field(device, "hostname"),
+                "system_ip": device_field(device, "system_ip"),
+                **extra,
+            }
+
+        for uuid, device in newer._by_uuid.items():
+            old = self._by_uuid.get(uuid)
+            if old is None:
+                changes.append(change("added", device))
+                continue
+            for field in FIELDS:
+                before, after = device_field(old, field), device_field(device, field)
+                if before != after:
+                    changes.append(change("changed", device, field=field, old=before, new=after))
+        for uuid, device in self._by_uuid.items():
+            if uuid not in newer._by_uuid:
+                changes.append(change("removed", device))
+        return changes
+
+    # ----- sync and persistence -----
+
+    @staticmethod
+    def path(host: str, directory: str = DEFAULT_INVENTORY_DIR) -> str:
+        host = re.sub(r"[^\w.-]", "_", host)
+        return os.path.join(directory, f"inventory_{host}.json")
+
+    @staticmethod
+    def changes_path(host: str, directory: str = DEFAULT_INVENTORY_DIR) -> str:
+        host = re.sub(r"[^\w.-]", "_", host)
+        return os.path.join(directory, f"inventory_changes_{host}.jsonl")
+
+    def save(self, directory: str = DEFAULT_INVENTORY_DIR) -> str:
+        path = self.path(self.host, directory)
+        os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"host": self.host, "synced": self.synced, "devices": self.devices, "sources": self.sources}, f)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "Inventory":
+        """
+        Raises:
+            OSError, ValueError: if the file is missing or not an inventory
+        """
+        with open(path) as f:
+            cached = json.load(f)
+        return cls(cached["host"], cached["devices"], cached["sources"], cached["synced"])
+
+    @classmethod
+    def fetch(cls, manager) -> "Inventory":
+        """
+        Download and merge the inventory sources (concurrently).
+
+        Raises:
+            requests.exceptions.RequestException: if a source cannot be downloaded
+        """
+        with ThreadPoolExecutor(max_workers=len(SOURCES)) as executor:
+            futures = {source: executor.submit(manager._api_get, path) for source, path in SOURCES.items()}
+            payloads = {source: future.result() for source, future in futures.items()}
+        return cls.from_payloads(manager.host, payloads)
+
+    @classmethod
+    def from_payloads(cls, host: str, payloads: dict) -> "Inventory":
+        """Merge the responses of the SOURCES (source: payload) by uuid"""
+        merged: dict = {}
+        sources: dict = {}
+        # /device last: its live state (reachability, running version) wins over the WAN edge list
+        for source in ("vedges", "device"):
+            for item in payloads.get(source, {}).get("data", []):
+                uuid = item.get("uuid")
+                if not uuid:
+                    continue
+                merged.setdefault(uuid, {}).update(item)
+                sources.setdefault(uuid, []).append(source)
+        return cls(host, list(merged.values()), sources)
+
+    @classmethod
+    def for_manager(
+        cls, manager, max_age: Optional[float] = None, refresh: bool = False, directory: str = DEFAULT_INVENTORY_DIR
+    ) -> "Inventory":
+        """
+        Inventory of the Manager: read from disk when synced less than max_age seconds ago, otherwise synced.
+        A sync records its changes (in .changes and in the changes file).
+
+        Args:
+            manager: Manager instance
+            max_age (float): seconds a saved inventory is used without syncing, None: always sync
+            refresh (bool): sync even if the saved inventory is recent
+
+        Raises:
+            requests.exceptions.RequestException: if the inventory cannot be downloaded
+        """
+        previous = None
+        try:
+            previous = cls.load(cls.path(manager.host, directory))
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if previous and max_age is not None and not refresh and time.time() - previous.synced < max_age:
+            logger.info(f"Inventory {manager.host}: {len(previous)} devices from disk")
+            return previous
+
+        inventory = cls.fetch(manager)
+        if previous:
+            inventory.changes = previous.diff(inventory)
+        inventory.save(directory)
+        if inventory.changes:
+            with open(cls.changes_path(manager.host, directory), "a") as f:
+                for change in inventory.changes:
+                    f.write(json.dumps(change) + "\n")
+        logger.info(f"Inventory {manager.host}: {len(inventory)} devices synced, {len(inventory.changes)} changes")
+        return inventory
+
+    @classmethod
+    def change_log(cls, host: str, since: float = 0, directory: str = DEFAULT_INVENTORY_DIR) -> list[dict]:
+        """Recorded changes since an epoch time, oldest first"""
+        try:
+            with open(cls.changes_path(host, directory)) as f:
+                changes = [json.loads(line) for line in f if line.strip()]
+        except OSError:
+            return []
+        return [change for change in changes if change["time"] >= since]
@@ -0,0 +1,140 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Logging
+#
+# Description:
+#   Logging setup shared by the command line tools (sdwan_api.log), with
+#   size-based rotation and optional JSON lines output.
+#   Payload previews are lazy: the value is redacted, serialized and
+#   truncated only when the log record is actually emitted.
+#
+#   Environment variables (all optional):
+#     manager_log_level      DEBUG, INFO (default), WARNING...
+#     manager_log_format     text (default) or jsonl
+#     manager_log_max_bytes  rotate the log file at this size, default 10000000 (0: never)
+#     manager_log_backups    number of rotated files kept, default 5
+#     manager_log_preview    maximum length of payload previews, default 1024
+#
+# =========================================================================
+
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from utilities.tools import load_env
+
+DEFAULT_LOG_FILE = "sdwan_api.log"
+TEXT_FORMAT = "%(levelname)s (%(asctime)s): %(message)s (Line: %(lineno)d [%(filename)s])"
+TEXT_DATEFMT = "%d/%m/%Y %I:%M:%S %p"
+
+REDACTED = "***"
+
+# Keys (headers, form fields, payload keys) whose values are never logged. Whole key names only:
+# "token" is secret, "tokenCount" or "passwordPolicy" are not.
+_SECRET_KEY = re.compile(
+    r"(j_)?password|passphrase|secret|(access_|refresh_)?token|(x-)?xsrf-token|(set-)?cookie|authorization"
+    r"|jsessionid|api[-_]?key|credentials?",
+    re.I,
+)
+
+preview_limit = 1024  # Set from manager_log_preview by configure_logging
+
+
+def redact(value):
+    """
+    Return a copy of a payload (dicts, lists, header mappings) with secret values replaced.
+    """
+    if isinstance(value, dict) or hasattr(value, "items"):
+        return {key: REDACTED if _SECRET_KEY.fullmatch(str(key)) else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+# ----------------------------------------------------------
+class Preview:
+    """
+    Lazy, redacted and truncated representation of a payload for log messages.
+    Use with %-style logging arguments so nothing is computed when the record is filtered:
+
+        logger.info("POST %s payload: %s", url, Preview(payload))
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit: int | None = None):
+        self.value = value
+        self.limit = preview_limit if limit is None else limit
+
+    def __str__(self):
+        try:
+            text = json.dumps(redact(self.value), default=str, separators=(",", ":"))
+        except (TypeError, ValueError):
+            text = repr(self.value)
+        if self.limit and len(text) > self.limit:
+            return f"{text[: self.limit]}... ({len(text)} chars)"
+        return text
+
+    __repr__ = __str__
+
+
+# ----------------------------------------------------------
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One JSON object per log record: time, level, logger, message, source, and exception if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "source": f"{record.filename}:{record.lineno}",
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(log_file: str = DEFAULT_LOG_FILE, level: str | int | None = None, json_lines: bool | None = None):
+    """
+    Configure the root logger to write to a rotating log file (once per process).
+
+    Args:
+        log_file (str): log file path, default sdwan_api.log
+        level (str|int): log level, default manager_log_level or INFO
+        json_lines (bool): JSON lines instead of text, default manager_log_format == "jsonl"
+    """
+    global preview_limit
+
+    root = logging.getLogger()
+    if any(getattr(handler, "_sdwan_api", False) for handler in root.handlers):
+        return
+
+    load_env()  # The manager_log_* variables can be set in .env
+    preview_limit = int(os.getenv("manager_log_preview", str(preview_limit)))
+
+    if level is None:
+        level = os.getenv("manager_log_level", "INFO").upper()
+    if json_lines is None:
+        json_lines = os.getenv("manager_log_format", "text").lower() == "jsonl"
+
+    handler = RotatingFileHandler(
+        log_file,
+        mode="a",
+        maxBytes=int(os.getenv("manager_log_max_bytes", "10000000")),
+        backupCount=int(os.getenv("manager_log_backups", "5")),
+        delay=True,  # The file is only created when something is logged
+    )
+    handler._sdwan_api = True  # type: ignore[attr-defined]
+    handler.setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(TEXT_FORMAT, TEXT_DATEFMT))
+
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -9,22 +9,49 @@
 #   Session-based authentication for Cisco SD-WAN Manager
 #   Log in with a username and password to establish a session.
 #   Get a cross-site request forgery prevention token, necessary for most POST operations
+#   Authentication is lazy: it happens on the first API call, so commands
+#   that never reach the Manager (--help, local processing) start instantly.
+#   All calls share one pooled keep-alive session.
+#   Calls are paced by a per-endpoint-class budget (see utilities.ratelimit),
+#   configurable with the manager_api_limits environment variable,
+#   e.g. manager_api_limits=realtime=2/4,statistics=20/8
+#   Each call is measured (utilities.metrics): latency, bytes, status codes.
+#   Calls without an explicit timeout wait `timeout` seconds (default 10),
+#   or `slow_timeout` seconds (default 120) for the SLOW_CALLS: statistics
+#   queries and aggregations, template attach and push.
 #
 # =========================================================================
 
+from __future__ import annotations
+
 import json
 import logging
 import os
 import sys
+import threading
+import time
 from typing import Optional, cast
+from urllib.parse import urlsplit
+
+from utilities.logs import Preview
+from utilities.metrics import RequestMetrics
+from utilities.ratelimit import RequestBudget, classify_endpoint, parse_limits
+from utilities.tools import lazy_import, load_env
 
-import requests
-import urllib3
+# Imported by the first API call: --help and local commands start faster
+requests = lazy_import("requests")
+urllib3 = lazy_import("urllib3")
 
 logger = logging.getLogger(__name__)
 
-# Disable insecure request warnings globally
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# (method, path prefix) of the calls the Manager can take minutes to answer: they get slow_timeout by default
+SLOW_CALLS = (
+    ("POST", "/statistics/"),  # queries and aggregations over long periods
+    ("POST", "/template/device/config/"),  # device inputs, attachfeature, attachcli
+    ("POST", "/template/config/device/mode/"),  # configuration mode changes (template push)
+    ("POST", "/template/policy/vsmart/activate/"),
+    ("PUT", "/template/"),  # template edits, recomputed for every attached device
+)
 
 
 # ----------------------------------------------------------
@@ -33,9 +60,12 @@ class Manager:
     Handles session-based authentication for SD-WAN Manager and provides common API methods.
     """
 
-    def __init__(self, host, port, user, password, validate_certs=False, timeout=10):
+    def __init__(
+        self, host, port, user, password, validate_certs=False, timeout=10, pool_size=10, limits=None, slow_timeout=120
+    ):
         """
-        Initialize Manager object with session parameters and perform authentication.
+        Initialize Manager object with session parameters.
+        Authentication is deferred to the first API call.
         Args:
             host (str): hostname or IP address of SD-WAN Manager
             user (str): username for authentication
@@ -43,15 +73,20 @@ class Manager:
             port (int): default HTTPS port 443
             validate_certs (bool): turn certificate validation on or off.
             timeout (int): how long Requests will wait for a response from the server, default 10 seconds
+            slow_timeout (int): timeout of the SLOW_CALLS (statistics queries, template attach and push), default 120 seconds
+            pool_size (int): number of keep-alive connections kept open, for concurrent calls, default 10
+            limits (dict): {endpoint class: (rate per second, concurrency)}, default from manager_api_limits
         """
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.timeout = timeout
+        self.slow_timeout = slow_timeout
+        self.pool_size = pool_size
         self.base_url = f"https://{self.host}:{self.port}"  # Base URL for login/token
-        self.session = requests.Session()
-        self.session.verify = validate_certs
+        self.validate_certs = validate_certs
+        self.session = None  # Created by the first API call, see _create_session
         self.jsessionid = None
         self.token = None
         self.dataservice_base_url = None  # Base URL for API calls (e.g., /dataservice)
@@ -61,22 +96,50 @@ class Manager:
         self.time = None  # Will be populated by about() method
         self.timeZone = None  # Will be populated by about() method
         self.status = False  # Indicates if authentication was successful
+        self._auth_lock = threading.Lock()
+        self.cache = None  # Optional GET response cache (utilities.shell.ResponseCache), used by the interactive shell
+        self.metrics = RequestMetrics()  # Per-endpoint latency, bytes and status codes, see --stats
+        self.budget = RequestBudget(limits or parse_limits(os.getenv("manager_api_limits")))
 
-        # Perform authentication during initialization
-        self._authenticate()
-        if self.dataservice_base_url:  # Check if authentication was successful
-            self.status = True
-            print("Authentication successful.")
-            logger.info("Successfully authenticated with SD-WAN Manager.")
-            logger.info(f"Session headers: {self.session.headers}")
-            logger.info(f"Base URL: {self.dataservice_base_url}")
+    def _ensure_authenticated(self):
+        """
+        Authenticate on first use. Safe to call from concurrent threads.
+        """
+        if self.status:
+            return
 
-        else:
-            print("Authentication failed. Please check sdwan_api.log for details.")
-            logger.error("Failed to authenticate with SD-WAN Manager. Exiting.")
-            sys.exit(1)  # Exit if authentication fails
+        with self._auth_lock:
+            if self.status:
+                return
 
-        self.about()  # Populate version and other info
+            if self.session is None:
+                self.session = self._create_session()
+            self._authenticate()
+            if self.dataservice_base_url:  # Check if authentication was successful
+                self.status = True
+                print("Authentication successful.", file=sys.stderr)
+                logger.info("Successfully authenticated with SD-WAN Manager.")
+                logger.info("Session headers: %s", Preview(self.session.headers))
+                logger.info("Base URL: %s", self.dataservice_base_url)
+
+            else:
+                print("Authentication failed. Please check sdwan_api.log for details.", file=sys.stderr)
+                logger.error("Failed to authenticate with SD-WAN Manager. Exiting.")
+                sys.exit(1)  # Exit if authentication fails
+
+            self.about()  # Populate version and other info
+
+    def _create_session(self):
+        """
+        Pooled keep-alive session. Created on first use: requests and urllib3 are only imported by the first API call.
+        """
+        # Disable insecure request warnings globally (here, as urllib3 is imported lazily)
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        session = requests.Session()
+        session.verify = self.validate_certs
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        return session
 
     def _login(self):
         """
@@ -177,13 +240,13 @@ class Manager:
             self.timeZone = data.get("timeZone")
 
             # Print the information
-            print("\nSD-WAN Manager Information:")
-            print(f" Version: {self.version}")
-            print(f" Application Version: {self.applicationVersion}")
-            print(f" Application Server: {self.applicationServer}")
-            print(f" Time: {self.time}")
-            print(f" Time Zone: {self.timeZone}")
-            print()
+            print("\nSD-WAN Manager Information:", file=sys.stderr)
+            print(f" Version: {self.version}", file=sys.stderr)
+            print(f" Application Version: {self.applicationVersion}", file=sys.stderr)
+            print(f" Application Server: {self.applicationServer}", file=sys.stderr)
+            print(f" Time: {self.time}", file=sys.stderr)
+            print(f" Time Zone: {self.timeZone}", file=sys.stderr)
+            print(file=sys.stderr)
 
         except requests.exceptions.RequestException as e:
             print(f"An unexpected error occurred: {e}")
@@ -191,6 +254,83 @@ class Manager:
                 print(f"Status: {e.response.status_code}, Response: {e.response.text}")
             return
 
+    def _api_request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Helper method to send a request to the SD-WAN Manager API and return the raw response.
+        Authenticates on first use and reuses the pooled session. HTTP errors are not raised,
+        the caller checks the response status.
+
+        Args:
+            method (str): HTTP method (GET, POST, PUT, DELETE).
+            path (str): The API endpoint path (e.g., "/device").
+            **kwargs: Passed to requests (params, json, data...).
+
+        Returns:
+            requests.Response: The API response.
+        """
+        self._ensure_authenticated()
+
+        url = cast(str, self.dataservice_base_url) + path
+
+        cache_key = None
+        if self.cache is not None:
+            if self.cache.cacheable(method, path, kwargs.get("params")):
+                cache_key = self.cache.key(path, kwargs.get("params"))
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Using cached response of %s %s", method, url)
+                    return cached
+            elif method.upper() != "GET":
+                self.cache.clear()  # A write can change any cached list
+
+        if "json" in kwargs:
+            logger.info("Making %s request to: %s with payload: %s", method, url, Preview(kwargs["json"]))
+        else:
+            logger.info("Making %s request to: %s with params: %s", method, url, Preview(kwargs.get("params")))
+
+        kwargs.setdefault("timeout", self.default_timeout(method, path))
+        endpoint_class = classify_endpoint(path, kwargs.get("params"))
+        with self.budget.acquire(endpoint_class) as wait:
+            if wait > 0.001:
+                logger.debug("Waited %.3fs for the %s API budget", wait, endpoint_class)
+
+            contexts = self.metrics.start(method, url)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+                elapsed = time.perf_counter() - start
+            except requests.exceptions.RequestException as e:
+                self.metrics.record(contexts, method, url, path, None, time.perf_counter() - start, error=type(e).__name__)
+                raise
+
+        retries = getattr(response.raw, "retries", None)
+        body = response.request.body
+        self.metrics.record(
+            contexts,
+            method,
+            url,
+            path,
+            response.status_code,
+            elapsed,
+            bytes_out=len(body) if body else 0,
+            bytes_in=len(response.content),
+            retries=len(retries.history) if retries else 0,
+        )
+        if cache_key is not None and response.status_code == 200:
+            self.cache.set(cache_key, response)
+        return response
+
+    def default_timeout(self, method: str, path: str) -> float:
+        """
+        Timeout of a call made without an explicit one: slow_timeout for the SLOW_CALLS, timeout otherwise.
+        """
+        method = method.upper()
+        route = urlsplit(path).path
+        for slow_method, prefix in SLOW_CALLS:
+            if method == slow_method and route.startswith(prefix):
+                return self.slow_timeout
+        return self.timeout
+
     def _api_get(self, path: str, params: Optional[dict] = None):
         """
         Helper method to make a GET request to the SD-WAN Manager API.
@@ -204,14 +344,9 @@ class Manager:
             dict: The JSON response from the API.
 
         Raises:
-            requests.exceptions.RequestException: If the API call fails or manager is not authenticated.
+            requests.exceptions.RequestException: If the API call fails.
         """
-        if not self.status:
-            raise requests.exceptions.RequestException("Manager not authenticated. Cannot make API call.")
-
-        url = cast(str, self.dataservice_base_url) + path
-        logger.info(f"Making GET request to: {url} with params: {params}")
-        response = self.session.get(url=url, params=params)
+        response = self._api_request("GET", path, params=params)
         response.raise_for_status()
         return response.json()
 
@@ -228,14 +363,9 @@ class Manager:
             dict: The JSON response from the API.
 
         Raises:
-            requests.exceptions.RequestException: If the API call fails or manager is not authenticated.
+            requests.exceptions.RequestException: If the API call fails.
         """
-        if not self.status:
-            raise requests.exceptions.RequestException("Manager not authenticated. Cannot make API call.")
-
-        url = cast(str, self.dataservice_base_url) + path
-        logger.info(f"Making POST request to: {url} with payload: {payload}")
-        response = self.session.post(url=url, json=payload)
+        response = self._api_request("POST", path, json=payload)
         response.raise_for_status()
 
         return response.json()
@@ -253,14 +383,9 @@ class Manager:
             dict: The JSON response from the API.
 
         Raises:
-            requests.exceptions.RequestException: If the API call fails or manager is not authenticated.
+            requests.exceptions.RequestException: If the API call fails.
         """
-        if not self.status:
-            raise requests.exceptions.RequestException("Manager not authenticated. Cannot make API call.")
-
-        url = cast(str, self.dataservice_base_url) + path
-        logger.info(f"Making PUT request to: {url} with payload: {payload}")
-        response = self.session.put(url=url, json=payload)
+        response = self._api_request("PUT", path, json=payload)
         response.raise_for_status()
 
         return response.json()
@@ -278,14 +403,9 @@ class Manager:
             dict: The JSON response from the API (often empty or a confirmation message).
 
         Raises:
-            requests.exceptions.RequestException: If the API call fails or manager is not authenticated.
+            requests.exceptions.RequestException: If the API call fails.
         """
-        if not self.status:
-            raise requests.exceptions.RequestException("Manager not authenticated. Cannot make API call.")
-
-        url = cast(str, self.dataservice_base_url) + path
-        response = self.session.delete(url=url, params=params)
-        logger.info(f"Making DELETE request to: {url} with params: {params}")
+        response = self._api_request("DELETE", path, params=params)
         response.raise_for_status()
 
         # DELETE requests often return 204 No Content, so response.json() might fail.
@@ -294,7 +414,7 @@ class Manager:
             try:
                 return response.json()
             except json.JSONDecodeError:
-                logger.warning(f"DELETE response content is not JSON: {response.text}")
+                logger.warning("DELETE response content is not JSON: %s", Preview(response.text))
                 return {"message": "Operation successful, no JSON response content."}
         else:
             return {"message": "Operation successful, no content returned."}
@@ -302,17 +422,30 @@ class Manager:
     def logout(self):
         """
         Logs out of the SD-WAN Manager session.
+        Nothing to do if no API call was made (the session was never authenticated).
         """
 
         if not self.status:
-            raise requests.exceptions.RequestException("Manager not authenticated. Cannot make API call.")
+            return
+
+        for endpoint_class, metrics in self.budget.stats().items():
+            logger.info(
+                "API budget %s: %d requests, %d waited, avg wait %.3fs, max wait %.3fs",
+                endpoint_class,
+                metrics["requests"],
+                metrics["waited"],
+                metrics["avg_wait"],
+                metrics["max_wait"],
+            )
 
         api = "/logout"
         url = self.base_url + api
         # url = cast(str, self.dataservice_base_url) + path
-        logger.info(f"Logout: {url}")
-        response = self.session.post(url=url)
+        logger.info("Logout: %s", url)
+        response = self.session.post(url=url, timeout=self.timeout)
         response.raise_for_status()
+        self.status = False
+        self.session.close()
         logger.info("Successfully logged out of SD-WAN Manager.")
 
 
@@ -323,9 +456,7 @@ def get_manager_credentials_from_env():
     Exits if any required variable is missing.
     """
 
-    from dotenv import load_dotenv
-
-    load_dotenv()
+    load_env()
 
     manager_host = os.getenv("manager_host")
     manager_port = os.getenv("manager_port")
@@ -0,0 +1,260 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# API request metrics
+#
+# Description:
+#   Per-endpoint latency histograms, bytes in/out, transport retries and
+#   status code counters of the calls made by the Manager, plus a hook
+#   interface to export each request (callbacks or OpenTelemetry spans).
+#   Endpoints are aggregated by route: ids, IP addresses and numbers in
+#   the path are replaced by {id}, the query string is ignored.
+#
+# =========================================================================
+
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+import click
+
+# Latency histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+\.\d+\.\d+\.\d+|[0-9a-fA-F]{24,})$"
+)
+
+# Reusable click option, to be added on the cli groups
+stats_option = click.option(
+    "--stats",
+    is_flag=True,
+    default=False,
+    help="Print a summary of the API calls (latency, bytes, status codes) on exit.",
+)
+
+
+def endpoint_key(method: str, path: str) -> str:
+    """
+    Aggregation key of a request, e.g. "GET /device/counters" or "PUT /template/policy/definition/approute/{id}".
+    """
+    route = path.split("?", 1)[0]
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in route.split("/")]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+# ----------------------------------------------------------
+class Histogram:
+    """
+    Fixed-bucket latency histogram (milliseconds).
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction (0-1) of the observations, capped at max"""
+        if not self.count:
+            return None
+        threshold = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= threshold:
+                return min(bound, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+# ----------------------------------------------------------
+class RequestHook:
+    """
+    Hook interface called around each API request. Subclass and override what is needed.
+    The value returned by on_request_start is passed back to on_request_end.
+    """
+
+    def on_request_start(self, method: str, url: str) -> object:
+        return None
+
+    def on_request_end(self, context: object, method: str, url: str, record: dict):
+        """
+        record: endpoint, status (int, or None on transport error), elapsed_ms, bytes_out, bytes_in, retries, error
+        """
+        pass
+
+
+class CallbackHook(RequestHook):
+    """Call a function with (method, url, record) after each request"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def on_request_end(self, context, method, url, record):
+        self.callback(method, url, record)
+
+
+class OpenTelemetryHook(RequestHook):
+    """
+    Create one OpenTelemetry client span per request (requires the opentelemetry-api package).
+    """
+
+    def __init__(self, tracer_name: str = "sdwan-manager"):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError("OpenTelemetryHook requires the opentelemetry-api package") from None
+        self._trace = trace
+        self.tracer = trace.get_tracer(tracer_name)
+
+    def on_request_start(self, method, url):
+        span = self.tracer.start_span(method, kind=self._trace.SpanKind.CLIENT)
+        span.set_attribute("http.request.method", method)
+        span.set_attribute("url.full", url)
+        return span
+
+    def on_request_end(self, span, method, url, record):
+        span.set_attribute("url.template", record["endpoint"].split(" ", 1)[1])
+        if record["status"] is not None:
+            span.set_attribute("http.response.status_code", record["status"])
+        span.set_attribute("http.request.body.size", record["bytes_out"])
+        span.set_attribute("http.response.body.size", record["bytes_in"])
+        if record["retries"]:
+            span.set_attribute("http.request.resend_count", record["retries"])
+        if record["error"] or (record["status"] or 0) >= 500:
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, record["error"]))
+        span.end()
+
+
+# ----------------------------------------------------------
+class RequestMetrics:
+    """
+    Thread-safe aggregation of API request metrics, per endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: dict = {}
+        self.status_codes: Counter = Counter()
+        self.hooks: list[RequestHook] = []
+
+    def add_hook(self, hook: RequestHook):
+        self.hooks.append(hook)
+
+    def start(self, method: str, url: str) -> list:
+        """Notify the hooks of a new request, return their contexts"""
+        return [hook.on_request_start(method, url) for hook in self.hooks]
+
+    def record(self, contexts: list, method: str, url: str, path: str, status: Optional[int], elapsed: float,
+               bytes_out: int = 0, bytes_in: int = 0, retries: int = 0, error: Optional[str] = None) -> dict:
+        """
+        Record a completed (or failed) request and notify the hooks.
+
+        Args:
+            contexts (list): value returned by start()
+            status (int): HTTP status code, None on transport error
+            elapsed (float): request duration in seconds
+        """
+        key = endpoint_key(method, path)
+        record = {
+            "endpoint": key,
+            "status": status,
+            "elapsed_ms": elapsed * 1000,
+            "bytes_out": bytes_out,
+            "bytes_in": bytes_in,
+            "retries": retries,
+            "error": error,
+        }
+        status_label = str(status) if status is not None else "error"
+
+        with self._lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = {
+                    "latency": Histogram(),
+                    "bytes_out": 0,
+                    "bytes_in": 0,
+                    "retries": 0,
+                    "status": Counter(),
+                }
+            stats["latency"].observe(record["elapsed_ms"])
+            stats["bytes_out"] += bytes_out
+            stats["bytes_in"] += bytes_in
+            stats["retries"] += retries
+            stats["status"][status_label] += 1
+            self.status_codes[status_label] += 1
+
+        for hook, context in zip(self.hooks, contexts):
+            hook.on_request_end(context, method, url, record)
+        return record
+
+    def summary(self) -> list[dict]:
+        """Per-endpoint summary, slowest (total time) first"""
+        with self._lock:
+            rows = [
+                {
+                    "endpoint": key,
+                    "requests": stats["latency"].count,
+                    "total_ms": stats["latency"].total,
+                    "mean_ms": stats["latency"].mean,
+                    "p50_ms": stats["latency"].percentile(0.5),
+                    "p95_ms": stats["latency"].percentile(0.95),
+                    "max_ms": stats["latency"].max,
+                    "bytes_out": stats["bytes_out"],
+                    "bytes_in": stats["bytes_in"],
+                    "retries": stats["retries"],
+                    "status": dict(stats["status"]),
+                }
+                for key, stats in self.endpoints.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def format_summary(self) -> str:
+        """Summary table of the API calls, for the --stats option"""
+        rows = self.summary()
+        if not rows:
+            return "No API calls made."
+
+        # Imported here: tabulate is only needed when the summary is printed
+        import tabulate
+
+        table = [
+            [
+                row["endpoint"],
+                row["requests"],
+                f"{row['total_ms']:.0f}",
+                f"{row['mean_ms']:.0f}",
+                f"{row['p50_ms']:.0f}",
+                f"{row['p95_ms']:.0f}",
+                f"{row['max_ms']:.0f}",
+                row["bytes_out"],
+                row["bytes_in"],
+                row["retries"],
+                ", ".join(f"{code}: {count}" for code, count in sorted(row["status"].items())),
+            ]
+            for row in rows
+        ]
+        headers = ["Endpoint", "Calls", "Total ms", "Mean ms", "p50 ms", "p95 ms", "Max ms", "Bytes out", "Bytes in", "Retries", "Status"]
+        total = sum(row["requests"] for row in rows)
+        codes = ", ".join(f"{code}: {count}" for code, count in sorted(self.status_codes.items()))
+        return f"\nAPI calls: {total} ({codes})\n" + tabulate.tabulate(table, headers, tablefmt="simple")
@@ -0,0 +1,113 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Render command results
+#
+# Description:
+#   "table" renders a tabulate fancy_grid for small interactive views.
+#   "jsonl", "csv" and "tsv" stream each row as soon as it is produced,
+#   without holding the table in memory or computing column widths.
+#
+# =========================================================================
+
+import csv
+import json
+import sys
+
+import click
+
+OUTPUT_FORMATS = ("table", "jsonl", "csv", "tsv")
+
+# Reusable click option, to be added on the cli groups
+output_option = click.option(
+    "--output",
+    "output_format",
+    type=click.Choice(OUTPUT_FORMATS, case_sensitive=False),
+    default="table",
+    show_default=True,
+    help="Output format. jsonl, csv and tsv stream rows and are recommended for large tables.",
+)
+
+
+# ----------------------------------------------------------
+class RowWriter:
+    """
+    Write rows (lists aligned with headers) in the selected output format.
+    Use as a context manager, the table format is rendered on exit.
+    """
+
+    def __init__(self, headers: list[str], output_format: str = "table", stream=None, tablefmt: str = "fancy_grid"):
+        """
+        Args:
+            headers (list): column names
+            output_format (str): one of OUTPUT_FORMATS
+            stream: file-like object, defaults to stdout
+            tablefmt (str): tabulate format used by the table output
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+
+        self.headers = headers
+        self.output_format = output_format
+        self.stream = stream or sys.stdout
+        self.tablefmt = tablefmt
+        self.count = 0
+        self._rows: list = []
+        self._csv = None
+
+        if output_format in ("csv", "tsv"):
+            self._csv = csv.writer(self.stream, delimiter="," if output_format == "csv" else "\t", lineterminator="\n")
+            self._csv.writerow(headers)
+
+    @property
+    def is_table(self) -> bool:
+        return self.output_format == "table"
+
+    def write(self, row):
+        """Write one row. Nested values (lists, dicts) are kept as JSON in jsonl and serialized in csv/tsv."""
+        self.count += 1
+        if self.output_format == "table":
+            self._rows.append(row)
+        elif self.output_format == "jsonl":
+            self.stream.write(json.dumps(dict(zip(self.headers, row)), default=str) + "\n")
+        else:
+            self._csv.writerow([json.dumps(value) if isinstance(value, (list, dict)) else value for value in row])
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def close(self):
+        if self.output_format == "table":
+            # Imported here: tabulate is only needed for interactive tables
+            import tabulate
+
+            try:
+                click.echo(tabulate.tabulate(self._rows, self.headers, tablefmt=self.tablefmt), file=self.stream)
+            except UnicodeEncodeError:
+                click.echo(tabulate.tabulate(self._rows, self.headers, tablefmt="grid"), file=self.stream)
+            self._rows = []
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ----------------------------------------------------------
+def get_output_format(ctx: click.Context) -> str:
+    """Return the output format selected on the cli group (stored in the shared context meta)"""
+    return ctx.meta.get("output_format", "table")
+
+
+def info(message: str, ctx: click.Context | None = None):
+    """
+    Print a progress/status message. It goes to stderr when a machine-readable
+    output is selected, so piped jsonl/csv/tsv output stays clean.
+    """
+    machine_output = ctx is not None and get_output_format(ctx) != "table"
+    click.echo(message, err=machine_output)
@@ -0,0 +1,561 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Statistics queries
+#
+# Description:
+#   Builder of /statistics/<dataset>/aggregation payloads (rules, grouping
+#   fields, histogram, metrics), replacing the hand-written query dicts.
+#   Queries are immutable, so built payloads and validation results are
+#   memoized. Queries are validated against the fields of the dataset
+#   (/statistics/<dataset>/fields, cached per Manager version) so a wrong
+#   field or type fails locally instead of after a slow server round trip.
+#   SplitQueryRunner runs large queries: a query that times out or hits the
+#   size of its grouping field is split by time range (or by IP set), the
+#   parts run in parallel and their aggregates are merged (count weighted).
+#   mcp-sdwan/api/queries.py has a copy of the query builder (checked by
+#   tests/test_mcp_copies.py).
+#
+#   Example:
+#     query = (
+#         StatsQuery("approute")
+#         .last_n_hours(1)
+#         .where_in("local_system_ip", ["10.0.0.1"])
+#         .group_by("name", size=6000)
+#         .metrics("latency", "jitter")
+#     )
+#     data = post_stats_query(manager, query)
+#
+# =========================================================================
+
+import copy
+import functools
+import json
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Literal, Optional, Union
+
+from utilities.tools import lazy_import
+
+requests = lazy_import("requests")  # Imported by the first API call
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIELDS_DIR = "cache"
+
+MetricType = Literal["avg", "sum", "min", "max", "count"]
+HistogramType = Literal["minute", "hour", "day"]
+
+METRIC_TYPES = ("avg", "sum", "min", "max", "count")
+HISTOGRAM_TYPES = ("minute", "hour", "day")
+HISTOGRAM_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S UTC"
+
+# Metrics of the App route datasets, in the order of the tables
+APPROUTE_METRICS = ("vqoe_score", "latency", "loss_percentage", "jitter")
+
+
+class QueryError(ValueError):
+    """Invalid statistics query (unknown field, wrong type...)"""
+
+
+def parse_time(value: str) -> datetime:
+    """UTC datetime of a `between` rule value ("YYYY-MM-DDTHH:MM:SS UTC" or epoch milliseconds)"""
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, timezone.utc)
+    return datetime.strptime(value, TIME_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def format_time(value: Union[datetime, date, str], end_of_day: bool = False) -> str:
+    """Time value of a `between` rule: "YYYY-MM-DDTHH:MM:SS UTC" (dates: start or end of the day)"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime(TIME_FORMAT)
+    return f"{value.isoformat()}T{'23:59:59' if end_of_day else '00:00:00'} UTC"
+
+
+# ----------------------------------------------------------
+class Rule:
+    """
+    One query rule: field, operator (last_n_hours, between, in...), values and value type.
+    """
+
+    __slots__ = ("field", "operator", "values", "type")
+
+    def __init__(self, field: str, operator: str, values: Iterable, type: str = "string"):
+        self.field = field
+        self.operator = operator
+        self.values = tuple(str(value) for value in values)
+        self.type = type
+
+    def key(self) -> tuple:
+        return self.field, self.operator, self.values, self.type
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"Rule({self.field} {self.operator} {list(self.values)})"
+
+    def payload(self) -> dict:
+        return {"value": list(self.values), "field": self.field, "type": self.type, "operator": self.operator}
+
+
+# ----------------------------------------------------------
+class StatsQuery:
+    """
+    Immutable aggregation query of a statistics dataset (approute, approute/fec, interface...).
+    Every builder method returns a new query.
+    """
+
+    __slots__ = ("dataset", "condition", "rules", "fields", "histogram_spec", "metric_specs")
+
+    def __init__(
+        self,
+        dataset: str = "approute",
+        condition: Literal["AND", "OR"] = "AND",
+        rules: tuple = (),
+        fields: tuple = (),
+        histogram_spec: Optional[tuple] = None,
+        metric_specs: tuple = (),
+    ):
+        self.dataset = dataset
+        self.condition = condition
+        self.rules = rules
+        self.fields = fields  # (property, size) pairs, in sequence order
+        self.histogram_spec = histogram_spec  # (property, type, interval, order)
+        self.metric_specs = metric_specs  # (property, type) pairs
+
+    def _replace(self, **changes) -> "StatsQuery":
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return StatsQuery(**values)
+
+    def key(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, StatsQuery) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    @property
+    def path(self) -> str:
+        return f"/statistics/{self.dataset}/aggregation"
+
+    # ----- rules -----
+
+    def where(self, rule: Rule) -> "StatsQuery":
+        return self._replace(rules=self.rules + (rule,))
+
+    def last_n_hours(self, hours: int, field: str = "entry_time") -> "StatsQuery":
+        return self.where(Rule(field, "last_n_hours", [hours], "date"))
+
+    def between(self, start: Union[datetime, date, str], end: Union[datetime, date, str], field: str = "entry_time") -> "StatsQuery":
+        """Time range, datetimes (naive ones are taken as UTC), dates (whole days) or preformatted strings"""
+        return self.where(Rule(field, "between", [format_time(start), format_time(end, end_of_day=True)], "date"))
+
+    def where_in(self, field: str, values: Iterable, type: str = "string") -> "StatsQuery":
+        values = list(values)
+        if not values:
+            return self
+        return self.where(Rule(field, "in", values, type))
+
+    # ----- aggregation -----
+
+    def group_by(self, *properties: str, size: Optional[int] = None) -> "StatsQuery":
+        """Grouping fields, in sequence order. size applies to the first one (e.g. 6000 tunnel names)."""
+        fields = self.fields + tuple((prop, size if index == 0 else None) for index, prop in enumerate(properties))
+        return self._replace(fields=fields)
+
+    def histogram(
+        self, property: str = "entry_time", type: HistogramType = "hour", interval: int = 1, order: Literal["asc", "desc"] = "asc"
+    ) -> "StatsQuery":
+        return self._replace(histogram_spec=(property, type, interval, order))
+
+    def metrics(self, *properties: str, type: MetricType = "avg") -> "StatsQuery":
+        return self._replace(metric_specs=self.metric_specs + tuple((prop, type) for prop in properties))
+
+    # ----- time range and value sets (used to split a query) -----
+
+    def values(self, field: str) -> tuple:
+        """Values of the `in` rule on a field, () if there is none"""
+        for rule in self.rules:
+            if rule.field == field and rule.operator == "in":
+                return rule.values
+        return ()
+
+    def with_values(self, field: str, values: Iterable) -> "StatsQuery":
+        """Same query with other values in the `in` rule of a field"""
+        rules = tuple(
+            Rule(field, "in", values, rule.type) if rule.field == field and rule.operator == "in" else rule
+            for rule in self.rules
+        )
+        return self._replace(rules=rules)
+
+    def time_range(self, field: str = "entry_time", now: Optional[datetime] = None) -> Optional[tuple[datetime, datetime]]:
+        """(start, end) of the time rule in UTC (last_n_hours ends now), None without a time rule"""
+        for rule in self.rules:
+            if rule.field == field and rule.operator == "between":
+                return parse_time(rule.values[0]), parse_time(rule.values[1])
+            if rule.field == field and rule.operator == "last_n_hours":
+                end = now or datetime.now(timezone.utc)
+                return end - timedelta(hours=int(rule.values[0])), end
+        return None
+
+    def with_time_range(self, start: datetime, end: datetime, field: str = "entry_time") -> "StatsQuery":
+        """Same query over another time range (the time rule becomes a `between` rule)"""
+        rule = Rule(field, "between", [format_time(start), format_time(end)], "date")
+        rules = tuple(rule if item.field == field and item.type == "date" else item for item in self.rules)
+        return self._replace(rules=rules)
+
+    # ----- payload -----
+
+    def payload(self) -> dict:
+        """Request payload (a copy of the memoized one, callers may change it)"""
+        return copy.deepcopy(_build_payload(self))
+
+    def validate(self, fields: list[dict]):
+        """
+        Check the query against the dataset fields ({"property": ..., "dataType": ...} items).
+
+        Raises:
+            QueryError: on the first problem found
+        """
+        _validate(self, tuple((item.get("property"), str(item.get("dataType", "")).lower()) for item in fields))
+
+
+@functools.lru_cache(maxsize=256)
+def _build_payload(query: StatsQuery) -> dict:
+    payload: dict = {"query": {"condition": query.condition, "rules": [rule.payload() for rule in query.rules]}}
+
+    aggregation: dict = {}
+    if query.fields:
+        aggregation["field"] = []
+        for sequence, (prop, size) in enumerate(query.fields, 1):
+            field = {"property": prop, "sequence": sequence}
+            if size:
+                field["size"] = size
+            aggregation["field"].append(field)
+    if query.histogram_spec:
+        prop, type, interval, order = query.histogram_spec
+        aggregation["histogram"] = {"property": prop, "type": type, "interval": interval, "order": order}
+    if query.metric_specs:
+        aggregation["metrics"] = [{"property": prop, "type": type} for prop, type in query.metric_specs]
+    if aggregation:
+        payload["aggregation"] = aggregation
+    return payload
+
+
+@functools.lru_cache(maxsize=256)
+def _validate(query: StatsQuery, fields: tuple):
+    types = dict(fields)
+
+    def check(prop: str, usage: str) -> str:
+        if prop not in types:
+            raise QueryError(f"Unknown {query.dataset} field '{prop}' in {usage}")
+        return types[prop]
+
+    if not query.rules:
+        raise QueryError("A statistics query needs at least one rule (e.g. a time range)")
+    for rule in query.rules:
+        data_type = check(rule.field, "rules")
+        if (rule.type == "date") != (data_type == "date"):
+            raise QueryError(f"Rule on '{rule.field}' has type {rule.type}, the field is {data_type}")
+        if rule.operator == "last_n_hours" and not (len(rule.values) == 1 and rule.values[0].isdigit()):
+            raise QueryError(f"last_n_hours expects one whole number of hours, got {list(rule.values)}")
+        if rule.operator == "between" and len(rule.values) != 2:
+            raise QueryError(f"between expects a start and an end, got {list(rule.values)}")
+        if rule.operator == "in" and not rule.values:
+            raise QueryError(f"Empty 'in' rule on '{rule.field}'")
+
+    for prop, _ in query.fields:
+        check(prop, "aggregation fields")
+    if query.histogram_spec:
+        prop, type, interval, _ = query.histogram_spec
+        if check(prop, "histogram") != "date":
+            raise QueryError(f"Histogram field '{prop}' is not a date")
+        if type not in HISTOGRAM_TYPES or interval < 1:
+            raise QueryError(f"Histogram interval must be a positive number of {', '.join(HISTOGRAM_TYPES)}")
+    for prop, type in query.metric_specs:
+        data_type = check(prop, "metrics")
+        if type not in METRIC_TYPES:
+            raise QueryError(f"Unknown metric type '{type}', expected one of {', '.join(METRIC_TYPES)}")
+        if type != "count" and data_type in ("string", "date", "boolean"):
+            raise QueryError(f"Metric {type} of '{prop}' needs a number, the field is {data_type}")
+
+
+# ----------------------------------------------------------
+_fields_cache: dict = {}
+
+
+def get_fields(manager, dataset: str = "approute", directory: str = DEFAULT_FIELDS_DIR) -> list[dict]:
+    """
+    Fields of a statistics dataset, cached in memory and on disk per Manager version.
+
+    Raises:
+        requests.exceptions.RequestException: if the fields cannot be retrieved
+    """
+    manager._ensure_authenticated()  # Populates the version (about)
+    version = manager.applicationVersion or manager.version
+    key = (manager.host, manager.port, dataset, version)
+    if key in _fields_cache:
+        return _fields_cache[key]
+
+    path = None
+    if version:
+        name = re.sub(r"[^\w.-]", "_", f"{dataset}_{version}")
+        path = os.path.join(directory, f"fields_{name}.json")
+        try:
+            with open(path) as f:
+                _fields_cache[key] = json.load(f)
+            return _fields_cache[key]
+        except (OSError, ValueError):
+            pass
+
+    fields = manager._api_get(f"/statistics/{dataset}/fields")
+    logger.info(f"Statistics fields {dataset} {version}: {len(fields)} fields")
+    if path:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(fields, f)
+    _fields_cache[key] = fields
+    return fields
+
+
+def post_stats_query(manager, query: StatsQuery, validate: bool = True) -> dict:
+    """
+    Validate a query against the dataset fields, then run it.
+
+    Returns:
+        dict: the response payload (results under "data")
+
+    Raises:
+        QueryError: if the query does not match the dataset fields
+        requests.exceptions.RequestException: if an API call fails
+    """
+    if validate:
+        query.validate(get_fields(manager, query.dataset))
+    return manager._api_post(query.path, payload=query.payload())
+
+
+# ----------------------------------------------------------
+def merge_aggregates(query: StatsQuery, parts: Iterable[list[dict]]) -> list[dict]:
+    """
+    Merge the results of sub-queries of an aggregation query (rows with the same grouping fields
+    and histogram bucket are combined): averages are weighted by the row count, sums and counts
+    are added, minima and maxima are kept. Rows without count weigh 1, with a warning: their
+    merged averages are then unweighted.
+    """
+    keys = [prop for prop, _ in query.fields]
+    if query.histogram_spec:
+        keys.append(query.histogram_spec[0])
+
+    merged: dict = {}
+    uncounted = 0
+    for rows in parts:
+        for row in rows:
+            key = tuple(row.get(prop) for prop in keys)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(row)
+                continue
+
+            if not current.get("count") or not row.get("count"):
+                uncounted += 1
+            count, extra = current.get("count") or 1, row.get("count") or 1
+            for prop, type in query.metric_specs:
+                old, new = current.get(prop), row.get(prop)
+                if new is None:
+                    continue
+                if old is None:
+                    current[prop] = new
+                elif type == "avg":
+                    current[prop] = (old * count + new * extra) / (count + extra)
+                elif type in ("sum", "count"):
+                    current[prop] = old + new
+                elif type == "min":
+                    current[prop] = min(old, new)
+                elif type == "max":
+                    current[prop] = max(old, new)
+            current["count"] = count + extra
+
+    if uncounted:
+        logger.warning(
+            f"{query.path}: {uncounted} split results merged without a count, their averages are weighted 1 per row"
+        )
+
+    rows = list(merged.values())
+    if query.histogram_spec:
+        prop, _, _, order = query.histogram_spec
+        rows.sort(key=lambda row: row.get(prop) or 0, reverse=order == "desc")
+    return rows
+
+
+class SplitQueryRunner:
+    """
+    Run an aggregation query that may be too large for one request.
+
+    A part is split in two when it times out (HTTP 502/503/504 or client timeout): by time range,
+    aligned on the histogram buckets, down to min_window, then by IP set. It is also split when the
+    number of values of its first grouping field reaches the field size (the Manager silently drops
+    the rest): by IP set first, then by time range. Parts run in parallel and are merged with
+    merge_aggregates. The query should be validated first (see post_stats_query).
+
+    Example:
+        runner = SplitQueryRunner(manager, timeout=60)
+        data = runner.run(query)
+    """
+
+    def __init__(
+        self,
+        manager,
+        timeout: Optional[float] = None,
+        min_window: timedelta = timedelta(hours=1),
+        max_parts: int = 256,
+        workers: Optional[int] = None,
+        split_fields: tuple = ("local_system_ip", "remote_system_ip"),
+    ):
+        """
+        Args:
+            manager: Manager instance
+            timeout (float): seconds allowed per request, default the Manager timeout
+            min_window (timedelta): time ranges are not split below this duration
+            max_parts (int): maximum number of requests for one query
+            workers (int): concurrent requests, default the Manager pool size
+            split_fields (tuple): fields whose `in` values can be split
+        """
+        self.manager = manager
+        self.timeout = timeout or manager.timeout
+        self.min_window = min_window
+        self.max_parts = max_parts
+        self.workers = workers or manager.pool_size
+        self.split_fields = split_fields
+        self.requests = 0  # Requests of the last run
+        self.splits = 0
+        self.truncated = False  # Set when a part of the last run was still truncated after all the possible splits
+
+    def _fetch(self, query: StatsQuery) -> tuple[Optional[list], Optional[str]]:
+        """Run one part. Returns (rows, problem), problem is None, "timeout" or "truncated"."""
+        try:
+            response = self.manager._api_request("POST", query.path, json=query.payload(), timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            return None, "timeout"
+        if response.status_code in (502, 503, 504):
+            return None, "timeout"
+        response.raise_for_status()
+
+        rows = response.json().get("data", [])
+        if query.fields and query.fields[0][1]:
+            prop, size = query.fields[0]
+            if len({row.get(prop) for row in rows}) >= size:
+                return rows, "truncated"
+        return rows, None
+
+    def _split_time(self, query: StatsQuery, now: datetime) -> Optional[list[StatsQuery]]:
+        time_range = query.time_range(now=now)
+        if time_range is None or time_range[1] - time_range[0] <= self.min_window:
+            return None
+        start, end = time_range
+
+        middle = start + (end - start) / 2
+        if query.histogram_spec:
+            # Split on a bucket boundary, so no histogram bucket is shared by the two parts
+            _, type, interval, _ = query.histogram_spec
+            bucket = HISTOGRAM_SECONDS[type] * interval
+            aligned = datetime.fromtimestamp(middle.timestamp() // bucket * bucket, timezone.utc)
+            if start < aligned < end:
+                middle = aligned
+        middle = middle.replace(microsecond=0)
+        if not start < middle < end:
+            return None
+        return [query.with_time_range(start, middle - timedelta(seconds=1)), query.with_time_range(middle, end)]
+
+    def _split_values(self, query: StatsQuery) -> Optional[list[StatsQuery]]:
+        candidates = [(len(query.values(field)), field) for field in self.split_fields if len(query.values(field)) > 1]
+        if not candidates:
+            return None
+        _, field = max(candidates)
+        values = query.values(field)
+        half = len(values) // 2
+        return [query.with_values(field, values[:half]), query.with_values(field, values[half:])]
+
+    def _split(self, query: StatsQuery, problem: str, now: datetime) -> Optional[list[StatsQuery]]:
+        if problem == "timeout":
+            return self._split_time(query, now) or self._split_values(query)
+        return self._split_values(query) or self._split_time(query, now)
+
+    def run(self, query: StatsQuery) -> list[dict]:
+        """
+        Returns:
+            list: merged result rows
+
+        Raises:
+            requests.exceptions.RequestException: on errors other than timeouts, or a timeout that cannot be split
+        """
+        now = datetime.now(timezone.utc).replace(microsecond=0)  # last_n_hours parts share the same end
+        self.splits = 0
+        self.truncated = False
+        parts = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {executor.submit(self._fetch, query): query}
+            self.requests = 1
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    part = pending.pop(future)
+                    rows, problem = future.result()
+
+                    halves = None
+                    if problem and self.requests + 2 <= self.max_parts:
+                        halves = self._split(part, problem, now)
+                    if halves:
+                        self.splits += 1
+                        logger.info(f"Statistics query {problem}, split in two: {halves[0].rules} / {halves[1].rules}")
+                        for half in halves:
+                            pending[executor.submit(self._fetch, half)] = half
+                        self.requests += len(halves)
+                    elif problem == "timeout":
+                        raise requests.exceptions.Timeout(f"Statistics query still timing out after {self.splits} splits")
+                    else:
+                        if problem == "truncated":
+                            self.truncated = True
+                            logger.warning(f"Statistics query truncated at {part.fields[0][1]} {part.fields[0][0]} values")
+                        parts.append(rows)
+
+        return merge_aggregates(query, parts)
+
+
+def tunnel_stats_query(
+    local_ips: Iterable[str],
+    remote_ips: Iterable[str] = (),
+    hours: Optional[int] = 1,
+    start: Union[datetime, date, str, None] = None,
+    end: Union[datetime, date, str, None] = None,
+    dataset: str = "approute",
+) -> StatsQuery:
+    """
+    Average App route metrics per tunnel name from local routers (optionally to remote routers),
+    over the last hours or between start and end.
+    """
+    query = StatsQuery(dataset)
+    query = query.between(start, end) if start is not None else query.last_n_hours(hours)
+    return (
+        query.where_in("local_system_ip", local_ips)
+        .where_in("remote_system_ip", remote_ips)
+        .group_by("name", size=6000)
+        .metrics(*APPROUTE_METRICS)
+    )
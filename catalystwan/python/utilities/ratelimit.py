@@ -0,0 +1,222 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Client-side rate limiting
+#
+# Description:
+#   Thread-safe token bucket used to bound the rate of outgoing calls
+#   (API requests, webhook fan-out, ...)
+#   Per-endpoint-class request budget (rate + concurrency cap) protecting
+#   SD-WAN Manager: realtime /device/*?deviceId= calls trigger a NETCONF
+#   fetch from the edge and are throttled by the Manager.
+#   mcp-sdwan/api/ratelimit.py has a copy of the endpoint classes and
+#   parse_limits (checked by tests/test_mcp_copies.py).
+#
+# =========================================================================
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+# ----------------------------------------------------------
+class TokenBucket:
+    """
+    Classic token bucket: tokens are refilled at `rate` per second up to `capacity`.
+    Each call consumes one or more tokens; callers either wait for tokens or give up.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate (float): refill rate in tokens per second
+            capacity (float, optional): maximum burst size, defaults to max(1, rate)
+            clock (callable): monotonic clock, overridable for testing
+        """
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be greater than 0")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        Consume tokens if available, without waiting.
+
+        Returns:
+            bool: True if the tokens were consumed, False otherwise.
+        """
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> float:
+        """
+        Consume tokens, sleeping until they are available.
+
+        Args:
+            tokens (float): number of tokens to consume
+            timeout (float, optional): give up after this many seconds
+
+        Returns:
+            float: time spent waiting, in seconds.
+
+        Raises:
+            TimeoutError: if the tokens could not be acquired before timeout.
+        """
+        start = self._clock()
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return now - start
+                wait = (tokens - self._tokens) / self.rate
+
+            if timeout is not None and (now - start) + wait > timeout:
+                raise TimeoutError(f"Could not acquire {tokens} token(s) within {timeout} seconds")
+            time.sleep(wait)
+
+
+# ----------------------------------------------------------
+# Endpoint classes and their default budget: (requests per second, concurrent requests)
+# 0 disables the corresponding limit.
+DEFAULT_LIMITS = {
+    "realtime": (5, 4),  # /device/...?deviceId=..., fetched live from the device
+    "statistics": (10, 8),  # /statistics/..., /alarms, /event
+    "config": (10, 4),  # /template/..., /v1/... (configuration groups, feature profiles)
+    "admin": (5, 2),  # /admin/..., /settings/..., /certificate/...
+    "other": (20, 10),  # inventory and everything else
+}
+
+
+def classify_endpoint(path: str, params: Optional[dict] = None) -> str:
+    """
+    Return the endpoint class of an API path (relative to /dataservice), one of DEFAULT_LIMITS.
+    """
+    split = urlsplit(path)
+    route = split.path
+    query = parse_qs(split.query)
+    if params:
+        query.update(params)
+
+    if route.startswith("/device/") and "deviceId" in query:
+        return "realtime"
+    if route.startswith(("/statistics/", "/alarms", "/event")):
+        return "statistics"
+    if route.startswith(("/template/", "/v1/")):
+        return "config"
+    if route.startswith(("/admin/", "/settings/", "/certificate/")):
+        return "admin"
+    return "other"
+
+
+def parse_limits(spec: Optional[str]) -> dict:
+    """
+    Parse a budget specification, e.g. "realtime=2/4,statistics=20/8" (rate per second / concurrency).
+    Classes not listed keep their default. Returns a full {class: (rate, concurrency)} dict.
+
+    Raises:
+        ValueError: if the specification is invalid.
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        try:
+            name, value = item.split("=")
+            rate, concurrency = value.split("/")
+            name = name.strip()
+            if name not in DEFAULT_LIMITS:
+                raise ValueError(f"unknown endpoint class '{name}'")
+            limits[name] = (float(rate), int(concurrency))
+        except ValueError as e:
+            raise ValueError(f"Invalid API limit '{item}', expected <class>=<rate>/<concurrency>: {e}") from None
+    return limits
+
+
+# ----------------------------------------------------------
+class RequestBudget:
+    """
+    Rate limit and concurrency cap per endpoint class, with wait time metrics.
+
+    Example:
+        budget = RequestBudget(parse_limits("realtime=2/4"))
+        with budget.acquire(classify_endpoint(path)):
+            response = session.get(url)
+    """
+
+    def __init__(self, limits: Optional[dict] = None):
+        """
+        Args:
+            limits (dict): {class: (rate per second, concurrency)}, default DEFAULT_LIMITS. 0 means unlimited.
+        """
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self._buckets = {name: TokenBucket(rate) for name, (rate, _) in self.limits.items() if rate > 0}
+        self._slots = {
+            name: threading.BoundedSemaphore(concurrency)
+            for name, (_, concurrency) in self.limits.items()
+            if concurrency > 0
+        }
+        self._lock = threading.Lock()
+        self._metrics = {name: {"requests": 0, "waited": 0, "wait_time": 0.0, "max_wait": 0.0, "in_flight": 0} for name in self.limits}
+
+    @contextmanager
+    def acquire(self, endpoint_class: str):
+        """
+        Wait for a token and a free slot of the endpoint class, hold the slot for the duration of the block.
+        """
+        if endpoint_class not in self.limits:
+            endpoint_class = "other"
+
+        start = time.monotonic()
+        bucket = self._buckets.get(endpoint_class)
+        if bucket:
+            bucket.acquire()
+        slot = self._slots.get(endpoint_class)
+        if slot:
+            slot.acquire()
+        wait = time.monotonic() - start
+
+        with self._lock:
+            metrics = self._metrics[endpoint_class]
+            metrics["requests"] += 1
+            metrics["in_flight"] += 1
+            metrics["wait_time"] += wait
+            metrics["max_wait"] = max(metrics["max_wait"], wait)
+            if wait > 0.001:
+                metrics["waited"] += 1
+        try:
+            yield wait
+        finally:
+            with self._lock:
+                metrics["in_flight"] -= 1
+            if slot:
+                slot.release()
+
+    def stats(self) -> dict:
+        """
+        Wait metrics per endpoint class: requests, requests that had to wait, total/average/max wait (seconds), in flight.
+        """
+        with self._lock:
+            return {
+                name: dict(metrics, avg_wait=metrics["wait_time"] / metrics["requests"] if metrics["requests"] else 0.0)
+                for name, metrics in self._metrics.items()
+                if metrics["requests"]
+            }
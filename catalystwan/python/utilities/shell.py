@@ -0,0 +1,210 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Interactive shell
+#
+# Description:
+#   `shell` command for the click groups: a cmd.Cmd loop running the group
+#   commands against one warm, authenticated Manager session, so each
+#   command only pays for its own API calls (no login, about() or logout).
+#   GET responses are cached for a few seconds (realtime device calls are
+#   never cached); any write clears the cache.
+#
+# =========================================================================
+
+import cmd
+import json
+import shlex
+import threading
+import time
+from typing import Optional
+
+import click
+
+from utilities.ratelimit import classify_endpoint
+
+
+# ----------------------------------------------------------
+class ResponseCache:
+    """
+    Time-bounded cache of successful GET responses, used by Manager._api_request when set on manager.cache.
+    """
+
+    def __init__(self, ttl: float = 30):
+        """
+        Args:
+            ttl (float): seconds a response is reused
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cacheable(method: str, path: str, params: Optional[dict] = None) -> bool:
+        """GET calls only, realtime device data is always fetched"""
+        return method.upper() == "GET" and classify_endpoint(path, params) != "realtime"
+
+    @staticmethod
+    def key(path: str, params: Optional[dict] = None) -> tuple:
+        return path, json.dumps(params, sort_keys=True, default=str) if params else None
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def set(self, key: tuple, response):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ----------------------------------------------------------
+class Shell(cmd.Cmd):
+    """
+    Read-eval loop running the commands of a click group in the context of the running group.
+    """
+
+    def __init__(self, ctx: click.Context, group: click.Group, manager=None, prompt: str = "sdwan> "):
+        """
+        Args:
+            ctx (click.Context): context of the group, the commands run as its sub-commands
+            group (click.Group): group providing the commands
+            manager: warm Manager, used by the cache and stats commands
+            prompt (str): shell prompt
+        """
+        super().__init__()
+        self.ctx = ctx
+        self.group = group
+        self.manager = manager
+        self.prompt = prompt
+        self.intro = "Interactive shell, one session for all commands. Type help or ? to list the commands, exit to quit."
+
+    # ----- shell commands -----
+
+    def do_exit(self, arg):
+        """Exit the shell (and log out)"""
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        click.echo()
+        return True
+
+    def do_cache(self, arg):
+        """cache [clear]: show the response cache statistics, or empty it"""
+        cache = getattr(self.manager, "cache", None)
+        if cache is None:
+            click.echo("Response cache disabled.")
+        elif arg.strip() == "clear":
+            cache.clear()
+            click.echo("Response cache cleared.")
+        else:
+            click.echo(f"{len(cache)} cached responses, {cache.hits} hits, {cache.misses} misses, ttl {cache.ttl}s")
+
+    def do_stats(self, arg):
+        """Summary of the API calls made in this session"""
+        if self.manager is not None:
+            click.echo(self.manager.metrics.format_summary())
+
+    def do_help(self, arg):
+        """help [command]: list the commands, or show the help of a command"""
+        if arg:
+            if hasattr(self, f"do_{arg}"):
+                return super().do_help(arg)
+            self.run([arg, "--help"])
+            return
+
+        names = [name for name in self.group.list_commands(self.ctx) if name != "shell"]
+        click.echo(self.columnize(names, displaywidth=120) if names else "")
+        click.echo("\nShell commands: cache [clear], stats, help [command], exit")
+        click.echo("Run `help <command>` or `<command> --help` for the options of a command.")
+
+    def emptyline(self):
+        pass
+
+    def completenames(self, text, *ignored):
+        names = [name for name in self.group.list_commands(self.ctx) if name != "shell"] + ["cache", "stats", "help", "exit"]
+        return [name for name in names if name.startswith(text)]
+
+    def default(self, line):
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            return
+        self.run(args)
+
+    # ----- click dispatch -----
+
+    def run(self, args: list[str]):
+        """Run one group command (with its arguments) as a sub-command of the shell context"""
+        name, rest = args[0], args[1:]
+        if name == "shell":
+            click.echo("Already in the shell.", err=True)
+            return
+        command = self.group.get_command(self.ctx, name)
+        if command is None:
+            click.echo(f"Error: No such command '{name}'. Type help to list the commands.", err=True)
+            return
+
+        try:
+            with command.make_context(name, rest, parent=self.ctx) as sub_ctx:
+                command.invoke(sub_ctx)
+        except click.exceptions.Exit:
+            pass
+        except click.ClickException as e:
+            e.show()
+        except click.Abort:
+            click.echo("Aborted.", err=True)
+        except KeyboardInterrupt:
+            click.echo("\nInterrupted.", err=True)
+        except SystemExit:
+            # Commands exit() on errors, the shell keeps running
+            pass
+
+
+# ----------------------------------------------------------
+def shell_command(prompt: str = "sdwan> ", cache_ttl: float = 30, manager_factory=None) -> click.Command:
+    """
+    Build a `shell` command for a click group.
+
+    Args:
+        prompt (str): shell prompt
+        cache_ttl (float): default of the --cache-ttl option
+        manager_factory (callable): creates the Manager when the group did not store one in ctx.obj
+            (the shell then logs it out on exit)
+    """
+
+    @click.command("shell", short_help="Interactive shell keeping one authenticated session.")
+    @click.option("--cache-ttl", default=cache_ttl, show_default=True, help="Seconds GET responses are reused, 0 to disable.")
+    @click.pass_context
+    def shell(ctx, cache_ttl):
+        """Interactive shell keeping one authenticated session for all commands."""
+        group_ctx = ctx.parent
+        if group_ctx.obj is None and manager_factory is not None:
+            group_ctx.obj = manager_factory()
+            group_ctx.call_on_close(group_ctx.obj.logout)
+        manager = group_ctx.obj
+        if cache_ttl and manager is not None:
+            manager.cache = ResponseCache(cache_ttl)
+        group_ctx.meta["shell_manager"] = manager
+        Shell(group_ctx, group_ctx.command, manager, prompt).cmdloop()
+
+    return shell
@@ -0,0 +1,264 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# SLA evaluation
+#
+# Description:
+#   Score App route samples against SLA classes (latency, loss and jitter
+#   thresholds, as in the SLA class lists used by App route policies).
+#   The evaluation is vectorized with NumPy: all the samples are compared
+#   with all the classes at once and aggregated per tunnel with bincount,
+#   so millions of samples are scored in seconds. Samples can be a list of
+#   dicts (e.g. the rows of the App route store), a dict of columns or a
+#   pandas DataFrame.
+#
+#   Requires numpy (pip install numpy), pandas is optional (faster grouping).
+#
+# =========================================================================
+
+import json
+import os
+from typing import Optional
+
+METRIC_COLUMNS = {"latency": "latency", "loss": "loss_percentage", "jitter": "jitter"}
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The SLA evaluation requires the numpy package (pip install numpy)") from None
+    return numpy
+
+
+# ----------------------------------------------------------
+class SlaClass:
+    """
+    SLA class: maximum latency (ms), loss (%) and jitter (ms). None means the metric is not part of the class.
+    """
+
+    __slots__ = ("name", "latency", "loss", "jitter")
+
+    def __init__(self, name: str, latency: Optional[float] = None, loss: Optional[float] = None, jitter: Optional[float] = None):
+        self.name = name
+        self.latency = None if latency in (None, "") else float(latency)
+        self.loss = None if loss in (None, "") else float(loss)
+        self.jitter = None if jitter in (None, "") else float(jitter)
+
+    def __repr__(self):
+        return f"SlaClass({self.name}: latency {self.latency}, loss {self.loss}, jitter {self.jitter})"
+
+
+def sla_classes_from_manager(manager) -> list[SlaClass]:
+    """
+    SLA classes of the Manager (/template/policy/list/sla).
+
+    Raises:
+        requests.exceptions.RequestException: if the lists cannot be retrieved
+    """
+    classes = []
+    for item in manager._api_get("/template/policy/list/sla").get("data", []):
+        entry = (item.get("entries") or [{}])[0]
+        classes.append(SlaClass(item["name"], entry.get("latency"), entry.get("loss"), entry.get("jitter")))
+    return classes
+
+
+def sla_classes_from_file(path: str) -> list[SlaClass]:
+    """
+    SLA classes of a YAML or JSON file:
+
+        sla_classes:
+          - name: Voice
+            latency: 150
+            loss: 1
+            jitter: 30
+    """
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            # Imported here: yaml is only needed for YAML class files
+            import yaml
+
+            content = yaml.safe_load(f)
+        else:
+            content = json.load(f)
+
+    items = content.get("sla_classes", []) if isinstance(content, dict) else content
+    return [SlaClass(item["name"], item.get("latency"), item.get("loss"), item.get("jitter")) for item in items]
+
+
+# ----------------------------------------------------------
+class SlaReport:
+    """
+    Result of SlaEvaluator.evaluate: per tunnel and class violation weights, and the violating samples.
+    Weights are the sample counts, so the percentages are the share of time in violation.
+    """
+
+    def __init__(self, np, classes, tunnels, inverse, weights, violated, columns):
+        self._np = np
+        self.classes = classes
+        self.tunnels = tunnels  # Unique tunnel names
+        self._inverse = inverse  # Tunnel index of each sample
+        self._violated = violated  # (samples, classes) booleans
+        self._columns = columns  # Sample columns (numpy arrays)
+
+        count = len(tunnels)
+        self.total = np.bincount(inverse, weights=weights, minlength=count)
+        self.violated_weight = np.stack(
+            [np.bincount(inverse, weights=weights * violated[:, index], minlength=count) for index in range(len(classes))],
+            axis=1,
+        ) if classes else np.zeros((count, 0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.violation_pct = np.where(self.total[:, None] > 0, 100 * self.violated_weight / self.total[:, None], 0.0)
+
+        # Count weighted means and maxima per tunnel
+        self.mean = {}
+        self.max = {}
+        for metric, values in columns["metrics"].items():
+            known = ~np.isnan(values)
+            weight = np.bincount(inverse, weights=weights * known, minlength=count)
+            total = np.bincount(inverse, weights=weights * np.where(known, values, 0), minlength=count)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.mean[metric] = np.where(weight > 0, total / weight, np.nan)
+            maximum = np.full(count, -np.inf)
+            np.fmax.at(maximum, inverse, values)
+            self.max[metric] = np.where(np.isinf(maximum), np.nan, maximum)
+
+    @staticmethod
+    def _value(value):
+        return None if value != value else round(float(value), 2)  # NaN -> None
+
+    def summary(self, sla_class: Optional[str] = None) -> list[dict]:
+        """One row per tunnel and SLA class: samples, % of time in violation, mean and max metrics"""
+        rows = []
+        for class_index, item in enumerate(self.classes):
+            if sla_class and item.name != sla_class:
+                continue
+            for index, tunnel in enumerate(self.tunnels):
+                rows.append(
+                    {
+                        "tunnel": str(tunnel),
+                        "sla_class": item.name,
+                        "samples": int(self.total[index]),
+                        "violation_pct": self._value(self.violation_pct[index, class_index]),
+                        **{f"mean_{metric}": self._value(self.mean[metric][index]) for metric in self.mean},
+                        **{f"max_{metric}": self._value(self.max[metric][index]) for metric in self.max},
+                    }
+                )
+        return rows
+
+    def worst(self, top: int = 10, sla_class: Optional[str] = None) -> list[dict]:
+        """Tunnels ranked by % of time in violation (then mean latency), across classes unless sla_class is set"""
+        rows = [row for row in self.summary(sla_class) if row["violation_pct"]]
+        rows.sort(key=lambda row: (row["violation_pct"], row["mean_latency"] or 0), reverse=True)
+        return rows[:top] if top else rows
+
+    def violations(self, limit: Optional[int] = None, sla_class: Optional[str] = None) -> list[dict]:
+        """Violating samples (sample, class), in sample order"""
+        np = self._np
+        classes = [index for index, item in enumerate(self.classes) if not sla_class or item.name == sla_class]
+        sample_indexes, class_positions = np.nonzero(self._violated[:, classes])
+        if limit:
+            sample_indexes, class_positions = sample_indexes[:limit], class_positions[:limit]
+
+        metrics = self._columns["metrics"]
+        rows = []
+        for sample, position in zip(sample_indexes.tolist(), class_positions.tolist()):
+            item = self.classes[classes[position]]
+            values = {metric: metrics[metric][sample] for metric in metrics}
+            breached = [
+                metric for metric in values if getattr(item, metric) is not None and values[metric] > getattr(item, metric)
+            ]
+            rows.append(
+                {
+                    "entry_time": self._columns["entry_time"][sample] if self._columns["entry_time"] is not None else None,
+                    "tunnel": str(self.tunnels[self._inverse[sample]]),
+                    "sla_class": item.name,
+                    **{metric: self._value(value) for metric, value in values.items()},
+                    "breached": ",".join(breached),
+                }
+            )
+        return rows
+
+
+class SlaEvaluator:
+    """
+    Vectorized SLA evaluation of App route samples.
+
+    Example:
+        evaluator = SlaEvaluator(sla_classes_from_manager(manager))
+        report = evaluator.evaluate(store.query(start))
+        for row in report.worst(10):
+            print(row["tunnel"], row["sla_class"], row["violation_pct"])
+    """
+
+    def __init__(self, sla_classes: list[SlaClass]):
+        self.np = _numpy()
+        self.classes = list(sla_classes)
+        inf = float("inf")
+        # Thresholds per class, a metric not part of a class never breaches it
+        self.thresholds = {
+            metric: self.np.array([inf if getattr(item, metric) is None else getattr(item, metric) for item in self.classes])
+            for metric in METRIC_COLUMNS
+        }
+
+    def _column(self, samples, name: str, dtype=float):
+        np = self.np
+        if isinstance(samples, list):
+            if dtype is float:
+                return np.array([sample.get(name) for sample in samples], dtype=float)  # None -> NaN
+            return np.array([sample.get(name) for sample in samples], dtype=dtype)
+        if name not in samples:
+            return None
+        column = samples[name]
+        if hasattr(column, "to_numpy"):  # pandas Series
+            return column.to_numpy(dtype=dtype, na_value=np.nan) if dtype is float else column.to_numpy(dtype=dtype)
+        return np.asarray(column, dtype=dtype)
+
+    def _factorize(self, tunnels):
+        """Unique tunnel names and the index of each sample's tunnel (a sort of the strings is much slower)"""
+        np = self.np
+        try:
+            import pandas
+        except ImportError:
+            codes: dict = {}
+            inverse = np.fromiter((codes.setdefault(name, len(codes)) for name in tunnels), dtype=np.intp, count=len(tunnels))
+            return np.array(list(codes), dtype=object), inverse
+        inverse, names = pandas.factorize(tunnels)
+        return np.asarray(names, dtype=object), inverse
+
+    def evaluate(self, samples, tunnel_column: Optional[str] = None) -> SlaReport:
+        """
+        Args:
+            samples: list of dicts, dict of columns or pandas DataFrame with a tunnel name column
+                (tunnel or name), latency, loss_percentage, jitter, and optionally count (weight) and entry_time
+            tunnel_column (str): tunnel name column, default tunnel, or name when there is no tunnel column
+        """
+        np = self.np
+        if isinstance(samples, list):
+            present = set(samples[0]) if samples else set()
+        else:
+            present = set(samples.keys())
+        tunnel_column = tunnel_column or ("tunnel" if "tunnel" in present else "name")
+
+        tunnels = self._column(samples, tunnel_column, dtype=object) if samples is not None else np.array([], dtype=object)
+        if tunnels is None:
+            raise ValueError(f"The samples have no '{tunnel_column}' column")
+        metrics = {
+            metric: (self._column(samples, column) if column in present else np.full(len(tunnels), np.nan))
+            for metric, column in METRIC_COLUMNS.items()
+        }
+        weights = self._column(samples, "count") if "count" in present else np.ones(len(tunnels))
+        weights = np.where(np.isnan(weights) | (weights <= 0), 1.0, weights)
+        entry_time = self._column(samples, "entry_time", dtype=object) if "entry_time" in present else None
+
+        names, inverse = self._factorize(tunnels)
+
+        # (samples, classes): a sample violates a class when any metric is above the class threshold
+        violated = np.zeros((len(tunnels), len(self.classes)), dtype=bool)
+        for metric, values in metrics.items():
+            with np.errstate(invalid="ignore"):
+                violated |= values[:, None] > self.thresholds[metric][None, :]
+
+        return SlaReport(np, self.classes, names, inverse, weights, violated, {"metrics": metrics, "entry_time": entry_time})
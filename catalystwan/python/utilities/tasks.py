@@ -0,0 +1,176 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Device action tasks
+#
+# Description:
+#   Track asynchronous device actions (policy activation, template attach,
+#   mode change...) returned by SD-WAN Manager as a task id, by polling
+#   /device/action/status/{id}.
+#   One poller tracks any number of tasks, with adaptive backoff (the interval
+#   grows while nothing changes and resets on progress), an overall deadline,
+#   and per-device progress callbacks.
+#
+# =========================================================================
+
+import logging
+import time
+from typing import Callable, Optional
+
+from utilities.tools import lazy_import
+
+requests = lazy_import("requests")  # Imported by the first API call
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+class ActionStatus:
+    """
+    Current state of one device action task.
+    """
+
+    def __init__(self, task_id: str, label: Optional[str] = None):
+        self.task_id = task_id
+        self.label = label or task_id
+        self.done = False
+        self.timed_out = False
+        self.status = "pending"  # summary status reported by the Manager
+        self.count: dict = {}  # e.g. {"Success": 2, "Failure": 1}
+        self.devices: dict = {}  # device uuid (or system-ip) -> device status string
+        self._raw: dict = {}
+
+    @property
+    def succeeded(self) -> bool:
+        """True when the task completed without any device failure"""
+        return self.done and not self.timed_out and not self.count.get("Failure")
+
+    def _update(self, payload: dict) -> list[dict]:
+        """Apply a status payload, return the device entries whose status changed"""
+        self._raw = payload
+        summary = payload.get("summary", {})
+        self.status = summary.get("status", self.status)
+        self.count = summary.get("count", self.count) or {}
+        self.done = self.status == "done"
+
+        changed = []
+        for device in payload.get("data", []):
+            key = device.get("uuid") or device.get("system-ip") or device.get("deviceID")
+            if self.devices.get(key) != device.get("status"):
+                self.devices[key] = device.get("status")
+                changed.append(device)
+        return changed
+
+    def __repr__(self):
+        return f"ActionStatus(id='{self.task_id}', label='{self.label}', status='{self.status}', count={self.count})"
+
+
+# ----------------------------------------------------------
+class TaskTracker:
+    """
+    Poll the status of one or more device action tasks until they are done or the deadline expires.
+
+    Example:
+        tracker = TaskTracker(manager, on_progress=print_device)
+        tracker.add(response["id"], label="activate policy")
+        results = tracker.wait()
+    """
+
+    STATUS_PATH = "/device/action/status/{}"
+
+    def __init__(
+        self,
+        manager,
+        initial_interval: float = 1.0,
+        max_interval: float = 15.0,
+        backoff: float = 1.5,
+        timeout: float = 1800.0,
+        on_progress: Optional[Callable[[ActionStatus, dict], None]] = None,
+    ):
+        """
+        Args:
+            manager: authenticated (or lazy) Manager instance
+            initial_interval (float): first polling interval in seconds, also used after any progress
+            max_interval (float): upper bound of the polling interval
+            backoff (float): interval multiplier applied while no task makes progress
+            timeout (float): overall deadline in seconds for all tracked tasks
+            on_progress (callable): called with (task, device entry) each time a device status changes
+        """
+        self.manager = manager
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.tasks: dict[str, ActionStatus] = {}
+
+    def add(self, task_id: str, label: Optional[str] = None) -> ActionStatus:
+        """Start tracking a task id returned by the Manager"""
+        task = ActionStatus(task_id, label)
+        self.tasks[task_id] = task
+        return task
+
+    def poll(self, task: ActionStatus) -> bool:
+        """Fetch the status of a task once. Returns True if anything changed."""
+        # Transient errors (HTTP errors, timeouts, dropped connections) are retried until the deadline
+        try:
+            response = self.manager._api_request("GET", self.STATUS_PATH.format(task.task_id))
+            if response.status_code != 200:
+                logger.warning(f"Status of task {task.task_id} not available: HTTP {response.status_code}")
+                return False
+            payload = response.json()
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Status of task {task.task_id} not available: {e}")
+            return False
+
+        previous = (task.status, dict(task.count))
+        changed_devices = task._update(payload)
+        if self.on_progress:
+            for device in changed_devices:
+                self.on_progress(task, device)
+        return bool(changed_devices) or previous != (task.status, task.count)
+
+    def wait(self) -> dict[str, ActionStatus]:
+        """
+        Poll all pending tasks until they are done or the deadline expires.
+
+        Returns:
+            dict: task id -> ActionStatus (timed_out is set on tasks that did not complete).
+        """
+        deadline = time.monotonic() + self.timeout
+        interval = self.initial_interval
+
+        while True:
+            pending = [task for task in self.tasks.values() if not task.done]
+            progressed = False
+            for task in pending:
+                progressed |= self.poll(task)
+
+            pending = [task for task in pending if not task.done]
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for task in pending:
+                    task.timed_out = True
+                    logger.error(f"Task {task.task_id} ({task.label}) did not complete within {self.timeout} seconds")
+                break
+
+            interval = self.initial_interval if progressed else min(interval * self.backoff, self.max_interval)
+            time.sleep(min(interval, remaining))
+
+        return self.tasks
+
+
+# ----------------------------------------------------------
+def wait_for_action(manager, task_id: str, label: Optional[str] = None, **kwargs) -> ActionStatus:
+    """
+    Track a single device action task until it completes. kwargs are passed to TaskTracker.
+    """
+    tracker = TaskTracker(manager, **kwargs)
+    task = tracker.add(task_id, label)
+    tracker.wait()
+    return task
@@ -0,0 +1,312 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# App route statistics store
+#
+# Description:
+#   Local SQLite time-series of App route samples (latency, loss, jitter,
+#   vQoE) per tunnel, fed by the approute commands, so historical questions
+#   are answered from disk instead of `between` queries against the Manager.
+#   Samples are rolled up to 5 minute, 1 hour and 1 day buckets (count
+#   weighted averages and maxima) and each resolution has its own retention.
+#   Re-ingesting the same samples replaces them, so pulls can overlap.
+#   Aggregations are stored only per interval (histogram queries): the
+#   average of a whole window is not a sample, overlapping windows would
+#   count the same traffic again. Realtime device statistics are not stored
+#   either: their intervals carry no time of their own and consecutive calls
+#   return overlapping intervals.
+#
+#   Environment variable (optional):
+#     approute_store   database file, default cache/approute_stats.db, empty to disable
+#
+# =========================================================================
+
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+from utilities.tools import load_env
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE = os.path.join("cache", "approute_stats.db")
+
+# Resolutions in seconds (0: samples as ingested) and their name
+RESOLUTIONS = {0: "raw", 300: "5m", 3600: "1h", 86400: "1d"}
+
+# Seconds each resolution is kept
+DEFAULT_RETENTION = {0: 2 * 86400, 300: 14 * 86400, 3600: 90 * 86400, 86400: 730 * 86400}
+
+METRICS = ["latency", "loss_percentage", "jitter", "vqoe_score"]
+
+# Tunnel names: <local system IP>:<local color>-<remote system IP>:<remote color>
+_TUNNEL_NAME = re.compile(r"^(\d+\.\d+\.\d+\.\d+):(.+?)-(\d+\.\d+\.\d+\.\d+):(.+)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS approute_samples (
+    resolution INTEGER NOT NULL,
+    entry_time INTEGER NOT NULL,
+    tunnel TEXT NOT NULL,
+    local_system_ip TEXT NOT NULL,
+    remote_system_ip TEXT NOT NULL,
+    local_color TEXT,
+    remote_color TEXT,
+    count INTEGER NOT NULL,
+    latency REAL,
+    loss_percentage REAL,
+    jitter REAL,
+    vqoe_score REAL,
+    latency_max REAL,
+    loss_percentage_max REAL,
+    jitter_max REAL,
+    PRIMARY KEY (resolution, tunnel, entry_time)
+);
+CREATE INDEX IF NOT EXISTS approute_samples_local ON approute_samples (resolution, local_system_ip, entry_time);
+CREATE INDEX IF NOT EXISTS approute_samples_remote ON approute_samples (resolution, remote_system_ip, entry_time);
+CREATE TABLE IF NOT EXISTS approute_rollups (
+    resolution INTEGER PRIMARY KEY,
+    dirty_from INTEGER
+);
+"""
+
+_COLUMNS = [
+    "resolution",
+    "entry_time",
+    "tunnel",
+    "local_system_ip",
+    "remote_system_ip",
+    "local_color",
+    "remote_color",
+    "count",
+    "latency",
+    "loss_percentage",
+    "jitter",
+    "vqoe_score",
+    "latency_max",
+    "loss_percentage_max",
+    "jitter_max",
+]
+
+
+def parse_tunnel_name(name: str) -> Optional[tuple[str, str, str, str]]:
+    """(local system IP, local color, remote system IP, remote color) of a tunnel name, or None"""
+    match = _TUNNEL_NAME.match(name or "")
+    return match.groups() if match else None
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+# ----------------------------------------------------------
+class ApprouteStore:
+    """
+    SQLite store of App route samples with rollups and retention.
+
+    Example:
+        store = ApprouteStore("cache/approute_stats.db")
+        store.add_aggregation(response["data"])  # Results of a histogram query
+        store.maintain()
+        rows = store.query(local_system_ip="10.0.0.1", start=now_ms() - 86400000)
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE, retention: Optional[dict] = None):
+        """
+        Args:
+            path (str): database file
+            retention (dict): {resolution seconds: seconds kept}, default DEFAULT_RETENTION
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ----- ingestion -----
+
+    def add_samples(self, samples: Iterable[dict]) -> int:
+        """
+        Store raw samples. Each sample has entry_time (epoch ms), tunnel, local_system_ip, remote_system_ip,
+        and optionally local_color, remote_color, count (samples represented, default 1) and the METRICS.
+        Returns the number of samples stored.
+        """
+        rows = []
+        for sample in samples:
+            row = {column: sample.get(column) for column in _COLUMNS}
+            row["resolution"] = 0
+            row["entry_time"] = int(row["entry_time"])
+            row["count"] = int(sample.get("count") or 1)
+            for metric in ("latency", "loss_percentage", "jitter"):
+                row[f"{metric}_max"] = sample.get(f"{metric}_max", sample.get(metric))
+            rows.append(row)
+        if not rows:
+            return 0
+
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO approute_samples ({', '.join(_COLUMNS)}) VALUES ({', '.join(':' + column for column in _COLUMNS)})",
+                rows,
+            )
+            self._mark_dirty(300, min(row["entry_time"] for row in rows))
+        return len(rows)
+
+    def add_aggregation(
+        self,
+        data: list[dict],
+        local_system_ip: Optional[str] = None,
+        remote_system_ip: Optional[str] = None,
+    ) -> int:
+        """
+        Store the results of a /statistics/approute/aggregation histogram query grouped by tunnel name
+        (one row per tunnel and interval, with its entry_time and count).
+        Rows without entry_time (a query over a whole window) are not stored: they average samples that
+        overlapping windows would count again, the rollups would weigh the same traffic several times.
+        The IPs and colors come from the tunnel name, or from the arguments when the name cannot be parsed.
+        """
+        samples = []
+        skipped = 0
+        for item in data:
+            if not item.get("entry_time"):
+                skipped += 1
+                continue
+            parsed = parse_tunnel_name(item.get("name"))
+            local_ip, local_color, remote_ip, remote_color = parsed or (local_system_ip, None, remote_system_ip, None)
+            if not item.get("name") or not local_ip or not remote_ip:
+                continue
+            sample = {metric: item.get(metric) for metric in METRICS}
+            sample.update(
+                entry_time=item["entry_time"],
+                tunnel=item["name"],
+                local_system_ip=local_ip,
+                remote_system_ip=remote_ip,
+                local_color=local_color,
+                remote_color=remote_color,
+                count=item.get("count"),
+            )
+            samples.append(sample)
+        if skipped:
+            logger.debug(f"App route store: {skipped} aggregation rows without entry_time (window results) not stored")
+        return self.add_samples(samples)
+
+    # ----- rollups and retention -----
+
+    def _mark_dirty(self, resolution: int, since: int):
+        self.db.execute(
+            "INSERT INTO approute_rollups (resolution, dirty_from) VALUES (?, ?) "
+            "ON CONFLICT (resolution) DO UPDATE SET dirty_from = MIN(COALESCE(dirty_from, excluded.dirty_from), excluded.dirty_from)",
+            (resolution, since),
+        )
+
+    def rollup(self):
+        """Recompute the 5m, 1h and 1d buckets touched since the last rollup"""
+        resolutions = sorted(RESOLUTIONS)
+        with self.db:
+            for source, target in zip(resolutions, resolutions[1:]):
+                row = self.db.execute("SELECT dirty_from FROM approute_rollups WHERE resolution = ?", (target,)).fetchone()
+                if row is None or row["dirty_from"] is None:
+                    continue
+                bucket_ms = target * 1000
+                since = row["dirty_from"] // bucket_ms * bucket_ms
+                self.db.execute(
+                    f"""
+                    INSERT OR REPLACE INTO approute_samples ({', '.join(_COLUMNS)})
+                    SELECT ?, entry_time / ? * ? AS bucket, tunnel, local_system_ip, remote_system_ip,
+                           MAX(local_color), MAX(remote_color), SUM(count),
+                           SUM(latency * count) / SUM(CASE WHEN latency IS NULL THEN 0 ELSE count END),
+                           SUM(loss_percentage * count) / SUM(CASE WHEN loss_percentage IS NULL THEN 0 ELSE count END),
+                           SUM(jitter * count) / SUM(CASE WHEN jitter IS NULL THEN 0 ELSE count END),
+                           SUM(vqoe_score * count) / SUM(CASE WHEN vqoe_score IS NULL THEN 0 ELSE count END),
+                           MAX(latency_max), MAX(loss_percentage_max), MAX(jitter_max)
+                    FROM approute_samples
+                    WHERE resolution = ? AND entry_time >= ?
+                    GROUP BY bucket, tunnel, local_system_ip, remote_system_ip
+                    """,
+                    (target, bucket_ms, bucket_ms, source, since),
+                )
+                self.db.execute("UPDATE approute_rollups SET dirty_from = NULL WHERE resolution = ?", (target,))
+                if target != resolutions[-1]:
+                    self._mark_dirty(resolutions[resolutions.index(target) + 1], since)
+
+    def prune(self, now: Optional[int] = None) -> int:
+        """Delete the samples older than the retention of their resolution. Returns the number deleted."""
+        now = now or now_ms()
+        deleted = 0
+        with self.db:
+            for resolution, seconds in self.retention.items():
+                cursor = self.db.execute(
+                    "DELETE FROM approute_samples WHERE resolution = ? AND entry_time < ?", (resolution, now - seconds * 1000)
+                )
+                deleted += cursor.rowcount
+        return deleted
+
+    def maintain(self):
+        """Rollups, then retention (rollups first, so pruned samples are already summarized)"""
+        self.rollup()
+        deleted = self.prune()
+        if deleted:
+            logger.info(f"App route store {self.path}: {deleted} expired samples deleted")
+
+    # ----- queries -----
+
+    def resolution_for(self, start: int, now: Optional[int] = None) -> int:
+        """Finest resolution whose retention still covers start"""
+        age = ((now or now_ms()) - start) / 1000
+        for resolution in sorted(RESOLUTIONS):
+            if age <= self.retention[resolution]:
+                return resolution
+        return max(RESOLUTIONS)
+
+    def query(
+        self,
+        start: int,
+        end: Optional[int] = None,
+        resolution: Optional[int] = None,
+        local_system_ip: Optional[str] = None,
+        remote_system_ip: Optional[str] = None,
+        tunnel: Optional[str] = None,
+    ) -> list[dict]:
+        """
+        Samples between start and end (epoch ms), ordered by tunnel and time.
+
+        Args:
+            resolution (int): 0, 300, 3600 or 86400 seconds, default: resolution_for(start)
+        """
+        self.rollup()
+        if resolution is None:
+            resolution = self.resolution_for(start)
+
+        conditions = ["resolution = ?", "entry_time >= ?", "entry_time <= ?"]
+        values: list = [resolution, start, end or now_ms()]
+        for column, value in (("local_system_ip", local_system_ip), ("remote_system_ip", remote_system_ip), ("tunnel", tunnel)):
+            if value:
+                conditions.append(f"{column} = ?")
+                values.append(value)
+
+        cursor = self.db.execute(
+            f"SELECT * FROM approute_samples WHERE {' AND '.join(conditions)} ORDER BY tunnel, entry_time", values
+        )
+        return [dict(row) for row in cursor]
+
+
+def open_store() -> Optional[ApprouteStore]:
+    """Store configured by approute_store (default cache/approute_stats.db), None when disabled"""
+    load_env()
+    path = os.getenv("approute_store", DEFAULT_STORE)
+    return ApprouteStore(path) if path else None
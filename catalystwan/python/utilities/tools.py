@@ -4,12 +4,57 @@
 # =========================================================================
 #
 # Save JSON payloads to files
+# Convert Manager timestamps (epoch milliseconds) to human-readable dates
 #
 # =========================================================================
 
+import functools
+import importlib.util
 import json
 import os
+import sys
+import time
 from datetime import datetime
+from zoneinfo import ZoneInfo
+
+DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
+
+
+# -----------------------------------------------------------------------------
+def lazy_import(name: str):
+    """Register a module that is really imported on first attribute access.
+
+    Later `import name` statements get the lazy module, so heavy dependencies
+    (requests, urllib3...) only cost their import time when they are used.
+
+    Args:
+        name: module name
+
+    Returns:
+        The (lazy) module
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# -----------------------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def load_env():
+    """Load the .env file into the environment, once per process"""
+    # Imported here: dotenv is only needed by commands reaching the Manager
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 
 # -----------------------------------------------------------------------------
@@ -34,10 +79,94 @@ def save_payload(payload: dict, filename: str = "payload", directory: str = "./o
 
 
 # -----------------------------------------------------------------------------
-def convert_timestamp(timestamp_ms):
+@functools.lru_cache(maxsize=None)
+def get_timezone(name: str) -> ZoneInfo:
+    """Return the (cached) timezone object for an IANA timezone name, e.g. "America/Los_Angeles" """
+    return ZoneInfo(name)
+
+
+# -----------------------------------------------------------------------------
+class TimestampFormatter:
+    """
+    Format epoch-millisecond timestamps in a display timezone.
+
+    UTC offsets are memoized per 15-minute bucket, so formatting a large table only
+    resolves the timezone rules once per bucket instead of once per row. Buckets
+    containing an offset transition (DST change) are never cached and are resolved
+    exactly.
+    """
+
+    BUCKET_MS = 15 * 60 * 1000
+
+    def __init__(self, timezone: str = "UTC", fmt: str = DEFAULT_TIMESTAMP_FORMAT):
+        """
+        Args:
+            timezone: IANA timezone name used for display (default: "UTC")
+            fmt: strftime format, %Z is replaced by the timezone abbreviation (PST, PDT, UTC...)
+        """
+        self.timezone = timezone
+        self.fmt = fmt
+        self._tz = get_timezone(timezone)
+        self._offsets: dict[int, tuple[int, str]] = {}
+        self._formats: dict[str, str] = {}
+
+    def _offset(self, timestamp_ms: int) -> tuple[int, str]:
+        bucket = timestamp_ms // self.BUCKET_MS
+        cached = self._offsets.get(bucket)
+        if cached is not None:
+            return cached
+
+        start = datetime.fromtimestamp(bucket * self.BUCKET_MS / 1000, tz=self._tz)
+        end = datetime.fromtimestamp(((bucket + 1) * self.BUCKET_MS - 1) / 1000, tz=self._tz)
+        if start.utcoffset() == end.utcoffset():
+            cached = (int(start.utcoffset().total_seconds()), start.tzname())
+            self._offsets[bucket] = cached
+            return cached
+
+        # Offset transition inside this bucket: resolve this timestamp exactly
+        exact = datetime.fromtimestamp(timestamp_ms / 1000, tz=self._tz)
+        return int(exact.utcoffset().total_seconds()), exact.tzname()
+
+    def format(self, timestamp_ms) -> str:
+        """Format a single epoch-millisecond timestamp, "N/A" if empty"""
+        if not timestamp_ms:
+            return "N/A"
+
+        offset, name = self._offset(int(timestamp_ms))
+        fmt = self._formats.get(name)
+        if fmt is None:
+            fmt = self._formats[name] = self.fmt.replace("%Z", name)
+        return time.strftime(fmt, time.gmtime(timestamp_ms / 1000 + offset))
+
+    def format_many(self, timestamps_ms) -> list[str]:
+        """Format an iterable of epoch-millisecond timestamps"""
+        format_one = self.format
+        return [format_one(timestamp_ms) for timestamp_ms in timestamps_ms]
+
+
+# -----------------------------------------------------------------------------
+@functools.lru_cache(maxsize=32)
+def get_timestamp_formatter(timezone: str = "UTC", fmt: str = DEFAULT_TIMESTAMP_FORMAT) -> TimestampFormatter:
+    """Return a shared formatter for a timezone and format, so offset caches are reused across calls"""
+    return TimestampFormatter(timezone, fmt)
+
+
+# -----------------------------------------------------------------------------
+def convert_timestamp(timestamp_ms, timezone: str = "UTC", fmt: str = DEFAULT_TIMESTAMP_FORMAT):
+    """
+    Helper function to convert Unix timestamp (milliseconds) to human-readable date
+
+    Args:
+        timestamp_ms: epoch timestamp in milliseconds
+        timezone: IANA timezone name used for display (default: "UTC")
+        fmt: strftime format, %Z is replaced by the timezone abbreviation
+    """
+    return get_timestamp_formatter(timezone, fmt).format(timestamp_ms)
+
+
+# -----------------------------------------------------------------------------
+def convert_timestamps(timestamps_ms, timezone: str = "UTC", fmt: str = DEFAULT_TIMESTAMP_FORMAT) -> list[str]:
     """
-    Helper function to convert Unix timestamp to human-readable date
+    Batch version of convert_timestamp for a list (or any iterable) of epoch-ms timestamps
     """
-    if timestamp_ms:
-        return datetime.fromtimestamp(timestamp_ms / 1000).strftime("%Y-%m-%d %H:%M:%S UTC")
-    return "N/A"
+    return get_timestamp_formatter(timezone, fmt).format_many(timestamps_ms)
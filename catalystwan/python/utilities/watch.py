@@ -0,0 +1,161 @@
+#! /usr/bin/env python3
+# =========================================================================
+# Cisco Catalyst SD-WAN Manager APIs
+# =========================================================================
+#
+# Live tables
+#
+# Description:
+#   Building blocks of the watch commands: a ring buffer of samples per key
+#   (e.g. per tunnel), threshold checks, and a terminal table redrawing only
+#   the rows whose text changed since the previous refresh. When stdout is
+#   not a terminal, changed rows are appended instead of redrawn.
+#
+# =========================================================================
+
+import sys
+from collections import deque
+from typing import Optional
+
+import click
+
+# Default alert thresholds of the App route metrics
+DEFAULT_THRESHOLDS = {"latency": 150.0, "loss_percentage": 1.0, "jitter": 30.0}
+
+
+# ----------------------------------------------------------
+class SampleHistory:
+    """
+    Rolling history of the last samples (metric dicts) of each key.
+    """
+
+    def __init__(self, size: int = 30):
+        """
+        Args:
+            size (int): number of samples kept per key
+        """
+        self.size = size
+        self._samples: dict = {}
+
+    def add(self, key, sample: dict):
+        self._samples.setdefault(key, deque(maxlen=self.size)).append(sample)
+
+    def keys(self) -> list:
+        return list(self._samples)
+
+    def latest(self, key) -> Optional[dict]:
+        samples = self._samples.get(key)
+        return samples[-1] if samples else None
+
+    def previous(self, key) -> Optional[dict]:
+        samples = self._samples.get(key)
+        return samples[-2] if samples and len(samples) > 1 else None
+
+    def count(self, key) -> int:
+        return len(self._samples.get(key, ()))
+
+    def mean(self, key, metric: str) -> Optional[float]:
+        """Mean of a metric over the kept samples of a key (samples without the metric are ignored)"""
+        values = [sample[metric] for sample in self._samples.get(key, ()) if sample.get(metric) is not None]
+        return sum(values) / len(values) if values else None
+
+    def delta(self, key, metric: str) -> Optional[float]:
+        """Change of a metric since the previous sample of a key"""
+        latest, previous = self.latest(key), self.previous(key)
+        if latest is None or previous is None or latest.get(metric) is None or previous.get(metric) is None:
+            return None
+        return latest[metric] - previous[metric]
+
+
+def breached(sample: dict, thresholds: dict) -> set:
+    """Metrics of a sample above their threshold"""
+    return {metric for metric, limit in thresholds.items() if (sample.get(metric) or 0) > limit}
+
+
+# ----------------------------------------------------------
+class LiveTable:
+    """
+    Fixed-width text table refreshed in place: a status line, the header, then one line per key.
+    Only the lines whose text changed are rewritten (ANSI cursor movements), new keys are appended.
+    """
+
+    def __init__(self, columns: list[tuple[str, int]], stream=None, live: Optional[bool] = None):
+        """
+        Args:
+            columns (list): (header, width) pairs, the first column holds the key
+            stream: file-like object, defaults to stdout
+            live (bool): redraw in place, defaults to True when the stream is a terminal
+        """
+        self.columns = columns
+        self.stream = stream or sys.stdout
+        self.live = self.stream.isatty() if live is None else live
+        self._lines: list = []  # Rendered text of the rows, in display order
+        self._rows: dict = {}  # key: index in _lines
+        self._status = ""
+        self._started = False
+
+    def format_row(self, values: list, styles: Optional[dict] = None) -> str:
+        """
+        Args:
+            values (list): one value per column
+            styles (dict): column index: click.style keyword arguments, only applied to live tables
+        """
+        cells = []
+        for index, ((_, width), value) in enumerate(zip(self.columns, values)):
+            if isinstance(value, float):
+                text = f"{value:.2f}"
+            else:
+                text = "" if value is None else str(value)
+            text = text[:width].ljust(width) if index == 0 else text[:width].rjust(width)
+            if self.live and styles and index in styles:
+                text = click.style(text, **styles[index])
+            cells.append(text)
+        return "  ".join(cells)
+
+    def _write(self, text: str):
+        self.stream.write(text)
+
+    def _rewrite(self, line_index: int, text: str):
+        """Rewrite one line above the cursor (the cursor stays below the table)"""
+        up = len(self._lines) + 2 - line_index  # Status and header lines come first
+        self._write(f"\x1b[{up}A\r\x1b[2K{text}\x1b[{up}B\r")
+
+    def start(self):
+        header = self.format_row([name for name, _ in self.columns])
+        self._write(f"{self._status}\n{click.style(header, bold=True) if self.live else header}\n")
+        self._started = True
+
+    def status(self, text: str):
+        if not self._started:
+            self._status = text
+            self.start()
+        elif self.live:
+            self._status = text
+            self._rewrite(0, text)
+        else:
+            self._write(f"{text}\n")
+        self.stream.flush()
+
+    def update(self, key, line: str) -> bool:
+        """Show the line of a key. Returns True if it was written (new or changed)."""
+        if not self._started:
+            self.start()
+
+        index = self._rows.get(key)
+        if index is not None and self._lines[index] == line:
+            return False
+
+        if index is None:
+            self._rows[key] = len(self._lines)
+            self._lines.append(line)
+            self._write(f"{line}\n")
+        else:
+            self._lines[index] = line
+            if self.live:
+                self._rewrite(index + 2, line)
+            else:
+                self._write(f"{line}\n")
+        return True
+
+    def flush(self):
+        self.stream.flush()